@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012 Anaconda, Inc
+# SPDX-License-Identifier: BSD-3-Clause
+"""
+Time to compile the .py files of noarch python packages, 2000 small modules at a time.
+
+``time_first_compile`` includes starting the worker processes of the interpreter, as the
+first compile of a transaction does.  ``time_reused_workers`` compiles with workers already
+running.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from os.path import join
+import sys
+from tempfile import mkdtemp
+
+from conda.common.path import pyc_path
+from conda.gateways.disk import mkdir_p
+from conda.gateways.disk.compile import get_pyc_compile_pool
+from conda.gateways.disk.create import compile_multiple_pyc
+from conda.gateways.disk.delete import rm_rf
+
+N_FILES = 2000
+PY_VER = '%d.%d' % sys.version_info[:2]
+
+
+class CompileMultiplePyc:
+    timeout = 600
+
+    def setup(self):
+        self.prefix = mkdtemp()
+        site_packages = join(self.prefix, "lib", "site-packages", "pkg")
+        mkdir_p(site_packages)
+        self.py_full_paths = []
+        for i in range(N_FILES):
+            py_full_path = join(site_packages, "module_%d.py" % i)
+            with open(py_full_path, "w") as fh:
+                fh.write("".join("def f%d(a):\n    return a + %d\n" % (j, i) for j in range(20)))
+            self.py_full_paths.append(py_full_path)
+        self.pyc_full_paths = [pyc_path(p, PY_VER) for p in self.py_full_paths]
+
+    def teardown(self):
+        get_pyc_compile_pool(sys.executable, self.prefix).close()
+        rm_rf(self.prefix)
+
+    def _compile(self):
+        compile_multiple_pyc(sys.executable, self.py_full_paths, self.pyc_full_paths,
+                             self.prefix, PY_VER)
+
+    def time_first_compile(self):
+        get_pyc_compile_pool(sys.executable, self.prefix).close()
+        self._compile()
+
+    def time_reused_workers(self):
+        self._compile()
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012 Anaconda, Inc
+# SPDX-License-Identifier: BSD-3-Clause
+"""
+Load time of PrefixData for a synthetic 600-package environment.
+
+``time_cold`` loads the prefix without a conda-meta/records_index, so every conda-meta json
+file is parsed.  ``time_indexed`` loads it with an up-to-date index, which is what every
+command after the first one sees.  ``time_all_files`` also touches ``files`` on every record,
+which was the cost of every load before those fields were deferred.
+
+``LoadSitePackages`` loads a prefix with pip interop enabled, where site-packages holds
+300 pip-installed distributions next to the conda python packages.  ``time_cold`` parses every
+distribution's metadata; ``time_indexed`` uses an up-to-date conda-meta/site_packages_index.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from hashlib import md5
+import json
+from os.path import join
+from tempfile import mkdtemp
+
+from conda.base.constants import (
+    PREFIX_MAGIC_FILE, PREFIX_RECORDS_INDEX_FILE, PREFIX_SITE_PACKAGES_INDEX_FILE,
+)
+from conda.core.prefix_data import PrefixData
+from conda.gateways.disk import mkdir_p
+from conda.gateways.disk.delete import rm_rf
+
+N_PACKAGES = 600
+N_PIP_PACKAGES = 300
+SITE_PACKAGES = "lib/python3.7/site-packages"
+
+
+def make_prefix(n_packages=N_PACKAGES):
+    prefix = mkdtemp()
+    mkdir_p(join(prefix, "conda-meta"))
+    open(join(prefix, PREFIX_MAGIC_FILE), "a").close()
+    write_record(prefix, "python", "3.7.3", ["bin/python3.7"])
+    for i in range(n_packages):
+        name = "pkg%d" % i
+        n_files = 10000 if i % 100 == 0 else 150
+        files = ["%s/%s/mod%d.py" % (SITE_PACKAGES, name, j) for j in range(n_files)]
+        files.append("%s/%s-1.0.dist-info/RECORD" % (SITE_PACKAGES, name))
+        write_record(prefix, name, "1.0", files, depends=["python >=3.7,<3.8.0a0"])
+        mkdir_p(join(prefix, SITE_PACKAGES, "%s-1.0.dist-info" % name))
+        open(join(prefix, files[-1]), "w").close()
+    return prefix
+
+
+def write_record(prefix, name, version, files, depends=()):
+    dist_name = "%s-%s-py37_0" % (name, version)
+    record = {
+        "name": name,
+        "version": version,
+        "build": "py37_0",
+        "build_number": 0,
+        "channel": "https://repo.anaconda.com/pkgs/main/linux-64",
+        "subdir": "linux-64",
+        "fn": dist_name + ".tar.bz2",
+        "url": "https://repo.anaconda.com/pkgs/main/linux-64/%s.tar.bz2" % dist_name,
+        "md5": md5(dist_name.encode("utf-8")).hexdigest(),
+        "depends": list(depends),
+        "extracted_package_dir": "/opt/conda/pkgs/" + dist_name,
+        "package_tarball_full_path": "/opt/conda/pkgs/%s.tar.bz2" % dist_name,
+        "link": {"source": "/opt/conda/pkgs/" + dist_name, "type": 1},
+        "files": files,
+        "paths_data": {"paths_version": 1, "paths": [
+            {"_path": f, "path_type": "hardlink", "sha256": "%064x" % j,
+             "sha256_in_prefix": "%064x" % j, "size_in_bytes": 1000 + j}
+            for j, f in enumerate(files)
+        ]},
+    }
+    with open(join(prefix, "conda-meta", dist_name + ".json"), "w") as fh:
+        json.dump(record, fh, indent=2)
+
+
+def add_pip_packages(prefix, n_packages=N_PIP_PACKAGES):
+    for i in range(n_packages):
+        name = "pippkg%d" % i
+        dist_info = join(prefix, SITE_PACKAGES, "%s-2.0.dist-info" % name)
+        mkdir_p(dist_info)
+        with open(join(dist_info, "METADATA"), "w") as fh:
+            fh.write("Metadata-Version: 2.1\nName: %s\nVersion: 2.0\n"
+                     "Requires-Dist: six (>=1.10)\nRequires-Dist: requests\n" % name)
+        with open(join(dist_info, "INSTALLER"), "w") as fh:
+            fh.write("pip\n")
+        with open(join(dist_info, "RECORD"), "w") as fh:
+            for j in range(100):
+                fh.write("%s/mod%d.py,sha256=%s,%d\n" % (name, j, "a" * 43, 1000 + j))
+            fh.write("%s-2.0.dist-info/RECORD,,\n" % name)
+
+
+class LoadPrefixData:
+    timeout = 600
+
+    def setup(self):
+        self.prefix = make_prefix()
+        self._load()
+
+    def teardown(self):
+        rm_rf(self.prefix)
+
+    def _load(self):
+        PrefixData._cache_.pop(self.prefix, None)
+        return tuple(PrefixData(self.prefix, pip_interop_enabled=False).iter_records())
+
+    def time_cold(self):
+        rm_rf(join(self.prefix, PREFIX_RECORDS_INDEX_FILE))
+        self._load()
+
+    def time_indexed(self):
+        self._load()
+
+    def time_all_files(self):
+        for prefix_record in self._load():
+            prefix_record.files
+
+
+class LoadSitePackages:
+    timeout = 600
+
+    def setup(self):
+        self.prefix = make_prefix()
+        add_pip_packages(self.prefix)
+        self._load()
+
+    def teardown(self):
+        rm_rf(self.prefix)
+
+    def _load(self):
+        PrefixData._cache_.pop(self.prefix, None)
+        return tuple(PrefixData(self.prefix, pip_interop_enabled=True).iter_records())
+
+    def time_cold(self):
+        rm_rf(join(self.prefix, PREFIX_SITE_PACKAGES_INDEX_FILE))
+        self._load()
+
+    def time_indexed(self):
+        self._load()
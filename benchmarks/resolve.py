@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012 Anaconda, Inc
+# SPDX-License-Identifier: BSD-3-Clause
+"""
+``Resolve.find_matches`` for specs without an exact name, over a synthetic 100k-record index.
+
+These are the lookups behind ``conda search '*numpy*'`` and ``conda search '*[build=...]'``.
+The ``scan`` variants test every record, as ``find_matches`` did before it selected candidates
+from a ``RecordIndex``; ``time_build_indexes`` is the one-off cost of those indexes.
+
+``FindMatchesVersionRange`` times the dependency specs ``get_reduced_index`` resolves, which
+``find_matches`` answers from ``RankedVersions`` instead of comparing versions per record.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+
+from conda.base.context import context
+from conda.common.compat import itervalues
+from conda.core.subdir_data import SubdirData
+from conda.models.channel import Channel
+from conda.models.match_spec import MatchSpec
+from conda.models.record_index import RecordIndex
+from conda.resolve import Resolve
+
+from .subdir_data import make_repodata
+
+SPECS = ("*pkg12*", "pkg99*", "*[build=py37h0000001_1]", "*[md5=%032x]" % 4242)
+
+
+class FindMatchesWithoutName:
+    timeout = 600
+
+    def setup(self):
+        subdir_data = SubdirData(Channel("https://conda.anaconda.org/bench/%s" % context.subdir))
+        subdir_data._process_raw_repodata(json.loads(make_repodata()))
+        subdir_data._loaded = True
+        self.index = {prec: prec for prec in subdir_data.iter_records()}
+        self.specs = tuple(MatchSpec(spec) for spec in SPECS)
+        self.resolve = Resolve(self.index)
+        # indexes are built once, by the first spec constraining each field
+        self.time_find_matches()
+
+    def time_find_matches(self):
+        self.resolve._cached_find_matches.clear()
+        for spec in self.specs:
+            self.resolve.find_matches(spec)
+
+    def time_build_indexes(self):
+        record_index = RecordIndex(itervalues(self.index))
+        for spec in self.specs:
+            record_index.candidates(spec)
+
+    def time_scan(self):
+        for spec in self.specs:
+            tuple(prec for prec in itervalues(self.index) if spec.match(prec))
+
+
+class FindMatchesVersionRange:
+    timeout = 600
+
+    def setup(self):
+        subdir_data = SubdirData(Channel("https://conda.anaconda.org/bench/%s" % context.subdir))
+        # few names with many versions each, as for python or numpy on a big channel
+        subdir_data._process_raw_repodata(json.loads(make_repodata(n_names=100)))
+        subdir_data._loaded = True
+        self.index = {prec: prec for prec in subdir_data.iter_records()}
+        # the distinct constraints a reduced index for a large environment runs into
+        self.specs = tuple(MatchSpec("pkg%d >=%d.%d,<%d" % (i, j * 40, i % 7, j * 40 + 100))
+                           for i in range(100) for j in range(20))
+        self.resolve = Resolve(self.index)
+
+    def time_find_matches(self):
+        self.resolve._cached_find_matches.clear()
+        self.resolve._ranked_groups.clear()
+        for spec in self.specs:
+            self.resolve.find_matches(spec)
+
+    def time_scan(self):
+        for spec in self.specs:
+            tuple(prec for prec in self.resolve.groups.get(spec.name, ()) if spec.match(prec))
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012 Anaconda, Inc
+# SPDX-License-Identifier: BSD-3-Clause
+"""
+Parse time and peak memory of SubdirData for a synthetic 100k-record repodata.json.
+
+The ``eager`` variants touch every record, which is what every load cost before records were
+built lazily.  The ``lazy`` variants only query the handful of names a typical solve for a
+single spec reaches.  ``LoadRepodataJson`` compares reading the whole file and parsing it with
+``json.loads`` against the incremental ``load_repodata``, and ``ReadCachedJson`` the old
+``json.loads`` load of a cached repodata.json against ``SubdirData``'s streaming one.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+from os.path import join
+from tempfile import mkdtemp
+
+from conda.base.context import context
+from conda.core.subdir_data import SubdirData
+from conda.gateways.disk.delete import rm_rf
+from conda.gateways.repodata.stream import iter_repodata, load_repodata
+from conda.models.channel import Channel
+
+N_RECORDS = 100000
+N_NAMES = 10000
+
+
+def make_repodata(n_records=N_RECORDS, n_names=N_NAMES, subdir=context.subdir):
+    packages = {}
+    for i in range(n_records):
+        name = "pkg%d" % (i % n_names)
+        version = "%d.%d.%d" % (i // n_names, i % 7, i % 3)
+        build = "py37h%07x_%d" % (i, i % 3)
+        packages["%s-%s-%s.tar.bz2" % (name, version, build)] = {
+            "name": name,
+            "version": version,
+            "build": build,
+            "build_number": i % 3,
+            "depends": [
+                "python >=3.7,<3.8.0a0",
+                "pkg%d >=%d" % ((i + 1) % n_names, i % 5),
+                "libgcc-ng >=7.3.0",
+            ],
+            "license": "BSD-3-Clause",
+            "md5": "%032x" % i,
+            "size": 1000 + i,
+            "subdir": subdir,
+            "timestamp": 1562861325613 + i,
+        }
+    return json.dumps({"info": {"subdir": subdir}, "packages": packages})
+
+
+class ProcessRawRepodata:
+    timeout = 600
+
+    def setup(self):
+        self.raw_repodata_str = make_repodata()
+        self.subdir_data = SubdirData(Channel("https://conda.anaconda.org/bench/%s"
+                                              % context.subdir))
+
+    def _process(self):
+        self.subdir_data._process_raw_repodata_str(self.raw_repodata_str)
+        self.subdir_data._loaded = True
+
+    def time_eager(self):
+        self._process()
+        tuple(self.subdir_data.iter_records())
+
+    def time_lazy(self):
+        self._process()
+        for name in ("pkg1", "pkg2", "pkg3"):
+            tuple(self.subdir_data.query(name))
+
+    def peakmem_eager(self):
+        self.time_eager()
+
+    def peakmem_lazy(self):
+        self.time_lazy()
+
+
+class LoadRepodataJson:
+    timeout = 600
+
+    def setup(self):
+        self.tmpdir = mkdtemp()
+        self.path = join(self.tmpdir, "repodata.json")
+        with open(self.path, "w") as fh:
+            fh.write(make_repodata())
+
+    def teardown(self):
+        rm_rf(self.tmpdir)
+
+    def time_json_load(self):
+        with open(self.path) as fh:
+            json.loads(fh.read())
+
+    def time_load_repodata(self):
+        with open(self.path) as fh:
+            load_repodata(fh)
+
+    def peakmem_json_load(self):
+        self.time_json_load()
+
+    def peakmem_load_repodata(self):
+        self.time_load_repodata()
+
+
+class ReadCachedJson:
+    timeout = 600
+
+    def setup(self):
+        self.tmpdir = mkdtemp()
+        self.subdir_data = SubdirData(Channel("https://conda.anaconda.org/bench/%s"
+                                              % context.subdir))
+        self.path = join(self.tmpdir, "repodata.json")
+        with open(self.path, "w") as fh:
+            fh.write(make_repodata())
+
+    def teardown(self):
+        rm_rf(self.tmpdir)
+
+    def time_json_load(self):
+        with open(self.path) as fh:
+            self.subdir_data._process_raw_repodata(json.loads(fh.read()))
+
+    def time_streaming(self):
+        with open(self.path) as fh:
+            self.subdir_data._process_repodata_entries(iter_repodata(fh))
+
+    def peakmem_json_load(self):
+        self.time_json_load()
+
+    def peakmem_streaming(self):
+        self.time_streaming()
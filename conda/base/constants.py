@@ -219,6 +219,7 @@ class SatSolverChoice(Enum):
     PYCOSAT = 'pycosat'
     PYCRYPTOSAT = 'pycryptosat'
     PYSAT = 'pysat'
+    PYSAT_RC2 = 'pysat-rc2'
 
     def __str__(self):
         return self.value
@@ -229,6 +230,9 @@ PACKAGE_CACHE_MAGIC_FILE = 'urls.txt'
 PREFIX_MAGIC_FILE = join('conda-meta', 'history')
 
 PREFIX_STATE_FILE = join('conda-meta', 'state')
+# deliberately not *.json, which is reserved for package records
+PREFIX_RECORDS_INDEX_FILE = join('conda-meta', 'records_index')
+PREFIX_SITE_PACKAGES_INDEX_FILE = join('conda-meta', 'site_packages_index')
 PACKAGE_ENV_VARS_DIR = join('etc', 'conda', 'env_vars.d')
 CONDA_ENV_VARS_UNSET_VAR = "***unset***"
 
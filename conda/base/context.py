@@ -7,9 +7,11 @@ from collections import OrderedDict
 
 from errno import ENOENT
 from logging import getLogger
+from multiprocessing import cpu_count
 import os
 from os.path import abspath, basename, expanduser, isdir, isfile, join, split as path_split
 import platform
+import re
 import sys
 
 from .constants import (APP_NAME, ChannelPriority, DEFAULTS_CHANNEL_NAME, REPODATA_FN,
@@ -24,7 +26,8 @@ from .._vendor.auxlib.ish import dals
 from .._vendor.boltons.setutils import IndexedSet
 from .._vendor.frozendict import frozendict
 from .._vendor.toolz import concat, concatv, unique
-from ..common.compat import NoneType, iteritems, itervalues, odict, on_win, string_types
+from ..common.compat import (NoneType, iteritems, itervalues, odict, on_win, string_types,
+                             text_type)
 from ..common.configuration import (Configuration, ConfigurationLoadError, MapParameter,
                                     ParameterLoader, PrimitiveParameter, SequenceParameter,
                                     ValidationError)
@@ -121,6 +124,31 @@ def ssl_verify_validation(value):
     return True
 
 
+_SIZE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:I?B)?\s*$", re.IGNORECASE)
+
+
+def parse_size(value):
+    """
+    Parse a size given either as a number of bytes or as a string like '512MB' or '20 GB'.
+    Units are binary multiples, matching the output of conda.utils.human_bytes.
+    """
+    match = _SIZE_RE.match(text_type(value))
+    if not match:
+        raise ValueError("invalid size %r" % value)
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** ' KMGT'.index(unit.upper() or ' '))
+
+
+def size_validation(value):
+    try:
+        if parse_size(value) < 0:
+            raise ValueError(value)
+    except ValueError:
+        return ("size value '%s' must be a non-negative number of bytes, optionally with a "
+                "unit such as 'MB' or 'GB'" % value)
+    return True
+
+
 class Context(Configuration):
 
     add_pip_as_python_dependency = ParameterLoader(PrimitiveParameter(True))
@@ -153,11 +181,18 @@ class Context(Configuration):
                                        aliases=('default_threads',))
     _repodata_threads = ParameterLoader(PrimitiveParameter(0, element_type=int),
                                         aliases=('repodata_threads',))
+    repodata_processes = ParameterLoader(PrimitiveParameter(0, element_type=int))
     _verify_threads = ParameterLoader(PrimitiveParameter(0, element_type=int),
                                       aliases=('verify_threads',))
+    _fetch_threads = ParameterLoader(PrimitiveParameter(0, element_type=int),
+                                     aliases=('fetch_threads',))
+    _extract_threads = ParameterLoader(PrimitiveParameter(0, element_type=int),
+                                       aliases=('extract_threads',))
     # this one actually defaults to 1 - that is handled in the property below
     _execute_threads = ParameterLoader(PrimitiveParameter(0, element_type=int),
                                        aliases=('execute_threads',))
+    _compile_processes = ParameterLoader(PrimitiveParameter(0, element_type=int),
+                                         aliases=('compile_processes',))
 
     # Safety & Security
     _aggressive_update_packages = ParameterLoader(
@@ -182,6 +217,9 @@ class Context(Configuration):
     use_index_cache = ParameterLoader(PrimitiveParameter(False))
 
     separate_format_cache = ParameterLoader(PrimitiveParameter(False))
+    _package_cache_size_budget = ParameterLoader(
+        PrimitiveParameter('0', element_type=string_types, validation=size_validation),
+        aliases=('package_cache_size_budget',))
 
     _root_prefix = ParameterLoader(PrimitiveParameter(""), aliases=('root_dir', 'root_prefix'))
     _envs_dirs = ParameterLoader(
@@ -271,6 +309,7 @@ class Context(Configuration):
             ("current_repodata.json", REPODATA_FN)))
     _use_only_tar_bz2 = ParameterLoader(PrimitiveParameter(None, element_type=(bool, NoneType)),
                                         aliases=('use_only_tar_bz2',))
+    use_repodata_deltas = ParameterLoader(PrimitiveParameter(False))
 
     always_softlink = ParameterLoader(PrimitiveParameter(False), aliases=('softlink',))
     always_copy = ParameterLoader(PrimitiveParameter(False), aliases=('copy',))
@@ -439,6 +478,26 @@ class Context(Configuration):
             threads = 1
         return threads
 
+    @property
+    def fetch_threads(self):
+        if self._fetch_threads:
+            threads = self._fetch_threads
+        elif self.default_threads:
+            threads = self.default_threads
+        else:
+            threads = 5
+        return threads
+
+    @property
+    def extract_threads(self):
+        if self._extract_threads:
+            threads = self._extract_threads
+        elif self.default_threads:
+            threads = self.default_threads
+        else:
+            threads = 1
+        return threads
+
     @property
     def execute_threads(self):
         if self._execute_threads:
@@ -449,6 +508,15 @@ class Context(Configuration):
             threads = 1
         return threads
 
+    @property
+    def compile_processes(self):
+        if self._compile_processes:
+            return self._compile_processes
+        try:
+            return cpu_count()
+        except NotImplementedError:
+            return 1
+
     @property
     def subdir(self):
         if self._subdir:
@@ -516,6 +584,10 @@ class Context(Configuration):
                 fixed_dirs += user_data_dir(APP_NAME, APP_NAME),
             return tuple(IndexedSet(expand(join(p, cache_dir_name)) for p in (fixed_dirs)))
 
+    @property
+    def package_cache_size_budget(self):
+        return parse_size(self._package_cache_size_budget)
+
     @memoizedproperty
     def trash_dir(self):
         # TODO: this inline import can be cleaned up by moving pkgs_dir write detection logic
@@ -831,11 +903,14 @@ class Context(Configuration):
             'restore_free_channel',
             'repodata_fns',
             'use_only_tar_bz2',
+            'use_repodata_deltas',
             'repodata_threads',
+            'repodata_processes',
         )),
         ('Basic Conda Configuration', (  # TODO: Is there a better category name here?
             'envs_dirs',
             'pkgs_dirs',
+            'package_cache_size_budget',
             'default_threads',
         )),
         ('Network Configuration', (
@@ -872,8 +947,11 @@ class Context(Configuration):
             'shortcuts',
             'non_admin_enabled',
             'separate_format_cache',
+            'fetch_threads',
+            'extract_threads',
             'verify_threads',
             'execute_threads',
+            'compile_processes',
         )),
         ('Conda-build Configuration', (
             'bld_path',
@@ -1034,6 +1112,10 @@ class Context(Configuration):
             #     related warnings. Overrides the path_conflict configuration value when
             #     set to 'warn' or 'prevent'.
             #     """),
+            'compile_processes': dals("""
+                Python processes to use when compiling the .py files of noarch python packages
+                to .pyc files.  When not set, defaults to the number of CPUs.
+            """),
             'conda_build': dals("""
                 General configuration parameters for conda-build.
                 """),
@@ -1078,6 +1160,8 @@ class Context(Configuration):
                 which allows operations to choose themselves.  For more specific
                 control, see the other *_threads parameters:
                     * repodata_threads - for fetching/loading repodata
+                    * fetch_threads - for downloading packages
+                    * extract_threads - for extracting downloaded packages
                     * verify_threads - for verifying package contents in transactions
                     * execute_threads - for carrying out the unlinking and linking steps
             """),
@@ -1108,6 +1192,15 @@ class Context(Configuration):
                 defaults to 1.  This step is pretty strongly I/O limited, and you may not
                 see much benefit here.
             """),
+            'extract_threads': dals("""
+                Threads to use when extracting downloaded packages into the package cache.
+                Extraction overlaps the remaining downloads.  When not set, defaults to 1.
+            """),
+            'fetch_threads': dals("""
+                Threads to use when downloading packages into the package cache.  When not
+                set, defaults to 5.  Setting both fetch_threads and extract_threads to 1
+                downloads and extracts one package at a time.
+            """),
             'force_reinstall': dals("""
                 Ensure that any user-requested package for the current operation is uninstalled
                 and reinstalled, even if that package already exists in the environment.
@@ -1170,6 +1263,12 @@ class Context(Configuration):
             'pip_interop_enabled': dals("""
                 Allow the conda solver to interact with non-conda-installed python packages.
                 """),
+            'package_cache_size_budget': dals("""
+                The size each writable package cache directory may grow to, either in bytes or
+                with a unit (e.g. '20GB').  After a transaction, the least recently linked
+                packages that no environment hard-links files from are removed from the cache
+                until it fits.  The default of 0 never removes anything.
+                """),
             'pkgs_dirs': dals("""
                 The list of directories where locally-available packages are linked from at
                 install time. Packages not locally available are downloaded and extracted
@@ -1201,6 +1300,11 @@ class Context(Configuration):
                 read timeout is the number of seconds conda will wait for the server to send
                 a response.
                 """),
+            'repodata_processes': dals("""
+                Worker processes to use for downloading and parsing repodata when more than
+                one channel subdir needs loading.  Parsed repodata is handed back through the
+                on-disk repodata cache.  The default of 0 loads all repodata in this process.
+            """),
             'repodata_threads': dals("""
                 Threads to use when downloading and reading repodata.  When not set,
                 defaults to None, which uses the default ThreadPoolExecutor behavior.
@@ -1268,6 +1372,12 @@ class Context(Configuration):
                 This is forced to True if conda-build is installed and older than 3.18.3,
                 because older versions of conda break when conda feeds it the new file format.
                 """),
+            'use_repodata_deltas': dals("""
+                When cached repodata has expired, first look for a delta file published by the
+                channel next to its repodata (e.g. repodata.delta.json), and apply it to the
+                cached copy instead of downloading the full repodata again. Channels that
+                don't publish deltas fall back to the full download.
+                """),
             'verbosity': dals("""
                 Sets output log level. 0 is warn. 1 is info. 2 is debug. 3 is trace.
                 """),
@@ -1308,6 +1418,10 @@ def reset_context(search_path=SEARCH_PATH, argparse_args=None):
     context.__dict__.pop('_Context__conda_build', None)
     from ..models.channel import Channel
     Channel._reset_state()
+    from ..models.match_spec import MatchSpec
+    MatchSpec._reset_state()
+    from ..gateways.connection.session import CondaSession
+    CondaSession._reset_state()
     # need to import here to avoid circular dependency
     return context
 
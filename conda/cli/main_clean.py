@@ -5,8 +5,9 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 from collections import defaultdict
 import fnmatch
+from functools import partial
 from logging import getLogger
-from os import listdir, lstat, unlink, walk
+from os import unlink, walk
 from os.path import exists, getsize, isdir, join
 import sys
 
@@ -18,18 +19,23 @@ log = getLogger(__name__)
 
 def find_tarballs():
     from ..core.package_cache_data import PackageCacheData
+    from ..gateways.connection.download import PARTIAL_EXTENSION
+    from ..gateways.disk.scan import iter_entries
     pkgs_dirs = defaultdict(list)
     totalsize = 0
-    part_ext = tuple(e + '.part' for e in CONDA_PACKAGE_EXTENSIONS)
+    part_ext = tuple(e + ext for e in CONDA_PACKAGE_EXTENSIONS
+                     for ext in ('.part', PARTIAL_EXTENSION))
     for package_cache in PackageCacheData.writable_caches(context.pkgs_dirs):
         pkgs_dir = package_cache.pkgs_dir
         if not isdir(pkgs_dir):
             continue
-        root, _, filenames = next(walk(pkgs_dir))
-        for fn in filenames:
+        for entry in iter_entries(pkgs_dir):
+            fn = entry.name
             if fn.endswith(CONDA_PACKAGE_EXTENSIONS) or fn.endswith(part_ext):
+                if entry.is_dir():
+                    continue
                 pkgs_dirs[pkgs_dir].append(fn)
-                totalsize += getsize(join(root, fn))
+                totalsize += entry.stat().st_size
 
     return pkgs_dirs, totalsize
 
@@ -85,52 +91,45 @@ def rm_tarballs(args, pkgs_dirs, totalsize, verbose=True):
                     log.info("%r", e)
 
 
+def _extracted_packages(pkgs_dir):
+    from ..gateways.disk.scan import iter_entries
+    # skip extractions still in progress
+    return [entry.name for entry in iter_entries(pkgs_dir)
+            if not entry.name.endswith(CONDA_TEMP_EXTENSION)
+            and entry.is_dir() and isdir(join(entry.path, 'info'))]
+
+
 def find_pkgs():
     # TODO: This doesn't handle packages that have hard links to files within
     # themselves, like bin/python3.3 and bin/python3.3m in the Python package
     warnings = []
 
-    from ..gateways.disk.link import CrossPlatformStLink
-    cross_platform_st_nlink = CrossPlatformStLink()
-    pkgs_dirs = defaultdict(list)
-    for pkgs_dir in context.pkgs_dirs:
-        if not exists(pkgs_dir):
-            if not context.json:
-                print("WARNING: {0} does not exist".format(pkgs_dir))
-            continue
-        pkgs = [i for i in listdir(pkgs_dir) if isdir(join(pkgs_dir, i, 'info'))]
-        for pkg in pkgs:
-            breakit = False
-            for root, dir, files in walk(join(pkgs_dir, pkg)):
-                for fn in files:
-                    try:
-                        st_nlink = cross_platform_st_nlink(join(root, fn))
-                    except OSError as e:
-                        warnings.append((fn, e))
-                        continue
-                    if st_nlink > 1:
-                        # print('%s is installed: %s' % (pkg, join(root, fn)))
-                        breakit = True
-                        break
-
-                if breakit:
-                    break
-            else:
-                pkgs_dirs[pkgs_dir].append(pkg)
+    from ..common.io import ThreadLimitedThreadPoolExecutor
+    from ..gateways.disk.scan import directory_usage
+    scan = partial(directory_usage, stop_at_hard_link=True)
 
+    pkgs_dirs = defaultdict(list)
     totalsize = 0
     pkgsizes = defaultdict(list)
-    for pkgs_dir in pkgs_dirs:
-        for pkg in pkgs_dirs[pkgs_dir]:
-            pkgsize = 0
-            for root, dir, files in walk(join(pkgs_dir, pkg)):
-                for fn in files:
-                    # We don't have to worry about counting things twice:  by
-                    # definition these files all have a link count of 1!
-                    size = lstat(join(root, fn)).st_size
-                    totalsize += size
-                    pkgsize += size
-            pkgsizes[pkgs_dir].append(pkgsize)
+    # scanning is bound by filesystem latency rather than cpu, so use as many threads as
+    #   we would for downloads
+    with ThreadLimitedThreadPoolExecutor(context.fetch_threads) as executor:
+        for pkgs_dir in context.pkgs_dirs:
+            if not exists(pkgs_dir):
+                if not context.json:
+                    print("WARNING: {0} does not exist".format(pkgs_dir))
+                continue
+            pkgs = _extracted_packages(pkgs_dir)
+            paths = (join(pkgs_dir, pkg) for pkg in pkgs)
+            for pkg, usage in zip(pkgs, executor.map(scan, paths)):
+                warnings.extend(usage.errors)
+                if usage.hard_linked:
+                    continue
+                # We don't have to worry about counting things twice:  by
+                # definition these files all have a link count of 1!
+                pkgs_dirs[pkgs_dir].append(pkg)
+                pkgsizes[pkgs_dir].append(usage.size)
+                totalsize += usage.size
 
     return pkgs_dirs, warnings, totalsize, pkgsizes
 
@@ -6,7 +6,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 import hashlib
 import json
 import os
-from os.path import abspath, basename, dirname, isdir, isfile, islink, join
+from os.path import abspath, basename, dirname, isdir, isfile, islink, join, relpath
 import re
 import tarfile
 import tempfile
@@ -15,7 +15,6 @@ from .._vendor.auxlib.entity import EntityEncoder
 from ..base.constants import CONDA_PACKAGE_EXTENSION_V1
 from ..base.context import context
 from ..common.compat import PY3
-from ..common.path import paths_equal
 from ..core.prefix_data import PrefixData
 from ..gateways.disk.delete import rmtree
 from ..install import PREFIX_PLACEHOLDER
@@ -209,9 +208,9 @@ def which_package(path):
         from ..exceptions import CondaVerificationError
         raise CondaVerificationError("could not determine conda prefix from: %s" % path)
 
-    for prec in PrefixData(prefix).iter_records():
-        if any(paths_equal(join(prefix, f), path) for f in prec['files'] or ()):
-            yield prec
+    short_path = relpath(path, prefix).replace(os.sep, '/')
+    for prec in PrefixData(prefix).path_owners(short_path):
+        yield prec
 
 
 def which_prefix(path):
@@ -9,6 +9,7 @@ from array import array
 from itertools import combinations
 from logging import DEBUG, getLogger
 from sys import maxsize
+from time import time
 
 log = getLogger(__name__)
 
@@ -129,6 +130,10 @@ class _SatSolver(object):
     """
     Simple wrapper to call a SAT solver given a _ClauseList/_ClauseArray instance.
     """
+    # Whether variables handed to the solver must stay valid across save_state/restore_state.
+    incremental = False
+    # Whether the solver provides `run_maxsat` for sum objectives.
+    maxsat = False
 
     def __init__(self, **run_kwargs):
         self._run_kwargs = run_kwargs or {}
@@ -198,16 +203,95 @@ class _PycoSatSolver(_SatSolver):
         return sat_solution
 
 
-class _PyCryptoSatSolver(_SatSolver):
+class _IncrementalSatSolver(_SatSolver):
+    """
+    Wrapper for SAT solvers that accept assumptions, keeping one live solver instance.
+
+    Clauses are handed to the solver in contiguous groups, each guarded by a fresh selector
+    variable that is passed as an assumption to every run.  `restore_state` retires the
+    selectors of the groups it drops with a unit clause instead of rebuilding the solver,
+    so each bisection step in `Clauses.minimize` only adds its own bound constraints.
+    Selectors are allocated through `new_var`, hence the variables of retired groups are
+    never reused by the caller.
+    """
+    incremental = True
+
+    def __init__(self, new_var, **run_kwargs):
+        super(_IncrementalSatSolver, self).__init__(**run_kwargs)
+        self._new_var = new_var
+        self._solver = None
+        self._groups = []  # List[Tuple[start, end, selector]] of clause ranges in the solver
+        self._last_saved_state = 0
+
+    def save_state(self):
+        saved_state = self._clauses.save_state()
+        self._last_saved_state = saved_state
+        return saved_state
+
+    def restore_state(self, saved_state):
+        self._clauses.restore_state(saved_state)
+        groups = self._groups
+        while groups and groups[-1][1] > saved_state:
+            start, _, selector = groups.pop()
+            self.add_solver_clauses(self._solver, [(-selector,)])
+            if start < saved_state:
+                # The clauses below the saved state are kept; re-add them in their own group.
+                self._feed(start, saved_state)
+
+    def _fed_count(self):
+        return self._groups[-1][1] if self._groups else 0
+
+    def _feed(self, start, end):
+        selector = self._new_var()
+        guarded = [tuple(c) + (-selector,) for c in self._clauses.as_list()[start:end]]
+        self.add_solver_clauses(self._solver, guarded)
+        self._groups.append((start, end, selector))
+
+    def _feed_pending(self):
+        """Hand the clauses added since the last run to the solver; return all selectors."""
+        fed_count = self._fed_count()
+        clause_count = len(self._clauses.as_list())
+        # Split at the last saved state so that clauses added for a single run, e.g. the
+        # `additional` clauses of `Clauses.sat`, can later be dropped on their own.
+        if fed_count < self._last_saved_state < clause_count:
+            self._feed(fed_count, self._last_saved_state)
+            fed_count = self._last_saved_state
+        if fed_count < clause_count:
+            self._feed(fed_count, clause_count)
+        return [group[2] for group in self._groups]
+
+    def run(self, m, **kwargs):
+        if self._solver is None:
+            run_kwargs = self._run_kwargs.copy()
+            run_kwargs.update(kwargs)
+            self._solver = self.setup(m, **run_kwargs)
+        sat_solution = self.invoke(self._solver, self._feed_pending())
+        return self.process_solution(sat_solution)
+
+    def setup(self, m, **kwargs):
+        """Create an empty solver instance and return it."""
+        raise NotImplementedError()
+
+    def add_solver_clauses(self, solver, clauses):
+        """Add the given clauses permanently to the solver instance."""
+        raise NotImplementedError()
+
+    def invoke(self, solver, assumptions):
+        """Solve under the given assumptions and return the calculated solution."""
+        raise NotImplementedError()
+
+
+class _PyCryptoSatSolver(_IncrementalSatSolver):
     def setup(self, m, threads=1, **kwargs):
         from pycryptosat import Solver
 
-        solver = Solver(threads=threads)
-        solver.add_clauses(self._clauses.as_list())
-        return solver
+        return Solver(threads=threads)
 
-    def invoke(self, solver):
-        sat, sat_solution = solver.solve()
+    def add_solver_clauses(self, solver, clauses):
+        solver.add_clauses(clauses)
+
+    def invoke(self, solver, assumptions):
+        sat, sat_solution = solver.solve(assumptions)
         if not sat:
             sat_solution = None
         return sat_solution
@@ -220,20 +304,20 @@ class _PyCryptoSatSolver(_SatSolver):
         return solution
 
 
-class _PySatSolver(_SatSolver):
+class _PySatSolver(_IncrementalSatSolver):
     def setup(self, m, **kwargs):
         from pysat.solvers import Glucose4
 
-        solver = Glucose4()
-        solver.append_formula(self._clauses.as_list())
-        return solver
+        return Glucose4()
 
-    def invoke(self, solver):
-        if not solver.solve():
+    def add_solver_clauses(self, solver, clauses):
+        solver.append_formula(clauses)
+
+    def invoke(self, solver, assumptions):
+        if not solver.solve(assumptions=assumptions):
             sat_solution = None
         else:
             sat_solution = solver.get_model()
-        solver.delete()
         return sat_solution
 
     def process_solution(self, sat_solution):
@@ -244,10 +328,125 @@ class _PySatSolver(_SatSolver):
         return solution
 
 
+class _SharedIDPool(object):
+    """
+    Stand-in for the `IDPool` of RC2 that allocates its variables through `new_var`, so
+    they never clash with the selectors the live solver allocates meanwhile.
+    """
+    def __init__(self, new_var, top):
+        self._new_var = new_var
+        self._top = top
+
+    def id(self, obj=None):
+        self._top = self._new_var()
+        return self._top
+
+    @property
+    def top(self):
+        return self._top
+
+    @top.setter
+    def top(self, top):
+        # RC2 reserves the variables of each totalizer it builds by raising `top`
+        while self._top < top:
+            self.id()
+
+
+class _RC2Oracle(object):
+    """
+    SAT oracle for RC2 on top of the live solver of a `_PySatRC2Solver`.
+
+    The clauses RC2 adds go to the clause list, guarded like any other clause, and the
+    group selectors are passed along with the assumptions of every call.
+    """
+    def __init__(self, sat_solver):
+        self._sat_solver = sat_solver
+        self._selectors = frozenset()
+        self.calls = 0
+
+    def add_clause(self, clause):
+        self._sat_solver.add_clause(tuple(clause))
+
+    def solve(self, assumptions=()):
+        selectors = self._sat_solver._feed_pending()
+        self._selectors = frozenset(selectors)
+        self.calls += 1
+        return self._sat_solver._solver.solve(assumptions=selectors + list(assumptions))
+
+    def get_core(self):
+        core = self._sat_solver._solver.get_core()
+        if core:
+            core = [lit for lit in core if lit not in self._selectors]
+        return core
+
+    def get_model(self):
+        return self._sat_solver._solver.get_model()
+
+    def supports_atmost(self):
+        return False
+
+    def delete(self):
+        pass
+
+
+class _PySatRC2Solver(_PySatSolver):
+    """
+    PySAT backend that hands the sum objectives of `Clauses.minimize` to the RC2 MaxSAT
+    solver, instead of bisecting over BDD-encoded `LinearBound` constraints; only the
+    optimum it finds is encoded.  RC2 runs on the same live solver as every other call.
+    """
+    maxsat = True
+
+    def run_maxsat(self, m, lits, coeffs):
+        """
+        Return the minimum sum of the coefficients of the true literals over all solutions
+        of the clauses, or None if the clauses are unsatisfiable.
+
+        The clauses RC2 adds are left in the clause list for the caller to drop with
+        `restore_state`.
+        """
+        from pysat.examples.rc2 import RC2
+        from pysat.formula import WCNF
+
+        if self._solver is None:
+            self._solver = self.setup(m, **self._run_kwargs)
+        start = time()
+        wcnf = WCNF()
+        wcnf.nv = m
+        rc2 = RC2(wcnf)
+        # RC2 made its own oracle with no clauses; swap in the live solver instead
+        rc2.oracle.delete()
+        oracle = rc2.oracle = _RC2Oracle(self)
+        pool = rc2.pool = _SharedIDPool(self._new_var, m)
+        new_var, self._new_var = self._new_var, pool.id
+        try:
+            for lit, coeff in zip(lits, coeffs):
+                rc2.add_clause((-lit,), weight=coeff)
+            if not rc2.compute_():
+                return None
+        finally:
+            self._new_var = new_var
+            rc2.delete()
+        log.debug("RC2 optimum %d after %d SAT calls in %.3fs",
+                  rc2.cost, oracle.calls, time() - start)
+        return rc2.cost
+
+    def run_fresh(self, m):
+        """
+        Solve the clauses with a new solver instance.  Unlike `run`, the solution does not
+        depend on what the live solver learned from earlier runs.
+        """
+        from pysat.solvers import Glucose4
+
+        with Glucose4(bootstrap_with=self._clauses.as_list()) as solver:
+            return self.invoke(solver, [])
+
+
 _sat_solver_str_to_cls = {
     "pycosat": _PycoSatSolver,
     "pycryptosat": _PyCryptoSatSolver,
     "pysat": _PySatSolver,
+    "pysat-rc2": _PySatRC2Solver,
 }
 
 _sat_solver_cls_to_str = {cls: string for string, cls in _sat_solver_str_to_cls.items()}
@@ -266,7 +465,10 @@ class Clauses(object):
             sat_solver_cls = _sat_solver_str_to_cls[sat_solver_str]
         except KeyError:
             raise NotImplementedError("Unknown SAT solver: {}".format(sat_solver_str))
-        self._sat_solver = sat_solver_cls()
+        if sat_solver_cls.incremental:
+            self._sat_solver = sat_solver_cls(self.new_var)
+        else:
+            self._sat_solver = sat_solver_cls()
 
         # Bind some methods of _sat_solver to reduce lookups and call overhead.
         self.add_clause = self._sat_solver.add_clause
@@ -677,6 +879,7 @@ class Clauses(object):
                 log.trace('Beginning sum minimization')
                 objval = sum_val
 
+            start = time()
             objective_dict = {a: c for c, a in zip(coeffs, lits)}
             bestval = objval(bestsol, objective_dict)
 
@@ -690,53 +893,68 @@ class Clauses(object):
             saved_state = self._sat_solver.save_state()
             if trymax and not peak:
                 try0 = hi - 1
-
-            log.trace("Initial range (%d,%d)" % (lo, hi))
-            while True:
-                if try0 is None:
-                    mid = (lo+hi) // 2
-                else:
-                    mid = try0
-                if peak:
-                    prevent = tuple(a for c, a in zip(coeffs, lits) if c > mid)
-                    require = tuple(a for c, a in zip(coeffs, lits) if lo <= c <= mid)
-                    self.Prevent(self.Any, prevent)
-                    if require:
-                        self.Require(self.Any, require)
-                else:
-                    self.Require(self.LinearBound, lits, coeffs, lo, mid, False)
-
-                if log.isEnabledFor(DEBUG):
-                    log.trace('Bisection attempt: (%d,%d), (%d+%d) clauses' %
-                              (lo, mid, nz, self.get_clause_count() - nz))
-                newsol = self.sat()
-                if newsol is None:
-                    lo = mid + 1
-                    log.trace("Bisection failure, new range=(%d,%d)" % (lo, hi))
-                    if lo > hi:
-                        # FIXME: This is not supposed to happen!
-                        # TODO: Investigate and fix the cause.
-                        break
-                    # If this was a failure of the first test after peak minimization,
-                    # then it means that the peak minimizer is "tight" and we don't need
-                    # any further constraints.
-                else:
-                    done = lo == mid
-                    bestsol = newsol
-                    bestval = objval(newsol, objective_dict)
-                    hi = bestval
-                    log.trace("Bisection success, new range=(%d,%d)" % (lo, hi))
-                    if done:
-                        break
-                self.m = m_orig
-                # Since we only ever _add_ clauses and only remove then via
-                # restore_state, it's fine to test on equality only.
-                if self._sat_solver.save_state() != saved_state:
-                    self._sat_solver.restore_state(saved_state)
-                self.unsat = False
-                try0 = None
-
-            log.debug('Final %s objective: %d' % ('peak' if peak else 'sum', bestval))
+            optimum = None
+            if not peak and self._sat_solver.maxsat:
+                optimum = self._sat_solver.run_maxsat(self.m, lits, coeffs)
+                self._sat_solver.restore_state(saved_state)
+            if optimum is not None:
+                # Fix the optimum the way the last bisection step does, and take the solution
+                # from a fresh solver: ties among optimal solutions are then broken by the
+                # clauses alone, as with a non-incremental solver.
+                self.Require(self.LinearBound, lits, coeffs, optimum, optimum, False)
+                bestsol = self._sat_solver.run_fresh(self.m)
+                bestval = objval(bestsol, objective_dict)
+            else:
+                log.trace("Initial range (%d,%d)" % (lo, hi))
+                while True:
+                    if try0 is None:
+                        mid = (lo+hi) // 2
+                    else:
+                        mid = try0
+                    if peak:
+                        prevent = tuple(a for c, a in zip(coeffs, lits) if c > mid)
+                        require = tuple(a for c, a in zip(coeffs, lits) if lo <= c <= mid)
+                        self.Prevent(self.Any, prevent)
+                        if require:
+                            self.Require(self.Any, require)
+                    else:
+                        self.Require(self.LinearBound, lits, coeffs, lo, mid, False)
+
+                    if log.isEnabledFor(DEBUG):
+                        log.trace('Bisection attempt: (%d,%d), (%d+%d) clauses' %
+                                  (lo, mid, nz, self.get_clause_count() - nz))
+                    newsol = self.sat()
+                    if newsol is None:
+                        lo = mid + 1
+                        log.trace("Bisection failure, new range=(%d,%d)" % (lo, hi))
+                        if lo > hi:
+                            # FIXME: This is not supposed to happen!
+                            # TODO: Investigate and fix the cause.
+                            break
+                        # If this was a failure of the first test after peak minimization,
+                        # then it means that the peak minimizer is "tight" and we don't need
+                        # any further constraints.
+                    else:
+                        done = lo == mid
+                        bestsol = newsol
+                        bestval = objval(newsol, objective_dict)
+                        hi = bestval
+                        log.trace("Bisection success, new range=(%d,%d)" % (lo, hi))
+                        if done:
+                            break
+                    if not self._sat_solver.incremental:
+                        # Variables of dropped clauses can only be reused if the solver
+                        # does not keep them around.
+                        self.m = m_orig
+                    # Since we only ever _add_ clauses and only remove then via
+                    # restore_state, it's fine to test on equality only.
+                    if self._sat_solver.save_state() != saved_state:
+                        self._sat_solver.restore_state(saved_state)
+                    self.unsat = False
+                    try0 = None
+
+            log.debug('Final %s objective: %d (%.3fs)'
+                      % ('peak' if peak else 'sum', bestval, time() - start))
             if bestval == 0:
                 break
             elif peak:
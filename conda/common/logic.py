@@ -46,6 +46,7 @@ FALSE = FALSE
 PycoSatSolver = "pycosat"
 PyCryptoSatSolver = "pycryptosat"
 PySatSolver = "pysat"
+PySatRC2Solver = "pysat-rc2"
 
 
 class Clauses(object):
@@ -79,7 +80,7 @@ class Clauses(object):
         return self._check_variable(literal)
 
     def add_clause(self, clause):
-        self._clauses.add_clause(map(self._check_variable, self._convert(clause)))
+        self._clauses.add_clause(tuple(map(self._check_variable, self._convert(clause))))
 
     def add_clauses(self, clauses):
         for clause in clauses:
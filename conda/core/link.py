@@ -36,7 +36,8 @@ from ..exceptions import (DisallowedPackageError, EnvironmentNotWritableError,
 from ..gateways.disk import mkdir_p
 from ..gateways.disk.delete import rm_rf
 from ..gateways.disk.read import isfile, lexists, read_package_info
-from ..gateways.disk.test import hardlink_supported, is_conda_environment, softlink_supported
+from ..gateways.disk.test import (hardlink_supported, is_conda_environment, reflink_supported,
+                                  softlink_supported)
 from ..gateways.subprocess import subprocess_call
 from ..models.enums import LinkType
 from ..models.version import VersionOrder
@@ -49,13 +50,21 @@ log = getLogger(__name__)
 def determine_link_type(extracted_package_dir, target_prefix):
     source_test_file = join(extracted_package_dir, 'info', 'index.json')
     if context.always_copy:
-        return LinkType.copy
+        return _copy_link_type(source_test_file, target_prefix)
     if context.always_softlink:
         return LinkType.softlink
     if hardlink_supported(source_test_file, target_prefix):
         return LinkType.hardlink
     if context.allow_softlinks and softlink_supported(source_test_file, target_prefix):
         return LinkType.softlink
+    return _copy_link_type(source_test_file, target_prefix)
+
+
+def _copy_link_type(source_test_file, target_prefix):
+    # a reflink is a copy as far as the environment is concerned, but costs about as much
+    #   as a hard link to make
+    if reflink_supported(source_test_file, target_prefix):
+        return LinkType.reflink
     return LinkType.copy
 
 
@@ -250,6 +259,20 @@ class UnlinkLinkTransaction(object):
         finally:
             rm_rf(self.transaction_context['temp_dir'])
 
+        self._maintain_package_caches()
+
+    def _maintain_package_caches(self):
+        # bookkeeping only; never let it fail a transaction that has already succeeded
+        try:
+            link_precs = concat(stp.link_precs for stp in itervalues(self.prefix_setups))
+            PackageCacheData.record_usage(PackageCacheData.get_entry_to_link(prec)
+                                          for prec in link_precs)
+            if context.package_cache_size_budget:
+                PackageCacheData.evict_all(context.package_cache_size_budget)
+        except Exception as e:
+            log.warning("Unable to update package cache usage or evict packages.\n  %r", e)
+            log.debug("package cache maintenance failed", exc_info=True)
+
     def _get_pfe(self):
         from .package_cache_data import ProgressiveFetchExtract
         if self._pfe is not None:
@@ -446,6 +469,7 @@ class UnlinkLinkTransaction(object):
                               for axn in grp.actions
                               if isinstance(axn, CreatePrefixRecordAction))
 
+        prefix_data = PrefixData(target_prefix)
         error_results = []
         # Verification 1. each path either doesn't already exist in the prefix, or will be unlinked
         link_paths_dict = defaultdict(list)
@@ -465,11 +489,7 @@ class UnlinkLinkTransaction(object):
                     link_paths_dict[path].append(axn)
                     if path not in unlink_paths and lexists(join(target_prefix, path)):
                         # we have a collision; at least try to figure out where it came from
-                        colliding_prefix_rec = first(
-                            (prefix_rec for prefix_rec in
-                             PrefixData(target_prefix).iter_records()),
-                            key=lambda prefix_rec: path in prefix_rec.files
-                        )
+                        colliding_prefix_rec = first(prefix_data.path_owners(path))
                         if colliding_prefix_rec:
                             error_results.append(KnownPackageClobberError(
                                 path,
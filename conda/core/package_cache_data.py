@@ -5,37 +5,48 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 import codecs
 from collections import defaultdict
+from contextlib import contextmanager
 from errno import EACCES, ENOENT, EPERM, EROFS
+import json
 from logging import getLogger
-from os import listdir
+from os import listdir, lstat
 from os.path import basename, dirname, getsize, join
 from sys import platform
 from tarfile import ReadError
+from threading import Lock
+from time import time
+from uuid import uuid4
 
-from .path_actions import CacheUrlAction, ExtractPackageAction
+from .path_actions import CacheUrlAction, ExtractPackageAction, package_cache_lock
 from .. import CondaError, CondaMultiError, conda_signal_handler
 from .._vendor.auxlib.collection import first
 from .._vendor.auxlib.decorators import memoizemethod
 from .._vendor.toolz import concat, concatv, groupby
 from ..base.constants import (CONDA_PACKAGE_EXTENSIONS, CONDA_PACKAGE_EXTENSION_V1,
-                              CONDA_PACKAGE_EXTENSION_V2, PACKAGE_CACHE_MAGIC_FILE)
+                              CONDA_PACKAGE_EXTENSION_V2, CONDA_TEMP_EXTENSION,
+                              PACKAGE_CACHE_MAGIC_FILE)
 from ..base.context import context
 from ..common.compat import (JSONDecodeError, iteritems, itervalues, odict, string_types,
                              text_type, with_metaclass)
 from ..common.constants import NULL
-from ..common.io import ProgressBar, time_recorder
+from ..common.io import (ProgressBar, ThreadLimitedThreadPoolExecutor, as_completed,
+                         time_recorder)
 from ..common.path import expand, strip_pkg_extension, url_to_path
 from ..common.signals import signal_handler
 from ..common.url import path_to_url
 from ..exceptions import NoWritablePkgsDirError, NotWritableError
+from ..gateways.disk import mkdir_p
 from ..gateways.disk.create import (create_package_cache_directory, extract_tarball,
                                     write_as_json_to_file)
 from ..gateways.disk.delete import rm_rf
 from ..gateways.disk.read import (compute_md5sum, isdir, isfile, islink,
                                   read_index_json, read_index_json_from_tarball,
                                   read_repodata_json)
+from ..gateways.disk.scan import directory_usage
 from ..gateways.disk.test import file_path_is_writable
+from ..gateways.disk.update import backoff_rename
 from ..models.match_spec import MatchSpec
+from ..models.record_index import RecordIndex
 from ..models.records import PackageCacheRecord, PackageRecord
 from ..utils import human_bytes
 
@@ -68,9 +79,11 @@ class PackageCacheData(object):
     def __init__(self, pkgs_dir):
         self.pkgs_dir = pkgs_dir
         self.__package_cache_records = None
+        self.__record_index = None
         self.__is_writable = NULL
 
         self._urls_data = UrlsData(pkgs_dir)
+        self._cache_index = PackageCacheIndex(pkgs_dir)
 
     def insert(self, package_cache_record):
 
@@ -78,6 +91,8 @@ class PackageCacheData(object):
         write_as_json_to_file(meta, PackageRecord.from_objects(package_cache_record))
 
         self._package_cache_records[package_cache_record] = package_cache_record
+        self.__record_index = None
+        self._cache_index.update(package_cache_record)
 
     def load(self):
         self.__package_cache_records = _package_cache_records = {}
@@ -86,16 +101,36 @@ class PackageCacheData(object):
             # no directory exists, and we didn't have permissions to create it
             return
 
+        cache_index = self._cache_index
+        dir_mtime = _mtime(self.pkgs_dir)
+        if cache_index.read() and cache_index.listing_is_current(dir_mtime):
+            # nothing was added to or removed from pkgs_dir since the index was written
+            base_names = tuple(cache_index.entries)
+        else:
+            # directories ending in CONDA_TEMP_EXTENSION are extractions still in progress
+            base_names = tuple(base_name for base_name in
+                               self._dedupe_pkgs_dir_contents(listdir(self.pkgs_dir))
+                               if not base_name.endswith(CONDA_TEMP_EXTENSION)
+                               and not islink(join(self.pkgs_dir, base_name)))
+            cache_index.set_listing(base_names, dir_mtime)
+
         _CONDA_TARBALL_EXTENSIONS = CONDA_PACKAGE_EXTENSIONS
-        for base_name in self._dedupe_pkgs_dir_contents(listdir(self.pkgs_dir)):
-            full_path = join(self.pkgs_dir, base_name)
-            if islink(full_path):
-                continue
-            elif (isdir(full_path) and isfile(join(full_path, 'info', 'index.json'))
-                  or isfile(full_path) and full_path.endswith(_CONDA_TARBALL_EXTENSIONS)):
-                package_cache_record = self._make_single_record(base_name)
-                if package_cache_record:
-                    _package_cache_records[package_cache_record] = package_cache_record
+        for base_name in base_names:
+            try:
+                package_cache_record = cache_index.get_record(base_name)
+            except KeyError:
+                full_path = join(self.pkgs_dir, base_name)
+                if (isdir(full_path) and isfile(join(full_path, 'info', 'index.json'))
+                        or isfile(full_path) and full_path.endswith(_CONDA_TARBALL_EXTENSIONS)):
+                    package_cache_record = self._make_single_record(base_name)
+                else:
+                    package_cache_record = None
+                cache_index.set_record(base_name, package_cache_record)
+            if package_cache_record:
+                _package_cache_records[package_cache_record] = package_cache_record
+
+        if self.is_writable:
+            cache_index.save()
 
     def reload(self):
         self.load()
@@ -112,10 +147,99 @@ class PackageCacheData(object):
                 raise
 
     def remove(self, package_ref, default=NULL):
+        self.__record_index = None
         if default is NULL:
-            return self._package_cache_records.pop(package_ref)
+            package_cache_record = self._package_cache_records.pop(package_ref)
         else:
-            return self._package_cache_records.pop(package_ref, default)
+            package_cache_record = self._package_cache_records.pop(package_ref, default)
+        if isinstance(package_cache_record, PackageCacheRecord):
+            self._cache_index.discard(package_cache_record)
+        return package_cache_record
+
+    def save_index(self):
+        """Write out changes made by insert() and remove() to the on-disk cache index."""
+        if self.is_writable:
+            self._cache_index.save()
+
+    @classmethod
+    def record_usage(cls, package_cache_records, timestamp=None):
+        """Note that the given records were just linked from, for least-recently-used eviction."""
+        timestamp = time() if timestamp is None else timestamp
+        caches = set()
+        for pcrec in package_cache_records:
+            cache = cls(dirname(pcrec.extracted_package_dir))
+            if cache.is_writable:
+                cache._package_cache_records  # make sure the cache index has been read
+                cache._cache_index.mark_used(pcrec, timestamp)
+                caches.add(cache)
+        for cache in caches:
+            cache.save_index()
+
+    @classmethod
+    def evict_all(cls, size_budget=None, pkgs_dirs=None):
+        """
+        Shrink every writable package cache to ``size_budget`` bytes (default
+        context.package_cache_size_budget; 0 means no limit).  Returns the evicted records.
+        """
+        if size_budget is None:
+            size_budget = context.package_cache_size_budget
+        if not size_budget:
+            return ()
+        return tuple(concat(cache.evict(size_budget)
+                            for cache in cls.writable_caches(pkgs_dirs)))
+
+    def evict(self, size_budget):
+        """
+        Remove least recently used packages, extracted directory and tarballs, until the
+        packages in this cache take up no more than ``size_budget`` bytes.  Packages that still
+        have files hard-linked into an environment are kept, since removing them would free
+        little space.  Returns the evicted records.
+        """
+        cache_index = self._cache_index
+        pcrecs = tuple(self.iter_records())
+
+        def tarball_paths(pcrec):
+            extracted_package_dir = pcrec.extracted_package_dir
+            return tuple(extracted_package_dir + ext for ext in CONDA_PACKAGE_EXTENSIONS
+                         if isfile(extracted_package_dir + ext))
+
+        sizes = {pcrec: cache_index.extracted_size(pcrec)
+                 + sum(getsize(path) for path in tarball_paths(pcrec))
+                 for pcrec in pcrecs}
+        total_size = sum(itervalues(sizes))
+        log.debug("package cache %s holds %s of packages; budget is %s", self.pkgs_dir,
+                  human_bytes(total_size), human_bytes(size_budget))
+
+        def last_used(pcrec):
+            return (cache_index.last_used.get(basename(pcrec.extracted_package_dir))
+                    or _mtime(join(pcrec.extracted_package_dir, 'info', 'repodata_record.json'))
+                    or 0)
+
+        evicted = []
+        for pcrec in sorted(pcrecs, key=last_used):
+            if total_size <= size_budget:
+                break
+            if _has_hard_links(pcrec.extracted_package_dir):
+                continue
+            extracted_dirname = basename(pcrec.extracted_package_dir)
+            lock_names = (extracted_dirname, ) + tuple(
+                extracted_dirname + ext for ext in CONDA_PACKAGE_EXTENSIONS
+            )
+            with _try_package_cache_locks(self.pkgs_dir, lock_names) as locked:
+                if not locked:
+                    log.debug("not evicting %s from package cache %s; another conda process"
+                              " is fetching or extracting it", pcrec.dist_str(), self.pkgs_dir)
+                    continue
+                log.debug("evicting %s from package cache %s", pcrec.dist_str(), self.pkgs_dir)
+                paths = (pcrec.extracted_package_dir, ) + tarball_paths(pcrec)
+                self.remove(pcrec)
+                for path in paths:
+                    rm_rf(path)
+            total_size -= sizes[pcrec]
+            evicted.append(pcrec)
+
+        self.save_index()
+        return tuple(evicted)
 
     def query(self, package_ref_or_match_spec):
         # returns a generator
@@ -123,8 +247,7 @@ class PackageCacheData(object):
         if isinstance(param, string_types):
             param = MatchSpec(param)
         if isinstance(param, MatchSpec):
-            return (pcrec for pcrec in itervalues(self._package_cache_records)
-                    if param.match(pcrec))
+            return self._record_index.query(param)
         else:
             assert isinstance(param, PackageRecord)
             return (pcrec for pcrec in itervalues(self._package_cache_records) if pcrec == param)
@@ -244,6 +367,16 @@ class PackageCacheData(object):
             self.load()
         return self.__package_cache_records
 
+    @property
+    def _record_index(self):
+        package_cache_records = self._package_cache_records
+        # rebuilt whenever the records are reloaded or replaced
+        if (self.__record_index is None
+                or self.__record_index[0] is not package_cache_records):
+            self.__record_index = (package_cache_records,
+                                   RecordIndex(itervalues(package_cache_records)))
+        return self.__record_index[1]
+
     @property
     def is_writable(self):
         # returns None if package cache directory does not exist / has not been created
@@ -462,6 +595,207 @@ class UrlsData(object):
         return first(self, lambda url: basename(url) == package_path)
 
 
+def _mtime(path):
+    try:
+        return lstat(path).st_mtime
+    except (IOError, OSError):
+        return None
+
+
+def _disk_usage(path):
+    return directory_usage(path).size
+
+
+@contextmanager
+def _try_package_cache_locks(pkgs_dir, names):
+    """
+    Hold package_cache_lock on each of ``names`` without waiting for any of them; yields
+    False if another process holds one.
+    """
+    if not names:
+        yield True
+        return
+    with package_cache_lock(pkgs_dir, names[0], blocking=False) as locked:
+        if not locked:
+            yield False
+        else:
+            with _try_package_cache_locks(pkgs_dir, names[1:]) as locked:
+                yield locked
+
+
+def _has_hard_links(path):
+    # the same test `conda clean --packages` uses to decide a package is in use
+    usage = directory_usage(path, stop_at_hard_link=True)
+    return usage.hard_linked or bool(usage.errors)
+
+
+class PackageCacheIndex(object):
+    # this is a class to manage cache/cache_index.json, which records the PackageCacheRecord
+    #   for every entry of pkgs_dir, so loading a package cache does not need to list the
+    #   directory or read each package's info/repodata_record.json
+    # like UrlsData, it does its own disk access
+    #
+    # The directory listing is trusted as long as pkgs_dir's mtime is unchanged; each entry
+    #   is trusted as long as the mtimes of its tarball and its repodata_record.json are.
+    #   The file lives in a subdirectory so that replacing it doesn't change pkgs_dir's mtime.
+
+    VERSION = 1
+
+    # seconds; FAT's mtime resolution, the coarsest in common use
+    MTIME_TICK = 2
+
+    def __init__(self, pkgs_dir):
+        self.pkgs_dir = pkgs_dir
+        self.cache_index_path = join(pkgs_dir, 'cache', 'cache_index.json')
+        self.dir_mtime = None
+        self.written_mtime = None
+        self.entries = {}
+        # keyed by extracted package directory name
+        self.last_used = {}
+        self.sizes = {}
+        self._dirty = False
+
+    def read(self):
+        try:
+            self.written_mtime = _mtime(self.cache_index_path)
+            with open(self.cache_index_path) as fh:
+                data = json.load(fh)
+            if data.get('version') != self.VERSION:
+                raise ValueError("unsupported package cache index version %r"
+                                 % data.get('version'))
+            self.dir_mtime, self.entries = data['dir_mtime'], data['entries']
+            self.last_used = data.get('last_used', {})
+            self.sizes = data.get('sizes', {})
+            self._dirty = False
+            return True
+        except (IOError, OSError, KeyError, TypeError, ValueError) as e:
+            # ValueError includes JSONDecodeError, e.g. for a file another process is writing
+            log.debug("unable to read package cache index %s\n  because %r",
+                      self.cache_index_path, e)
+            self.dir_mtime, self.entries = None, {}
+            return False
+
+    def listing_is_current(self, dir_mtime):
+        """
+        True if nothing was added to or removed from pkgs_dir, now at ``dir_mtime``, since its
+        listing was indexed.
+        """
+        # A change made within the same mtime tick as the listing leaves the mtime as it was,
+        #   so the listing is only trusted if the index was written at least a tick later.
+        return (dir_mtime is not None and dir_mtime == self.dir_mtime
+                and self.written_mtime is not None
+                and self.written_mtime >= dir_mtime + self.MTIME_TICK)
+
+    def set_listing(self, base_names, dir_mtime):
+        entries = self.entries
+        self.entries = {base_name: entries[base_name] for base_name in base_names
+                        if base_name in entries}
+        self.dir_mtime = dir_mtime
+        self._dirty = True
+
+    def _entry_mtimes(self, base_name):
+        full_path = join(self.pkgs_dir, base_name)
+        extracted_package_dir, pkg_ext = strip_pkg_extension(full_path)
+        return [
+            _mtime(join(extracted_package_dir, 'info', 'repodata_record.json')),
+            _mtime(full_path if pkg_ext else join(full_path, 'info', 'index.json')),
+        ]
+
+    def get_record(self, base_name):
+        """
+        Return the indexed PackageCacheRecord (or None for entries that aren't packages)
+        for base_name.  Raises KeyError if there is no up-to-date index entry.
+        """
+        mtimes, record = self.entries[base_name]
+        if mtimes != self._entry_mtimes(base_name):
+            del self.entries[base_name]
+            self._dirty = True
+            raise KeyError(base_name)
+        if record is None:
+            return None
+        full_path = join(self.pkgs_dir, base_name)
+        return PackageCacheRecord.from_objects(
+            record,
+            package_tarball_full_path=full_path,
+            extracted_package_dir=strip_pkg_extension(full_path)[0],
+        )
+
+    def set_record(self, base_name, package_cache_record):
+        record = (package_cache_record
+                  and PackageRecord.from_objects(package_cache_record).dump())
+        self.entries[base_name] = [self._entry_mtimes(base_name), record]
+        self._dirty = True
+
+    def _base_name(self, package_cache_record):
+        tarball_path = package_cache_record.package_tarball_full_path
+        if dirname(tarball_path) != self.pkgs_dir:
+            return None
+        base_name = basename(tarball_path)
+        if not isfile(tarball_path):
+            # extracted directory only
+            base_name = strip_pkg_extension(base_name)[0]
+        return base_name
+
+    def update(self, package_cache_record):
+        base_name = self._base_name(package_cache_record)
+        if base_name:
+            self.set_record(base_name, package_cache_record)
+            # the entry was added without re-listing pkgs_dir
+            self.dir_mtime = None
+            # the package may have been extracted anew
+            self.sizes.pop(basename(package_cache_record.extracted_package_dir), None)
+
+    def mark_used(self, package_cache_record, timestamp):
+        self.last_used[basename(package_cache_record.extracted_package_dir)] = timestamp
+        self._dirty = True
+
+    def extracted_size(self, package_cache_record):
+        extracted_package_dir = package_cache_record.extracted_package_dir
+        key = basename(extracted_package_dir)
+        size = self.sizes.get(key)
+        if size is None:
+            size = self.sizes[key] = _disk_usage(extracted_package_dir)
+            self._dirty = True
+        return size
+
+    def discard(self, package_cache_record):
+        base_name = self._base_name(package_cache_record)
+        if base_name and self.entries.pop(base_name, None):
+            # whatever is still on disk for it gets picked up again by the next listing
+            self.dir_mtime = None
+            self._dirty = True
+        key = basename(package_cache_record.extracted_package_dir)
+        last_used = self.last_used.pop(key, None)
+        size = self.sizes.pop(key, None)
+        if last_used is not None or size is not None:
+            self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        dir_mtime = self.dir_mtime
+        cache_index_dir = dirname(self.cache_index_path)
+        tmp_path = '%s.%s.tmp' % (self.cache_index_path, uuid4().hex[:8])
+        try:
+            if not isdir(cache_index_dir):
+                # creating the directory bumps the pkgs_dir mtime; don't let that invalidate
+                #   the index
+                listed_dir_mtime = _mtime(self.pkgs_dir)
+                mkdir_p(cache_index_dir)
+                if dir_mtime is not None and dir_mtime == listed_dir_mtime:
+                    dir_mtime = _mtime(self.pkgs_dir)
+            with open(tmp_path, 'w') as fh:
+                json.dump({'version': self.VERSION, 'dir_mtime': dir_mtime,
+                           'entries': self.entries, 'last_used': self.last_used,
+                           'sizes': self.sizes}, fh, separators=(',', ':'))
+            backoff_rename(tmp_path, self.cache_index_path, force=True)
+            self._dirty = False
+        except (IOError, OSError) as e:
+            rm_rf(tmp_path)
+            log.debug("unable to write package cache index %s\n  because %r",
+                      self.cache_index_path, e)
+
+
 # ##############################
 # downloading
 # ##############################
@@ -645,16 +979,114 @@ class ProgressiveFetchExtract(object):
 
         exceptions = []
         with signal_handler(conda_signal_handler), time_recorder("fetch_extract_execute"):
-            for prec_or_spec, prec_actions in iteritems(self.paired_actions):
-                exc = self._execute_actions(prec_or_spec, prec_actions)
-                if exc:
-                    log.debug('%r'.encode('utf-8'), exc, exc_info=True)
-                    exceptions.append(exc)
+            if context.debug or context.fetch_threads == context.extract_threads == 1:
+                for prec_or_spec, prec_actions in iteritems(self.paired_actions):
+                    exc = self._execute_actions(prec_or_spec, prec_actions)
+                    if exc:
+                        log.debug('%r'.encode('utf-8'), exc, exc_info=True)
+                        exceptions.append(exc)
+            else:
+                exceptions.extend(self._execute_pipelined())
+
+        for pkgs_dir in set(axn.target_pkgs_dir
+                            for axn in concatv(self.cache_actions, self.extract_actions)):
+            PackageCacheData(pkgs_dir).save_index()
 
         if exceptions:
             raise CondaMultiError(exceptions)
         self._executed = True
 
+    def _execute_pipelined(self):
+        """
+        Download with a pool of `context.fetch_threads` threads, and hand each finished
+        download to a separate pool of `context.extract_threads` threads, so that extraction
+        overlaps the remaining downloads.  Progress is reported as a single aggregate bar.
+
+        Returns:
+            List[Exception]: one exception for each package that failed
+        """
+        paired_actions = tuple((prec_or_spec, actions)
+                               for prec_or_spec, actions in iteritems(self.paired_actions)
+                               if actions[0] or actions[1])
+        progress = _AggregateProgress(prec_or_spec for prec_or_spec, _ in paired_actions)
+        fetch_executor = ThreadLimitedThreadPoolExecutor(context.fetch_threads)
+        extract_executor = ThreadLimitedThreadPoolExecutor(context.extract_threads)
+
+        exceptions = []
+        futures = []
+        try:
+            fetch_futures = [
+                fetch_executor.submit(self._execute_cache_action, prec_or_spec, actions,
+                                      progress, extract_executor)
+                for prec_or_spec, actions in paired_actions
+            ]
+            futures.extend(fetch_futures)
+            extract_futures = []
+            for future in as_completed(fetch_futures):
+                exc, extract_future = future.result()
+                if exc:
+                    exceptions.append(exc)
+                else:
+                    futures.append(extract_future)
+                    extract_futures.append(extract_future)
+            exceptions.extend(exc for exc in (f.result() for f in as_completed(extract_futures))
+                              if exc)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            fetch_executor.shutdown(wait=True)
+            extract_executor.shutdown(wait=True)
+            progress.close()
+
+        for exc in exceptions:
+            log.debug('%r'.encode('utf-8'), exc, exc_info=True)
+        return exceptions
+
+    @classmethod
+    def _execute_cache_action(cls, prec_or_spec, actions, progress, extract_executor):
+        # returns (exception, None) on failure, otherwise (None, future of the extract step)
+        cache_axn, extract_axn = actions
+        try:
+            if cache_axn:
+                cache_axn.verify()
+                if not cache_axn.url.startswith('file:/'):
+                    def progress_update_cache_axn(pct_completed):
+                        progress.update_to(prec_or_spec, pct_completed)
+                else:
+                    progress_update_cache_axn = None
+                cache_axn.execute(progress_update_cache_axn)
+        except Exception as e:
+            cls._reverse_actions(actions)
+            return e, None
+        return None, extract_executor.submit(cls._execute_extract_action,
+                                             prec_or_spec, actions, progress)
+
+    @classmethod
+    def _execute_extract_action(cls, prec_or_spec, actions, progress):
+        cache_axn, extract_axn = actions
+        try:
+            if extract_axn:
+                extract_axn.verify()
+                extract_axn.execute()
+        except Exception as e:
+            cls._reverse_actions(actions)
+            return e
+        if cache_axn:
+            cache_axn.cleanup()
+        if extract_axn:
+            extract_axn.cleanup()
+        progress.update_to(prec_or_spec, 1.0)
+
+    @staticmethod
+    def _reverse_actions(actions):
+        cache_axn, extract_axn = actions
+        if extract_axn:
+            extract_axn.reverse()
+        if cache_axn:
+            cache_axn.reverse()
+
     @staticmethod
     def _execute_actions(prec_or_spec, actions):
         cache_axn, extract_axn = actions
@@ -699,10 +1131,7 @@ class ProgressiveFetchExtract(object):
                 progress_bar.update_to(1.0)
 
         except Exception as e:
-            if extract_axn:
-                extract_axn.reverse()
-            if cache_axn:
-                cache_axn.reverse()
+            ProgressiveFetchExtract._reverse_actions(actions)
             return e
         else:
             if cache_axn:
@@ -720,6 +1149,38 @@ class ProgressiveFetchExtract(object):
         return hash(self) == hash(other)
 
 
+class _AggregateProgress(object):
+    """One thread-safe progress bar for many packages, weighted by their size."""
+
+    def __init__(self, precs_or_specs):
+        sizes = {prec_or_spec: getattr(prec_or_spec, 'size', None)
+                 for prec_or_spec in precs_or_specs}
+        self._weights = {prec_or_spec: size or 1 for prec_or_spec, size in iteritems(sizes)}
+        self._total = sum(itervalues(self._weights)) or 1
+        self._fractions = {}
+        self._done = 0
+        self._lock = Lock()
+        desc = "%-20.20s | " % ("%d packages" % len(sizes))
+        total_size = sum(size for size in itervalues(sizes) if size)
+        if total_size:
+            desc += "%-9s | " % human_bytes(total_size)
+        self._progress_bar = ProgressBar(desc, not context.verbosity and not context.quiet,
+                                         context.json)
+
+    def update_to(self, prec_or_spec, fraction):
+        with self._lock:
+            previous = self._fractions.get(prec_or_spec, 0)
+            self._fractions[prec_or_spec] = fraction
+            self._done += self._weights[prec_or_spec] * (fraction - previous)
+            self._progress_bar.update_to(self._done / self._total)
+
+    def close(self):
+        with self._lock:
+            if sum(1 for f in itervalues(self._fractions) if f == 1.0) == len(self._weights):
+                self._progress_bar.finish()
+            self._progress_bar.close()
+
+
 # ##############################
 # backward compatibility
 # ##############################
@@ -5,7 +5,8 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 from abc import ABCMeta, abstractmethod, abstractproperty
 from logging import getLogger
-from os.path import basename, dirname, getsize, isdir, join
+from os import listdir
+from os.path import basename, dirname, getsize, isdir, isfile, join
 import re
 import sys
 from uuid import uuid4
@@ -33,9 +34,12 @@ from ..gateways.disk.create import (compile_multiple_pyc, copy,
                                     create_python_entry_point, extract_tarball,
                                     make_menu, mkdir_p, write_as_json_to_file)
 from ..gateways.disk.delete import rm_rf
+from ..gateways.disk.lock import advisory_lock
+from ..gateways.disk.paths_manifest import write_paths_manifest
 from ..gateways.disk.permissions import make_writable
 from ..gateways.disk.read import (compute_md5sum, compute_sha256sum, islink, lexists,
-                                  read_index_json)
+                                  read_index_json, read_repodata_json)
+from ..gateways.disk.test import reflink_supported
 from ..gateways.disk.update import backoff_rename, touch
 from ..history import History
 from ..models.channel import Channel
@@ -184,6 +188,20 @@ class CreateInPrefixPathAction(PrefixPathAction):
         return join(prfx, win_path_ok(shrt_pth)) if prfx and shrt_pth else None
 
 
+def copy_link_type(package_info, target_prefix, requested_link_type):
+    """
+    The link type for a file from this package that the environment needs its own copy of:
+    LinkType.reflink where the filesystem can clone files, otherwise LinkType.copy.
+    """
+    if requested_link_type in (LinkType.copy, LinkType.reflink):
+        # determine_link_type already probed for reflinks
+        return requested_link_type
+    source_test_file = join(package_info.extracted_package_dir, 'info', 'index.json')
+    if reflink_supported(source_test_file, target_prefix):
+        return LinkType.reflink
+    return LinkType.copy
+
+
 class LinkPathAction(CreateInPrefixPathAction):
 
     @classmethod
@@ -198,7 +216,7 @@ class LinkPathAction(CreateInPrefixPathAction):
                 prefix_placehoder = source_path_data.prefix_placeholder
                 file_mode = source_path_data.file_mode
             elif source_path_data.no_link:
-                link_type = LinkType.copy
+                link_type = copy_link_type(package_info, target_prefix, requested_link_type)
                 prefix_placehoder, file_mode = '', None
             else:
                 link_type = requested_link_type
@@ -390,6 +408,7 @@ class PrefixReplaceLinkAction(LinkPathAction):
                  target_prefix, target_short_path,
                  link_type,
                  prefix_placeholder, file_mode, source_path_data):
+        self.requested_link_type = link_type
         # This link_type used in execute(). Make sure we always respect LinkType.copy request.
         link_type = LinkType.copy if link_type == LinkType.copy else LinkType.hardlink
         super(PrefixReplaceLinkAction, self).__init__(transaction_context, package_info,
@@ -414,8 +433,12 @@ class PrefixReplaceLinkAction(LinkPathAction):
         mkdir_p(self.transaction_context['temp_dir'])
         self.intermediate_path = join(self.transaction_context['temp_dir'], text_type(uuid4()))
 
+        # Files without any placeholder occurrences are left untouched by update_prefix, so a
+        #   reflink keeps sharing all of their data blocks with the package cache.
+        intermediate_link_type = copy_link_type(self.package_info, self.target_prefix,
+                                                self.requested_link_type)
         log.trace("copying %s => %s", self.source_full_path, self.intermediate_path)
-        create_link(self.source_full_path, self.intermediate_path, LinkType.copy)
+        create_link(self.source_full_path, self.intermediate_path, intermediate_link_type)
         make_writable(self.intermediate_path)
 
         try:
@@ -852,9 +875,12 @@ class CreatePrefixRecordAction(CreateInPrefixPathAction):
         self._execute_successful = False
 
     def execute(self):
+        # a reflinked file is a copy as far as the environment is concerned; recording it as one
+        #   keeps the conda-meta record readable by conda versions without LinkType.reflink
+        link_type = self.requested_link_type
         link = Link(
             source=self.package_info.extracted_package_dir,
-            type=self.requested_link_type,
+            type=LinkType.copy if link_type == LinkType.reflink else link_type,
         )
         extracted_package_dir = self.package_info.extracted_package_dir
         package_tarball_full_path = self.package_info.package_tarball_full_path
@@ -1097,6 +1123,21 @@ class UnregisterEnvironmentLocationAction(PathAction):
 #  Fetch / Extract Actions
 # ######################################################
 
+PACKAGE_CACHE_LOCKS_DIRNAME = '.locks'
+
+
+def package_cache_lock(pkgs_dir, name, blocking=True):
+    """
+    Serialize work on one package across every conda process sharing ``pkgs_dir``.
+
+    ``name`` is the tarball basename when fetching and the extracted directory name when
+    extracting, so a download and an extraction of the same package never wait on each other.
+    See ``advisory_lock`` for ``blocking``.
+    """
+    return advisory_lock(join(pkgs_dir, PACKAGE_CACHE_LOCKS_DIRNAME, name + '.lock'),
+                         blocking=blocking)
+
+
 class CacheUrlAction(PathAction):
 
     def __init__(self, url, target_pkgs_dir, target_package_basename,
@@ -1107,7 +1148,9 @@ class CacheUrlAction(PathAction):
         self.sha256 = sha256
         self.size = size
         self.md5 = md5
-        self.hold_path = self.target_full_path + CONDA_TEMP_EXTENSION
+        # unique to this action, so no other process sharing the cache moves or removes it
+        self.hold_path = "%s.%s%s" % (self.target_full_path, uuid4().hex[:8],
+                                      CONDA_TEMP_EXTENSION)
 
     def verify(self):
         assert '::' not in self.url
@@ -1121,21 +1164,40 @@ class CacheUrlAction(PathAction):
 
         log.trace("caching url %s => %s", self.url, self.target_full_path)
 
-        if lexists(self.hold_path):
-            rm_rf(self.hold_path)
+        with package_cache_lock(self.target_pkgs_dir, self.target_package_basename):
+            if lexists(self.hold_path):
+                rm_rf(self.hold_path)
+
+            if lexists(self.target_full_path):
+                if (self.url.startswith('file:/')
+                        and self.url == path_to_url(self.target_full_path)):
+                    # the source and destination are the same file, so we're done
+                    return
+                elif self._target_matches():
+                    # another conda process fetched this package while we waited for the lock
+                    log.debug("reusing %s fetched by another process", self.target_full_path)
+                    if (not self.url.startswith('file:/')
+                            and self.url not in target_package_cache._urls_data):
+                        target_package_cache._urls_data.add_url(self.url)
+                    return
+                else:
+                    backoff_rename(self.target_full_path, self.hold_path, force=True)
 
-        if lexists(self.target_full_path):
-            if self.url.startswith('file:/') and self.url == path_to_url(self.target_full_path):
-                # the source and destination are the same file, so we're done
-                return
+            if self.url.startswith('file:/'):
+                source_path = url_to_path(self.url)
+                self._execute_local(source_path, target_package_cache, progress_update_callback)
             else:
-                backoff_rename(self.target_full_path, self.hold_path, force=True)
-
-        if self.url.startswith('file:/'):
-            source_path = url_to_path(self.url)
-            self._execute_local(source_path, target_package_cache, progress_update_callback)
-        else:
-            self._execute_channel(target_package_cache, progress_update_callback)
+                self._execute_channel(target_package_cache, progress_update_callback)
+
+    def _target_matches(self):
+        # only trust a tarball we can verify
+        if not (self.sha256 or self.md5) or not isfile(self.target_full_path):
+            return False
+        if self.size is not None and getsize(self.target_full_path) != self.size:
+            return False
+        if self.sha256:
+            return compute_sha256sum(self.target_full_path) == self.sha256
+        return compute_md5sum(self.target_full_path) == self.md5
 
     def _execute_local(self, source_path, target_package_cache, progress_update_callback=None):
         from .package_cache_data import PackageCacheData
@@ -1201,12 +1263,20 @@ class CacheUrlAction(PathAction):
         target_package_cache._urls_data.add_url(self.url)
 
     def reverse(self):
-        if lexists(self.hold_path):
-            log.trace("moving %s => %s", self.hold_path, self.target_full_path)
-            backoff_rename(self.hold_path, self.target_full_path, force=True)
+        with package_cache_lock(self.target_pkgs_dir, self.target_package_basename):
+            if not lexists(self.hold_path):
+                return
+            if self._target_matches():
+                # another conda process fetched this package since we moved ours aside
+                log.debug("keeping %s fetched by another process", self.target_full_path)
+                rm_rf(self.hold_path)
+            else:
+                log.trace("moving %s => %s", self.hold_path, self.target_full_path)
+                backoff_rename(self.hold_path, self.target_full_path, force=True)
 
     def cleanup(self):
-        rm_rf(self.hold_path)
+        with package_cache_lock(self.target_pkgs_dir, self.target_package_basename):
+            rm_rf(self.hold_path)
 
     @property
     def target_full_path(self):
@@ -1228,6 +1298,7 @@ class ExtractPackageAction(PathAction):
         self.sha256 = sha256
         self.size = size
         self.md5 = md5
+        self._reused = False
 
     def verify(self):
         self._verified = True
@@ -1238,41 +1309,14 @@ class ExtractPackageAction(PathAction):
         from .package_cache_data import PackageCacheData
         log.trace("extracting %s => %s", self.source_full_path, self.target_full_path)
 
-        if lexists(self.target_full_path):
-            rm_rf(self.target_full_path)
-
-        extract_tarball(self.source_full_path, self.target_full_path,
-                        progress_update_callback=progress_update_callback)
-
-        try:
-            raw_index_json = read_index_json(self.target_full_path)
-        except (IOError, OSError, JSONDecodeError, FileNotFoundError):
-            # At this point, we can assume the package tarball is bad.
-            # Remove everything and move on.
-            print("ERROR: Encountered corrupt package tarball at %s. Conda has "
-                  "left it in place.  Please report this to the maintainers "
-                  "of your package.  For the defaults channel, please report "
-                  "to https://github.com/continuumio/anaconda-issues" % self.source_full_path)
-            sys.exit(1)
-
-        if isinstance(self.record_or_spec, MatchSpec):
-            url = self.record_or_spec.get_raw_value('url')
-            assert url
-            channel = Channel(url) if has_platform(url, context.known_subdirs) else Channel(None)
-            fn = basename(url)
-            sha256 = self.sha256 or compute_sha256sum(self.source_full_path)
-            size = getsize(self.source_full_path)
-            if self.size is not None:
-                assert size == self.size, (size, self.size)
-            md5 = self.md5 or compute_md5sum(self.source_full_path)
-            repodata_record = PackageRecord.from_objects(
-                raw_index_json, url=url, channel=channel, fn=fn, sha256=sha256, size=size, md5=md5,
-            )
-        else:
-            repodata_record = PackageRecord.from_objects(self.record_or_spec, raw_index_json)
-
-        repodata_record_path = join(self.target_full_path, 'info', 'repodata_record.json')
-        write_as_json_to_file(repodata_record_path, repodata_record)
+        with package_cache_lock(self.target_pkgs_dir, self.target_extracted_dirname):
+            repodata_record = self._extracted_record()
+            if repodata_record is not None:
+                # another conda process extracted this package while we waited for the lock
+                log.debug("reusing %s extracted by another process", self.target_full_path)
+                self._reused = True
+            else:
+                repodata_record = self._extract(progress_update_callback)
 
         target_package_cache = PackageCacheData(self.target_pkgs_dir)
         package_cache_record = PackageCacheRecord.from_objects(
@@ -1282,7 +1326,87 @@ class ExtractPackageAction(PathAction):
         )
         target_package_cache.insert(package_cache_record)
 
+    def _extracted_record(self):
+        # the repodata record of an already extracted package directory, if it is the package
+        #   we are about to extract
+        if not (self.sha256 or self.md5):
+            return None
+        try:
+            repodata_record = read_repodata_json(self.target_full_path)
+        except (EnvironmentError, JSONDecodeError, ValueError, FileNotFoundError):
+            return None
+        if not repodata_record.get('url'):
+            return None
+        if self.sha256 and repodata_record.get('sha256'):
+            matches = repodata_record['sha256'] == self.sha256
+        elif self.md5 and repodata_record.get('md5'):
+            matches = repodata_record['md5'] == self.md5
+        else:
+            matches = False
+        return repodata_record if matches else None
+
+    def _extract(self, progress_update_callback=None):
+        # Extract next to the final location and rename into place, so that other processes
+        #   only ever see a complete package directory.
+        extract_path = "%s.%s%s" % (self.target_full_path, uuid4().hex[:8], CONDA_TEMP_EXTENSION)
+        try:
+            extract_tarball(self.source_full_path, extract_path,
+                            progress_update_callback=progress_update_callback)
+
+            try:
+                raw_index_json = read_index_json(extract_path)
+            except (IOError, OSError, JSONDecodeError, FileNotFoundError):
+                # At this point, we can assume the package tarball is bad.
+                # Remove everything and move on.
+                print("ERROR: Encountered corrupt package tarball at %s. Conda has "
+                      "left it in place.  Please report this to the maintainers "
+                      "of your package.  For the defaults channel, please report "
+                      "to https://github.com/continuumio/anaconda-issues" % self.source_full_path)
+                sys.exit(1)
+
+            if isinstance(self.record_or_spec, MatchSpec):
+                url = self.record_or_spec.get_raw_value('url')
+                assert url
+                channel = (Channel(url) if has_platform(url, context.known_subdirs)
+                           else Channel(None))
+                fn = basename(url)
+                sha256 = self.sha256 or compute_sha256sum(self.source_full_path)
+                size = getsize(self.source_full_path)
+                if self.size is not None:
+                    assert size == self.size, (size, self.size)
+                md5 = self.md5 or compute_md5sum(self.source_full_path)
+                repodata_record = PackageRecord.from_objects(
+                    raw_index_json, url=url, channel=channel, fn=fn, sha256=sha256, size=size,
+                    md5=md5,
+                )
+            else:
+                repodata_record = PackageRecord.from_objects(self.record_or_spec, raw_index_json)
+
+            repodata_record_path = join(extract_path, 'info', 'repodata_record.json')
+            write_as_json_to_file(repodata_record_path, repodata_record)
+            if isfile(join(extract_path, 'info', 'paths.json')):
+                write_paths_manifest(extract_path)
+
+            if lexists(self.target_full_path):
+                rm_rf(self.target_full_path)
+            if not lexists(self.target_full_path):
+                backoff_rename(extract_path, self.target_full_path)
+            else:
+                # the most common reason this happens is due to hard-links, windows thinks
+                #    files in the package cache are in-use. Move the new contents in over
+                #    what is left.
+                for fn in listdir(extract_path):
+                    backoff_rename(join(extract_path, fn), join(self.target_full_path, fn),
+                                   force=True)
+        finally:
+            if lexists(extract_path):
+                rm_rf(extract_path)
+        return repodata_record
+
     def reverse(self):
+        if self._reused:
+            # the directory belongs to the process that extracted it
+            return
         rm_rf(self.target_full_path)
         if lexists(self.hold_path):
             log.trace("moving %s => %s", self.hold_path, self.target_full_path)
@@ -11,7 +11,8 @@ import struct
 from ..base.constants import PREFIX_PLACEHOLDER
 from ..common.compat import on_win
 from ..exceptions import CondaIOError, BinaryPrefixReplacementError
-from ..gateways.disk.update import CancelOperation, update_file_in_place_as_binary
+from ..gateways.disk.update import (CancelOperation, update_file_in_place_as_binary,
+                                    update_file_in_place_as_mmap)
 from ..models.enums import FileMode
 
 log = getLogger(__name__)
@@ -35,6 +36,19 @@ def update_prefix(path, new_prefix, placeholder=PREFIX_PLACEHOLDER, mode=FileMod
         # replace with unix-style path separators
         new_prefix = new_prefix.replace('\\', '/')
 
+    if mode == FileMode.binary and not on_win:
+        # Binary replacement never changes the length of the file, so patch the strings holding
+        #   the placeholder through a memory map instead of reading and rewriting the whole
+        #   file.  Files without the placeholder aren't written to at all.
+        a, b = placeholder.encode('utf-8'), new_prefix.encode('utf-8')
+
+        def _update_prefix_in_place(mm):
+            for offset, replacement in _binary_replacements(mm, a, b):
+                mm[offset:offset + len(replacement)] = replacement
+
+        update_file_in_place_as_mmap(realpath(path), _update_prefix_in_place)
+        return
+
     def _update_prefix(original_data):
 
         # Step 1. do all prefix replacement
@@ -83,19 +97,41 @@ def binary_replace(data, a, b):
         else:
             return data
 
-    def replace(match):
-        occurances = match.group().count(a)
+    replacements = _binary_replacements(data, a, b)
+    if not replacements:
+        return data
+    data = bytearray(data)
+    for offset, replacement in replacements:
+        data[offset:offset + len(replacement)] = replacement
+    return bytes(data)
+
+
+def _binary_replacements(data, a, b):
+    """
+    Find each null-terminated string in `data` that contains the placeholder `a`, and return
+    a list of (offset, replacement) pairs, where the replacement has every `a` in the string
+    replaced with `b`, padded back to the original length with null characters.  Strings that
+    don't change are left out.  `data` only needs `find()` and slicing, so it can be an mmap.
+
+    All replacements are computed before any is returned, so a _PaddingError leaves `data`
+    untouched.
+    """
+    replacements = []
+    offset = data.find(a)
+    while offset >= 0:
+        end = data.find(b'\0', offset + len(a))
+        if end < 0:
+            break
+        string = data[offset:end]
+        occurances = string.count(a)
         padding = (len(a) - len(b)) * occurances
         if padding < 0:
             raise _PaddingError
-        return match.group().replace(a, b) + b'\0' * padding
-
-    original_data_len = len(data)
-    pat = re.compile(re.escape(a) + b'([^\0]*?)\0')
-    data = pat.sub(replace, data)
-    assert len(data) == original_data_len
-
-    return data
+        replacement = string.replace(a, b) + b'\0' * padding
+        if replacement != string:
+            replacements.append((offset, replacement))
+        offset = data.find(a, end + 1)
+    return replacements
 
 
 def has_pyzzer_entry_point(data):
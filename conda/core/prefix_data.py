@@ -3,19 +3,26 @@
 # SPDX-License-Identifier: BSD-3-Clause
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+from collections import defaultdict
 from fnmatch import filter as fnmatch_filter
+from functools import partial
 from logging import getLogger
-from os import listdir
-from os.path import basename, isdir, isfile, join, lexists
+from os import listdir, stat
+from os.path import basename, dirname, isdir, isfile, join, lexists
 import re
 from collections import OrderedDict
 import json
+from uuid import uuid4
 
-from ..base.constants import PREFIX_STATE_FILE
+from ..base.constants import (
+    PREFIX_RECORDS_INDEX_FILE, PREFIX_SITE_PACKAGES_INDEX_FILE, PREFIX_STATE_FILE,
+)
 from .._vendor.auxlib.exceptions import ValidationError
 from ..base.constants import CONDA_PACKAGE_EXTENSIONS, PREFIX_MAGIC_FILE, CONDA_ENV_VARS_UNSET_VAR
 from ..base.context import context
-from ..common.compat import JSONDecodeError, itervalues, odict, string_types, with_metaclass
+from ..common.compat import (
+    JSONDecodeError, iteritems, itervalues, odict, on_win, string_types, with_metaclass,
+)
 from ..common.constants import NULL
 from ..common.io import time_recorder
 from ..common.path import get_python_site_packages_short_path, win_path_ok
@@ -28,8 +35,10 @@ from ..gateways.disk.create import write_as_json_to_file
 from ..gateways.disk.delete import rm_rf
 from ..gateways.disk.read import read_python_record
 from ..gateways.disk.test import file_path_is_writable
+from ..gateways.disk.update import backoff_rename
 from ..models.match_spec import MatchSpec
 from ..models.prefix_graph import PrefixGraph
+from ..models.record_index import RecordIndex
 from ..models.records import PackageRecord, PrefixRecord
 
 log = getLogger(__name__)
@@ -59,6 +68,8 @@ class PrefixData(object):
         # TODO: when removing pip_interop_enabled, also remove from meta class
         self.prefix_path = prefix_path
         self.__prefix_records = None
+        self.__record_index = None
+        self.__path_index = None
         self.__is_writable = NULL
         self._pip_interop_enabled = (pip_interop_enabled
                                      if pip_interop_enabled is not None
@@ -69,8 +80,14 @@ class PrefixData(object):
         self.__prefix_records = {}
         _conda_meta_dir = join(self.prefix_path, 'conda-meta')
         if lexists(_conda_meta_dir):
-            for meta_file in fnmatch_filter(listdir(_conda_meta_dir), '*.json'):
-                self._load_single_record(join(_conda_meta_dir, meta_file))
+            records_index = PrefixRecordsIndex(self.prefix_path)
+            records_index.read()
+            meta_files = fnmatch_filter(listdir(_conda_meta_dir), '*.json')
+            records_index.retain(meta_files)
+            for meta_file in meta_files:
+                self._load_single_record(join(_conda_meta_dir, meta_file), records_index)
+            if self.is_writable:
+                records_index.save()
         if self._pip_interop_enabled:
             self._load_site_packages()
 
@@ -109,6 +126,8 @@ class PrefixData(object):
         write_as_json_to_file(prefix_record_json_path, prefix_record)
 
         self._prefix_records[prefix_record.name] = prefix_record
+        self.__record_index = None
+        self._update_path_index(prefix_record)
 
     def remove(self, package_name):
         assert package_name in self._prefix_records
@@ -122,6 +141,8 @@ class PrefixData(object):
             rm_rf(conda_meta_full_path)
 
         del self._prefix_records[package_name]
+        self.__record_index = None
+        self._update_path_index(prefix_record, removed=True)
 
     def get(self, package_name, default=NULL):
         try:
@@ -154,40 +175,94 @@ class PrefixData(object):
         if isinstance(param, string_types):
             param = MatchSpec(param)
         if isinstance(param, MatchSpec):
-            return (prefix_rec for prefix_rec in self.iter_records()
-                    if param.match(prefix_rec))
+            return self._record_index.query(param)
         else:
             assert isinstance(param, PackageRecord)
             return (prefix_rec for prefix_rec in self.iter_records() if prefix_rec == param)
 
+    def path_owners(self, short_path):
+        """
+        Return the records whose ``files`` include ``short_path``, a path relative to the
+        prefix.  Usually this is a single record, or none for a path conda didn't install.
+        """
+        path_index = self._path_index
+        return tuple(self._prefix_records[name]
+                     for name in path_index.get(_path_index_key(short_path), ()))
+
     @property
     def _prefix_records(self):
         return self.__prefix_records or self.load() or self.__prefix_records
 
-    def _load_single_record(self, prefix_record_json_path):
-        log.trace("loading prefix record %s", prefix_record_json_path)
-        with open(prefix_record_json_path) as fh:
-            try:
-                json_data = json_load(fh.read())
-            except JSONDecodeError:
-                raise CorruptedEnvironmentError(self.prefix_path, prefix_record_json_path)
-
-            # TODO: consider, at least in memory, storing prefix_record_json_path as part
-            #       of PrefixRecord
-            prefix_record = PrefixRecord(**json_data)
+    @property
+    def _record_index(self):
+        prefix_records = self._prefix_records
+        # rebuilt whenever the records are reloaded or replaced
+        if self.__record_index is None or self.__record_index[0] is not prefix_records:
+            self.__record_index = prefix_records, RecordIndex(itervalues(prefix_records))
+        return self.__record_index[1]
 
-            # check that prefix record json filename conforms to name-version-build
-            # apparently implemented as part of #2638 to resolve #2599
-            try:
-                n, v, b = basename(prefix_record_json_path)[:-5].rsplit('-', 2)
-                if (n, v, b) != (prefix_record.name, prefix_record.version, prefix_record.build):
-                    raise ValueError()
-            except ValueError:
-                log.warn("Ignoring malformed prefix record at: %s", prefix_record_json_path)
-                # TODO: consider just deleting here this record file in the future
-                return
+    @property
+    def _path_index(self):
+        # maps each file short path to the names of the records that installed it
+        prefix_records = self._prefix_records
+        if self.__path_index is None or self.__path_index[0] is not prefix_records:
+            path_index = defaultdict(list)
+            for prefix_record in itervalues(prefix_records):
+                for path in prefix_record.files or ():
+                    path_index[_path_index_key(path)].append(prefix_record.name)
+            self.__path_index = prefix_records, path_index
+        return self.__path_index[1]
+
+    def _update_path_index(self, prefix_record, removed=False):
+        # keep an already built index current instead of rebuilding it from every record
+        if self.__path_index is None or self.__path_index[0] is not self.__prefix_records:
+            return
+        path_index = self.__path_index[1]
+        name = prefix_record.name
+        for path in prefix_record.files or ():
+            key = _path_index_key(path)
+            if not removed:
+                path_index[key].append(name)
+            elif name in path_index.get(key, ()):
+                path_index[key].remove(name)
+                if not path_index[key]:
+                    del path_index[key]
+
+    def _load_single_record(self, prefix_record_json_path, records_index=None):
+        log.trace("loading prefix record %s", prefix_record_json_path)
+        # files and paths_data are only turned into fields when something uses them
+        file_key = records_index and records_index.file_key(prefix_record_json_path)
+        header = file_key and records_index.get(prefix_record_json_path, file_key)
+        if header is not None:
+            load_deferred_fields = partial(_read_deferred_fields, self.prefix_path,
+                                           prefix_record_json_path)
+        else:
+            json_data = _read_prefix_record_json(self.prefix_path, prefix_record_json_path)
+            deferred = {key: json_data.pop(key) for key in PrefixRecord.deferred_fields
+                        if key in json_data}
+            header = json_data
+            # the arrays are already parsed; hand them over as they are
+            load_deferred_fields = partial(dict, deferred)
+            if file_key:
+                records_index.set(prefix_record_json_path, file_key, header)
+
+        # TODO: consider, at least in memory, storing prefix_record_json_path as part
+        #       of PrefixRecord
+        prefix_record = PrefixRecord.lazy(header, load_deferred_fields)
+
+        # check that prefix record json filename conforms to name-version-build
+        # apparently implemented as part of #2638 to resolve #2599
+        try:
+            n, v, b = basename(prefix_record_json_path)[:-5].rsplit('-', 2)
+            if (n, v, b) != (prefix_record.name, prefix_record.version, prefix_record.build):
+                raise ValueError()
+        except ValueError:
+            log.warn("Ignoring malformed prefix record at: %s", prefix_record_json_path)
+            # TODO: consider just deleting here this record file in the future
+            return
 
-            self.__prefix_records[prefix_record.name] = prefix_record
+        self.__prefix_records[prefix_record.name] = prefix_record
+        self._update_path_index(prefix_record)
 
     @property
     def is_writable(self):
@@ -237,16 +312,21 @@ class PrefixData(object):
         if not isdir(site_packages_path):
             return {}
 
+        site_packages_index = SitePackagesIndex(self.prefix_path)
+        site_packages_index.read()
+
         # Get anchor files for corresponding conda (handled) python packages
         prefix_graph = PrefixGraph(self.iter_records())
         python_records = prefix_graph.all_descendants(python_pkg_record)
-        conda_python_packages = get_conda_anchor_files_and_records(
+        conda_python_packages = site_packages_index.get_conda_anchor_files_and_records(
             site_packages_dir, python_records
         )
 
         # Get all anchor files and compare against conda anchor files to find clobbered conda
         # packages and python packages installed via other means (not handled by conda)
-        sp_anchor_files = get_site_packages_anchor_files(site_packages_path, site_packages_dir)
+        sp_anchor_files = site_packages_index.get_site_packages_anchor_files(
+            site_packages_path, site_packages_dir
+        )
         conda_anchor_files = set(conda_python_packages)
         clobbered_conda_anchor_files = conda_anchor_files - sp_anchor_files
         non_conda_anchor_files = sp_anchor_files - conda_anchor_files
@@ -274,10 +354,12 @@ class PrefixData(object):
                 log.debug("removed due to stale information: %s", prefix_rec_json_path)
 
         # Create prefix records for python packages not handled by conda
+        site_packages_index.retain_python_records(non_conda_anchor_files)
         new_packages = {}
         for af in non_conda_anchor_files:
             try:
-                python_record = read_python_record(self.prefix_path, af, python_pkg_record.version)
+                python_record = self._load_python_record(af, python_pkg_record.version,
+                                                         site_packages_index)
             except EnvironmentError as e:
                 log.info("Python record ignored for anchor path '%s'\n  due to %s", af, e)
                 continue
@@ -296,8 +378,28 @@ class PrefixData(object):
             self.__prefix_records[python_record.name] = python_record
             new_packages[python_record.name] = python_record
 
+        if self.is_writable:
+            site_packages_index.save()
         return new_packages
 
+    def _load_python_record(self, anchor_file, python_version, site_packages_index):
+        # only metadata that changed since the last load is parsed again
+        anchor_key = site_packages_index.anchor_key(self.prefix_path, anchor_file)
+        header = anchor_key and site_packages_index.get_python_record_header(anchor_file,
+                                                                             anchor_key)
+        if header is not None:
+            return PrefixRecord.lazy(header, partial(
+                _read_python_record_deferred_fields, self.prefix_path, anchor_file,
+                python_version
+            ))
+
+        python_record = read_python_record(self.prefix_path, anchor_file, python_version)
+        if python_record and anchor_key:
+            site_packages_index.set_python_record_header(
+                anchor_file, anchor_key, python_record.dump_header()
+            )
+        return python_record
+
     def _get_environment_state_file(self):
         env_vars_file = join(self.prefix_path, PREFIX_STATE_FILE)
         if lexists(env_vars_file):
@@ -342,6 +444,241 @@ class PrefixData(object):
         return env_state_file.get('env_vars')
 
 
+def _read_prefix_record_json(prefix_path, prefix_record_json_path):
+    with open(prefix_record_json_path) as fh:
+        try:
+            return json_load(fh.read())
+        except JSONDecodeError:
+            raise CorruptedEnvironmentError(prefix_path, prefix_record_json_path)
+
+
+def _read_deferred_fields(prefix_path, prefix_record_json_path):
+    json_data = _read_prefix_record_json(prefix_path, prefix_record_json_path)
+    return {key: json_data[key] for key in PrefixRecord.deferred_fields if key in json_data}
+
+
+def _read_python_record_deferred_fields(prefix_path, anchor_file, python_version):
+    python_record = read_python_record(prefix_path, anchor_file, python_version)
+    return {key: python_record[key] for key in PrefixRecord.deferred_fields}
+
+
+class _PrefixIndexFile(object):
+    # base class for the caches PrefixData keeps in conda-meta/, each a single json file that
+    #   is read in full, updated in memory, and only written back when something changed
+    # like PackageCacheIndex, these do their own disk access
+
+    VERSION = 1
+    index_file = None
+
+    def __init__(self, prefix_path):
+        self.index_path = join(prefix_path, self.index_file)
+        self._reset()
+        self._dirty = False
+
+    def _reset(self):
+        raise NotImplementedError()
+
+    def _load(self, data):
+        raise NotImplementedError()
+
+    def _dump(self):
+        raise NotImplementedError()
+
+    def read(self):
+        try:
+            with open(self.index_path) as fh:
+                data = json.load(fh)
+            if data.get('version') != self.VERSION:
+                raise ValueError("unsupported index version %r" % data.get('version'))
+            self._load(data)
+            self._dirty = False
+            return True
+        except (IOError, OSError, KeyError, TypeError, ValueError) as e:
+            log.debug("unable to read prefix index %s\n  because %r", self.index_path, e)
+            self._reset()
+            return False
+
+    def save(self):
+        if not self._dirty:
+            return
+        data = self._dump()
+        data['version'] = self.VERSION
+        tmp_path = '%s.%s.tmp' % (self.index_path, uuid4().hex[:8])
+        try:
+            with open(tmp_path, 'w') as fh:
+                json.dump(data, fh, separators=(',', ':'))
+            backoff_rename(tmp_path, self.index_path, force=True)
+            self._dirty = False
+        except (IOError, OSError) as e:
+            log.debug("unable to write prefix index %s\n  because %r", self.index_path, e)
+            rm_rf(tmp_path)
+
+
+class PrefixRecordsIndex(_PrefixIndexFile):
+    # conda-meta/records_index holds every conda-meta record except for its
+    #   PrefixRecord.deferred_fields, so loading a prefix doesn't have to parse the files and
+    #   paths_data arrays that make up most of each record
+    #
+    # Each entry is trusted as long as the mtime and size of its conda-meta json file are
+    #   unchanged.  Entries are only added and dropped while the prefix is loaded, so records
+    #   written by a transaction get indexed by the next load.
+
+    index_file = PREFIX_RECORDS_INDEX_FILE
+
+    def _reset(self):
+        self.entries = {}
+
+    def _load(self, data):
+        self.entries = data['entries']
+
+    def _dump(self):
+        return {'entries': self.entries}
+
+    def retain(self, meta_files):
+        entries = self.entries
+        if len(entries) != len(meta_files) or any(fn not in entries for fn in meta_files):
+            self.entries = {fn: entries[fn] for fn in meta_files if fn in entries}
+            self._dirty = True
+
+    @staticmethod
+    def file_key(prefix_record_json_path):
+        try:
+            st = stat(prefix_record_json_path)
+        except (IOError, OSError):
+            return None
+        return [st.st_mtime, st.st_size]
+
+    def get(self, prefix_record_json_path, file_key):
+        entry = self.entries.get(basename(prefix_record_json_path))
+        if entry is None or entry[0] != file_key:
+            return None
+        return entry[1]
+
+    def set(self, prefix_record_json_path, file_key, header):
+        self.entries[basename(prefix_record_json_path)] = [file_key, header]
+        self._dirty = True
+
+
+class SitePackagesIndex(_PrefixIndexFile):
+    # conda-meta/site_packages_index caches what PrefixData._load_site_packages() finds in
+    #   site-packages when pip interop is enabled:
+    #   - the anchor files, trusted while the mtime of the site-packages directory is unchanged
+    #   - the anchor file of each conda python package, by record; conda never changes the
+    #     files of an installed record
+    #   - the header of each record made by read_python_record(), trusted while the metadata
+    #     it was read from is unchanged; its deferred fields are read again when used
+    #
+    # .egg-link anchors point at metadata outside of the prefix and are never cached.
+
+    index_file = PREFIX_SITE_PACKAGES_INDEX_FILE
+
+    def _reset(self):
+        self.site_packages = None
+        self.anchor_files = None
+        self.conda_anchor_files = {}
+        self.python_records = {}
+
+    def _load(self, data):
+        self.site_packages = data['site_packages']
+        self.anchor_files = data['anchor_files']
+        self.conda_anchor_files = data['conda_anchor_files']
+        self.python_records = data['python_records']
+
+    def _dump(self):
+        return {
+            'site_packages': self.site_packages,
+            'anchor_files': self.anchor_files,
+            'conda_anchor_files': self.conda_anchor_files,
+            'python_records': self.python_records,
+        }
+
+    def get_site_packages_anchor_files(self, site_packages_path, site_packages_dir):
+        try:
+            site_packages = [site_packages_dir, stat(site_packages_path).st_mtime]
+        except (IOError, OSError):
+            site_packages = None
+        if site_packages is None or site_packages != self.site_packages:
+            if self.site_packages and site_packages_dir != self.site_packages[0]:
+                # a different python; nothing in the index applies anymore
+                self._reset()
+            self.site_packages = site_packages
+            self.anchor_files = sorted(
+                get_site_packages_anchor_files(site_packages_path, site_packages_dir)
+            )
+            self._dirty = True
+        return set(self.anchor_files)
+
+    @staticmethod
+    def _conda_record_key(prefix_record):
+        return "%s %s" % (prefix_record.dist_str(), prefix_record.get('md5') or '')
+
+    def get_conda_anchor_files_and_records(self, site_packages_dir, python_records):
+        conda_anchor_files = self.conda_anchor_files
+        retained = {}
+        conda_python_packages = odict()
+        unknown_records = []
+        for prefix_record in python_records:
+            key = self._conda_record_key(prefix_record)
+            if key in conda_anchor_files:
+                retained[key] = conda_anchor_files[key]
+                if retained[key]:
+                    conda_python_packages[retained[key]] = prefix_record
+            else:
+                unknown_records.append(prefix_record)
+
+        if unknown_records:
+            found = get_conda_anchor_files_and_records(site_packages_dir, unknown_records)
+            anchor_files = {prefix_record.name: anchor_file
+                            for anchor_file, prefix_record in iteritems(found)}
+            for prefix_record in unknown_records:
+                retained[self._conda_record_key(prefix_record)] = anchor_files.get(
+                    prefix_record.name)
+            conda_python_packages.update(found)
+
+        if retained != conda_anchor_files:
+            self.conda_anchor_files = retained
+            self._dirty = True
+        return conda_python_packages
+
+    @staticmethod
+    def anchor_key(prefix_path, anchor_file):
+        if anchor_file.endswith('.egg-link'):
+            return None
+        anchor_path = join(prefix_path, win_path_ok(anchor_file))
+        try:
+            if anchor_file.endswith(('/RECORD', '/PKG-INFO')):
+                # read_python_record() reads other files next to the anchor file, too
+                metadata_dir = dirname(anchor_path)
+                sts = [stat(join(metadata_dir, fn)) for fn in listdir(metadata_dir)]
+                sts.append(stat(metadata_dir))
+            else:
+                sts = [stat(anchor_path)]
+        except (IOError, OSError):
+            return None
+        return [len(sts), max(st.st_mtime for st in sts), sum(st.st_size for st in sts)]
+
+    def get_python_record_header(self, anchor_file, anchor_key):
+        entry = self.python_records.get(anchor_file)
+        if entry is None or entry[0] != anchor_key:
+            return None
+        return entry[1]
+
+    def set_python_record_header(self, anchor_file, anchor_key, header):
+        self.python_records[anchor_file] = [anchor_key, header]
+        self._dirty = True
+
+    def retain_python_records(self, anchor_files):
+        python_records = self.python_records
+        if any(af not in anchor_files for af in python_records):
+            self.python_records = {af: entry for af, entry in iteritems(python_records)
+                                   if af in anchor_files}
+            self._dirty = True
+
+
+def _path_index_key(short_path):
+    return short_path.lower() if on_win else short_path
+
+
 def get_conda_anchor_files_and_records(site_packages_short_path, python_records):
     """Return the anchor files for the conda records of python packages."""
     anchor_file_endings = ('.egg-info/PKG-INFO', '.dist-info/RECORD', '.egg-info')
@@ -16,19 +16,28 @@ from logging import DEBUG, getLogger
 from mmap import ACCESS_READ, mmap
 from os.path import dirname, isdir, join, splitext
 import re
+from threading import Lock
 from time import time
+from uuid import uuid4
 import warnings
 
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
 from .. import CondaError
 from .._vendor.auxlib.ish import dals
 from .._vendor.auxlib.logz import stringify
 from .._vendor.boltons.setutils import IndexedSet
-from .._vendor.toolz import concat, take, groupby
-from ..base.constants import CONDA_HOMEPAGE_URL, CONDA_PACKAGE_EXTENSION_V1, REPODATA_FN
+from .._vendor.toolz import concat, concatv, take, groupby
+from ..base.constants import (CONDA_HOMEPAGE_URL, CONDA_PACKAGE_EXTENSION_V1,
+                              CONDA_PACKAGE_EXTENSION_V2, REPODATA_FN)
 from ..base.context import context
-from ..common.compat import (ensure_binary, ensure_text_type, ensure_unicode, iteritems, iterkeys,
-                             string_types, text_type, with_metaclass)
-from ..common.io import ThreadLimitedThreadPoolExecutor, DummyExecutor, dashlist
+from ..common.compat import (Sequence, ensure_binary, ensure_text_type, ensure_unicode, itervalues,
+                             odict, string_types, text_type, with_metaclass)
+from ..common.io import (ProcessPoolExecutor, ThreadLimitedThreadPoolExecutor, DummyExecutor,
+                         dashlist)
 from ..common.url import join_url, maybe_unquote
 from ..core.package_cache_data import PackageCacheData
 from ..exceptions import (CondaDependencyError, CondaHTTPError, CondaUpgradeError,
@@ -38,22 +47,23 @@ from ..gateways.connection import (ConnectionError, HTTPError, InsecureRequestWa
 from ..gateways.connection.session import CondaSession
 from ..gateways.disk import mkdir_p, mkdir_p_sudo_safe
 from ..gateways.disk.delete import rm_rf
-from ..gateways.disk.update import touch
+from ..gateways.disk.update import backoff_rename, touch
+from ..gateways.repodata.columnar import (ColumnarCache, split_track_features,
+                                          write_columnar_cache)
+from ..gateways.repodata.delta import delta_fn, find_delta_chain, merge_repodata_deltas
+from ..gateways.repodata.stream import iter_repodata, iter_repodata_obj, patch_repodata
 from ..models.channel import Channel, all_channel_urls
 from ..models.match_spec import MatchSpec
 from ..models.records import PackageRecord
 
-try:
-    import cPickle as pickle
-except ImportError:  # pragma: no cover
-    import pickle  # NOQA
-
 log = getLogger(__name__)
 stderrlog = getLogger('conda.stderrlog')
 
-REPODATA_PICKLE_VERSION = 28
+REPODATA_CACHE_VERSION = 29
 MAX_REPODATA_VERSION = 1
 REPODATA_HEADER_RE = b'"(_etag|_mod|_cache_control)":[ ]?"(.*?[^\\\\])"[,\}\s]'  # NOQA
+_CACHED_STATE_KEYS = ('fn', '_etag', '_mod', '_cache_control', '_url', '_add_pip',
+                      '_use_only_tar_bz2', '_cache_version', '_schannel', 'repodata_version')
 
 
 class SubdirDataType(type):
@@ -94,17 +104,50 @@ class SubdirData(object):
                          dashlist(ignored_urls))
             channel_urls = IndexedSet(grouped_urls.get(True, ()))
         check_whitelist(channel_urls)
-        subdir_query = lambda url: tuple(SubdirData(Channel(url), repodata_fn=repodata_fn).query(
-            package_ref_or_match_spec))
+        subdir_datas = tuple(SubdirData(Channel(url), repodata_fn=repodata_fn)
+                             for url in channel_urls)
+        subdir_query = lambda sd: tuple(sd.query(package_ref_or_match_spec))
+
+        if context.repodata_processes and not context.debug:
+            SubdirData._load_all_in_processes(subdir_datas)
 
-        # TODO test timing with ProcessPoolExecutor
         Executor = (DummyExecutor if context.debug or context.repodata_threads == 1
                     else partial(ThreadLimitedThreadPoolExecutor,
                                  max_workers=context.repodata_threads))
         with Executor() as executor:
-            result = tuple(concat(executor.map(subdir_query, channel_urls)))
+            result = tuple(concat(executor.map(subdir_query, subdir_datas)))
         return result
 
+    @staticmethod
+    def _load_all_in_processes(subdir_datas):
+        """Fetch and parse not-yet-loaded subdirs in worker processes.
+
+        Each worker writes the columnar cache for its subdir and hands back only the state
+        needed to find it; the records themselves are then memory-mapped here.  Any subdir a
+        worker could not load is left unloaded, for the regular in-process path to handle.
+        """
+        unloaded = [sd for sd in subdir_datas if not sd._loaded]
+        if len(unloaded) < 2:
+            return
+        max_workers = min(context.repodata_processes, len(unloaded))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_load_subdir_data_cache, sd.url_w_credentials,
+                                       sd.repodata_fn, context._argparse_args)
+                       for sd in unloaded]
+            for sd, future in zip(unloaded, futures):
+                try:
+                    result = future.result()
+                except Exception:
+                    log.debug("Repodata worker failed for %s", sd.url_w_repodata_fn,
+                              exc_info=True)
+                    continue
+                if not result:
+                    continue
+                sd.repodata_fn, etag, mod_stamp = result
+                _internal_state = sd._read_columnar_cache(etag, mod_stamp)
+                if _internal_state:
+                    sd._set_internal_state(_internal_state)
+
     def query(self, package_ref_or_match_spec):
         if not self._loaded:
             self.load()
@@ -167,11 +210,13 @@ class SubdirData(object):
         return self.cache_path_base + '.json'
 
     @property
-    def cache_path_pickle(self):
-        return self.cache_path_base + '.q'
+    def cache_path_columnar(self):
+        return self.cache_path_base + '.c'
 
     def load(self):
-        _internal_state = self._load()
+        return self._set_internal_state(self._load())
+
+    def _set_internal_state(self, _internal_state):
         if _internal_state.get("repodata_version", 0) > MAX_REPODATA_VERSION:
             raise CondaUpgradeError(dals("""
                 The current version of conda is too old to read repodata from
@@ -240,15 +285,27 @@ class SubdirData(object):
             log.debug("Local cache timed out for %s at %s",
                       self.url_w_repodata_fn, self.cache_path_json)
 
+            if context.use_repodata_deltas:
+                _internal_state = self._load_deltas(mod_etag_headers.get('_etag'),
+                                                    mod_etag_headers.get('_mod'))
+                if _internal_state:
+                    return _internal_state
+
+        if not isdir(dirname(self.cache_path_json)):
+            mkdir_p(dirname(self.cache_path_json))
         try:
-            raw_repodata_str = fetch_repodata_remote_request(
+            cache_path = fetch_repodata_remote_request(
                 self.url_w_credentials,
                 mod_etag_headers.get('_etag'),
                 mod_etag_headers.get('_mod'),
-                repodata_fn=self.repodata_fn)
+                repodata_fn=self.repodata_fn,
+                cache_path=self.cache_path_json)
             # empty file
-            if not raw_repodata_str and self.repodata_fn != REPODATA_FN:
+            if not cache_path and self.repodata_fn != REPODATA_FN:
                 raise UnavailableInvalidChannel(self.url_w_repodata_fn, 404)
+            if not cache_path:
+                with io_open(self.cache_path_json, 'w') as fh:
+                    fh.write('{}')
         except UnavailableInvalidChannel:
             if self.repodata_fn != REPODATA_FN:
                 self.repodata_fn = REPODATA_FN
@@ -262,42 +319,110 @@ class SubdirData(object):
             _internal_state = self._read_local_repdata(mod_etag_headers.get('_etag'),
                                                        mod_etag_headers.get('_mod'))
             return _internal_state
+        except (IOError, OSError) as e:
+            if e.errno in (EACCES, EPERM, EROFS):
+                raise NotWritableError(self.cache_path_json, e.errno, caused_by=e)
+            else:
+                raise
         else:
-            if not isdir(dirname(self.cache_path_json)):
-                mkdir_p(dirname(self.cache_path_json))
-            try:
-                with io_open(self.cache_path_json, 'w') as fh:
-                    fh.write(raw_repodata_str or '{}')
-            except (IOError, OSError) as e:
-                if e.errno in (EACCES, EPERM, EROFS):
-                    raise NotWritableError(self.cache_path_json, e.errno, caused_by=e)
-                else:
-                    raise
-            _internal_state = self._process_raw_repodata_str(raw_repodata_str)
-            self._internal_state = _internal_state
-            self._pickle_me()
-            return _internal_state
+            # the response was streamed straight to disk; parse it from there
+            return self._read_cached_json()
 
-    def _pickle_me(self):
+    def _load_deltas(self, etag, mod_stamp):
+        if not (etag or mod_stamp):
+            return None
+        delta_document = fetch_repodata_deltas(self.url_w_credentials, self.repodata_fn)
+        if not delta_document:
+            return None
+        chain = find_delta_chain(delta_document, etag, mod_stamp)
+        if chain is None:
+            log.debug("No repodata delta chain from the cached state of %s",
+                      self.url_w_repodata_fn)
+            return None
+        elif not chain:
+            log.debug("Repodata deltas show %s is unchanged. Updating mtime and loading from disk",
+                      self.url_w_repodata_fn)
+            touch(self.cache_path_json)
+            return self._read_local_repdata(etag, mod_stamp)
+
+        log.debug("Applying %d repodata deltas to %s", len(chain), self.cache_path_json)
+        delta = merge_repodata_deltas(chain)
+        changed_fns = set(concat(concatv(itervalues(delta['remove']), itervalues(delta['add']))))
+        # the records the deltas leave alone are copied over from the columnar cache as they are
+        source = self._open_columnar_cache(etag, mod_stamp)
+        source_position = None
+        if source is not None:
+            source_positions = {source.fn(i): i for i in range(len(source))}
+
+            def source_position(info):
+                fn = info['fn']
+                if fn in changed_fns:
+                    return None
+                if fn.endswith(CONDA_PACKAGE_EXTENSION_V2):
+                    # legacy_bz2_md5 and legacy_bz2_size come from the .tar.bz2 counterpart
+                    counterpart = fn[:-len(CONDA_PACKAGE_EXTENSION_V2)]
+                    if counterpart + CONDA_PACKAGE_EXTENSION_V1 in changed_fns:
+                        return None
+                return source_positions.get(fn)
+
+        tmp_path = '%s.%s.tmp' % (self.cache_path_json, uuid4().hex[:8])
         try:
-            log.debug("Saving pickled state for %s at %s", self.url_w_repodata_fn,
-                      self.cache_path_json)
-            with open(self.cache_path_pickle, 'wb') as fh:
-                pickle.dump(self._internal_state, fh, -1)  # -1 means HIGHEST_PROTOCOL
+            with open(self.cache_path_json) as fh, open(tmp_path, 'w') as out:
+                _internal_state = self._process_repodata_entries(
+                    patch_repodata(fh, out, delta), save_cache=True,
+                    source=source, source_position=source_position,
+                )
+        except (IOError, OSError) as e:
+            rm_rf(tmp_path)
+            if e.errno in (EACCES, EPERM, EROFS):
+                raise NotWritableError(self.cache_path_json, e.errno, caused_by=e)
+            else:
+                raise
+        except ValueError as e:
+            rm_rf(tmp_path)
+            log.debug("Error applying repodata deltas to '%s'\n%r", self.cache_path_json, e)
+            return None
         except Exception:
-            log.debug("Failed to dump pickled repodata.", exc_info=True)
+            rm_rf(tmp_path)
+            raise
+        finally:
+            if source is not None:
+                source.close()
+        backoff_rename(tmp_path, self.cache_path_json, force=True)
+        return _internal_state
+
+    def _save_columnar_cache(self, _internal_state, record_infos, meta_in_common, source=None,
+                             source_positions=None):
+        try:
+            log.debug("Saving columnar cache for %s at %s", self.url_w_repodata_fn,
+                      self.cache_path_columnar)
+            meta = {key: _internal_state[key] for key in _CACHED_STATE_KEYS}
+            meta.update((key, meta_in_common[key]) for key in ('arch', 'platform', 'subdir'))
+            write_columnar_cache(self.cache_path_columnar, meta, record_infos,
+                                 exclude_keys=tuple(meta_in_common) + ('url',), source=source,
+                                 source_positions=source_positions)
+            # caches written by older versions of conda
+            rm_rf(self.cache_path_base + '.q')
+        except Exception:
+            log.debug("Failed to write columnar repodata cache.", exc_info=True)
 
     def _read_local_repdata(self, etag, mod_stamp):
-        # first try reading pickled data
-        _pickled_state = self._read_pickled(etag, mod_stamp)
-        if _pickled_state:
-            return _pickled_state
+        # first try reading the columnar cache
+        _cached_state = self._read_columnar_cache(etag, mod_stamp)
+        if _cached_state:
+            return _cached_state
+
+        # columnar cache is bad or doesn't exist; load cached json
+        return self._read_cached_json()
 
-        # pickled data is bad or doesn't exist; load cached json
+    def _read_cached_json(self):
         log.debug("Loading raw json for %s at %s", self.url_w_repodata_fn, self.cache_path_json)
         with open(self.cache_path_json) as fh:
             try:
-                raw_repodata_str = fh.read()
+                # records are grouped as they are parsed; neither the raw text nor the whole
+                #   parsed document is ever held in memory
+                _internal_state = self._process_repodata_entries(iter_repodata(fh),
+                                                                 save_cache=True)
             except ValueError as e:
                 # ValueError: Expecting object: line 11750 column 6 (char 303397)
                 log.debug("Error for cache path: '%s'\n%r", self.cache_path_json, e)
@@ -307,56 +432,148 @@ class SubdirData(object):
                 so they can be downloaded again.
                 """)
                 raise CondaError(message)
-            else:
-                _internal_state = self._process_raw_repodata_str(raw_repodata_str)
-                self._internal_state = _internal_state
-                self._pickle_me()
-                return _internal_state
+        return _internal_state
+
+    def _read_columnar_cache(self, etag, mod_stamp):
+        columns = self._open_columnar_cache(etag, mod_stamp)
+        if columns is None:
+            return None
+        meta = columns.meta
+
+        meta_in_common = {
+            'arch': meta['arch'],
+            'channel': self.channel,
+            'platform': meta['platform'],
+            'schannel': meta['_schannel'],
+            'subdir': meta['subdir'],
+        }
+        _package_records = _LazyPackageRecords(len(columns), columns.info,
+                                               self._record_factory(meta_in_common))
+        _internal_state = {
+            'channel': self.channel,
+            'url_w_subdir': self.url_w_subdir,
+            'url_w_credentials': self.url_w_credentials,
+            'cache_path_base': self.cache_path_base,
 
-    def _read_pickled(self, etag, mod_stamp):
+            '_package_records': _package_records,
+            '_names_index': _LazyRecordIndex(_package_records, columns.names,
+                                             columns.positions),
+            '_track_features_index': _LazyRecordIndex(_package_records, columns.track_features,
+                                                      columns.track_features.get),
+        }
+        _internal_state.update((key, meta[key]) for key in _CACHED_STATE_KEYS)
+        return _internal_state
 
-        if not isfile(self.cache_path_pickle) or not isfile(self.cache_path_json):
-            # Don't trust pickled data if there is no accompanying json data
+    def _open_columnar_cache(self, etag, mod_stamp):
+        """The columnar cache, if it holds the repodata state ``etag`` / ``mod_stamp`` parsed
+        under the current settings; None otherwise.
+        """
+        if not isfile(self.cache_path_columnar) or not isfile(self.cache_path_json):
+            # Don't trust cached data if there is no accompanying json data
             return None
 
         try:
-            if isfile(self.cache_path_pickle):
-                log.debug("found pickle file %s", self.cache_path_pickle)
-            with open(self.cache_path_pickle, 'rb') as fh:
-                _pickled_state = pickle.load(fh)
+            log.debug("found columnar cache file %s", self.cache_path_columnar)
+            columns = ColumnarCache(self.cache_path_columnar)
         except Exception:
-            log.debug("Failed to load pickled repodata.", exc_info=True)
-            rm_rf(self.cache_path_pickle)
+            log.debug("Failed to load columnar repodata cache.", exc_info=True)
+            rm_rf(self.cache_path_columnar)
             return None
-
-        def _check_pickled_valid():
-            yield _pickled_state.get('_url') == self.url_w_credentials
-            yield _pickled_state.get('_schannel') == self.channel.canonical_name
-            yield _pickled_state.get('_add_pip') == context.add_pip_as_python_dependency
-            yield _pickled_state.get('_mod') == mod_stamp
-            yield _pickled_state.get('_etag') == etag
-            yield _pickled_state.get('_pickle_version') == REPODATA_PICKLE_VERSION
-            yield _pickled_state.get('fn') == self.repodata_fn
-
-        if not all(_check_pickled_valid()):
-            log.debug("Pickle load validation failed for %s at %s.",
+        meta = columns.meta
+
+        def _check_cache_valid():
+            yield meta.get('_url') == self.url_w_credentials
+            yield meta.get('_schannel') == self.channel.canonical_name
+            yield meta.get('_add_pip') == context.add_pip_as_python_dependency
+            yield meta.get('_use_only_tar_bz2') == context.use_only_tar_bz2
+            yield meta.get('_mod') == mod_stamp
+            yield meta.get('_etag') == etag
+            yield meta.get('_cache_version') == REPODATA_CACHE_VERSION
+            yield meta.get('fn') == self.repodata_fn
+
+        if not all(_check_cache_valid()):
+            log.debug("Columnar cache validation failed for %s at %s.",
                       self.url_w_repodata_fn, self.cache_path_json)
+            columns.close()
             return None
+        return columns
 
-        return _pickled_state
+    def _record_factory(self, meta_in_common):
+        channel_url = self.url_w_credentials
+
+        def make_record(info):
+            info['url'] = join_url(channel_url, info['fn'])
+            info.update(meta_in_common)
+            return PackageRecord(**info)
 
-    def _process_raw_repodata_str(self, raw_repodata_str):
+        return make_record
+
+    def _process_raw_repodata_str(self, raw_repodata_str, save_cache=False):
         json_obj = json.loads(raw_repodata_str or '{}')
+        return self._process_raw_repodata(json_obj, save_cache=save_cache)
+
+    def _process_raw_repodata(self, json_obj, save_cache=False):
+        return self._process_repodata_entries(iter_repodata_obj(json_obj),
+                                              save_cache=save_cache)
+
+    def _process_repodata_entries(self, entries, save_cache=False, source=None,
+                                  source_position=None):
+        """Build the internal state from the ``(key, fn, info)`` entries of ``iter_repodata``.
+
+        Each record is filtered and kept as it arrives; a .tar.bz2 record is dropped as soon as
+        its .conda counterpart is seen, whichever of the two comes first.  When saving the cache,
+        ``source_position(info)`` may give the position of the same record in the ColumnarCache
+        ``source``, to copy it from there.
+        """
+        add_pip = context.add_pip_as_python_dependency
+        use_only_tar_bz2 = context.use_only_tar_bz2
+        channel_url = self.url_w_credentials
+        _tar_bz2 = CONDA_PACKAGE_EXTENSION_V1
+
+        def keep(fn, info):
+            info['fn'] = fn
+            if (add_pip and info['name'] == 'python' and
+                    info['version'].startswith(('2.', '3.'))):
+                info['depends'].append('pip')
+            if info.get('record_version', 0) > 1:
+                log.debug("Ignoring record_version %d from %s",
+                          info["record_version"], join_url(channel_url, fn))
+                return False
+            return True
+
+        json_obj = {}
+        conda_infos = []
+        # .tar.bz2 fn -> info of the records without a .conda counterpart so far
+        legacy_infos = odict()
+        # .tar.bz2 fn -> info of the .conda record replacing it, or None if it was ignored
+        conda_counterparts = {}
+        for key, fn, info in entries:
+            if fn is None:
+                json_obj[key] = info
+            elif key == 'packages':
+                if fn in conda_counterparts:
+                    conda_info = conda_counterparts[fn]
+                    if conda_info is not None:
+                        conda_info['legacy_bz2_md5'] = info.get('md5')
+                        conda_info['legacy_bz2_size'] = info.get('size')
+                elif keep(fn, info):
+                    legacy_infos[fn] = info
+            elif not use_only_tar_bz2:
+                counterpart = fn[:-6] + _tar_bz2
+                legacy_info = legacy_infos.pop(counterpart, None)
+                if legacy_info is not None:
+                    info['legacy_bz2_md5'] = legacy_info.get('md5')
+                    info['legacy_bz2_size'] = legacy_info.get('size')
+                if keep(fn, info):
+                    conda_infos.append(info)
+                    conda_counterparts[counterpart] = info
+                else:
+                    conda_counterparts[counterpart] = None
 
         subdir = json_obj.get('info', {}).get('subdir') or self.channel.subdir
         assert subdir == self.channel.subdir
-        add_pip = context.add_pip_as_python_dependency
         schannel = self.channel.canonical_name
 
-        self._package_records = _package_records = []
-        self._names_index = _names_index = defaultdict(list)
-        self._track_features_index = _track_features_index = defaultdict(list)
-
         _internal_state = {
             'channel': self.channel,
             'url_w_subdir': self.url_w_subdir,
@@ -364,16 +581,13 @@ class SubdirData(object):
             'cache_path_base': self.cache_path_base,
             'fn': self.repodata_fn,
 
-            '_package_records': _package_records,
-            '_names_index': _names_index,
-            '_track_features_index': _track_features_index,
-
             '_etag': json_obj.get('_etag'),
             '_mod': json_obj.get('_mod'),
             '_cache_control': json_obj.get('_cache_control'),
             '_url': json_obj.get('_url'),
             '_add_pip': add_pip,
-            '_pickle_version': REPODATA_PICKLE_VERSION,
+            '_use_only_tar_bz2': use_only_tar_bz2,
+            '_cache_version': REPODATA_CACHE_VERSION,
             '_schannel': schannel,
             'repodata_version': json_obj.get('repodata_version', 0),
         }
@@ -395,44 +609,132 @@ class SubdirData(object):
             'subdir': subdir,
         }
 
-        channel_url = self.url_w_credentials
-        legacy_packages = json_obj.get("packages", {})
-        conda_packages = {} if context.use_only_tar_bz2 else json_obj.get("packages.conda", {})
-
-        _tar_bz2 = CONDA_PACKAGE_EXTENSION_V1
-        use_these_legacy_keys = set(iterkeys(legacy_packages)) - set(
-            k[:-6] + _tar_bz2 for k in iterkeys(conda_packages)
+        # PackageRecord construction is deferred until a record is actually asked for;
+        #   here the raw dicts are only grouped by name
+        record_infos = conda_infos
+        record_infos.extend(itervalues(legacy_infos))
+        del conda_counterparts, legacy_infos
+        positions_by_name = defaultdict(list)
+        positions_by_track_feature = defaultdict(list)
+        for position, info in enumerate(record_infos):
+            positions_by_name[info['name']].append(position)
+            if info.get('track_features'):
+                for ftr_name in split_track_features(info['track_features']):
+                    positions_by_track_feature[ftr_name].append(position)
+
+        if save_cache:
+            source_positions = None
+            if source is not None:
+                source_positions = [source_position(info) for info in record_infos]
+            self._save_columnar_cache(_internal_state, record_infos, meta_in_common, source,
+                                      source_positions)
+
+        self._package_records = _package_records = _LazyPackageRecords(
+            len(record_infos), _take_item(record_infos), self._record_factory(meta_in_common)
         )
+        self._names_index = _LazyRecordIndex(_package_records, positions_by_name,
+                                             positions_by_name.get)
+        self._track_features_index = _LazyRecordIndex(_package_records,
+                                                      positions_by_track_feature,
+                                                      positions_by_track_feature.get)
+        _internal_state.update({
+            '_package_records': self._package_records,
+            '_names_index': self._names_index,
+            '_track_features_index': self._track_features_index,
+        })
+        self._internal_state = _internal_state
+        return _internal_state
 
-        for group, copy_legacy_md5 in (
-                (iteritems(conda_packages), True),
-                (((k, legacy_packages[k]) for k in use_these_legacy_keys), False)):
-            for fn, info in group:
-                info['fn'] = fn
-                info['url'] = join_url(channel_url, fn)
-                if copy_legacy_md5:
-                    counterpart = fn.replace('.conda', '.tar.bz2')
-                    if counterpart in legacy_packages:
-                        info['legacy_bz2_md5'] = legacy_packages[counterpart].get('md5')
-                        info['legacy_bz2_size'] = legacy_packages[counterpart].get('size')
-                if (add_pip and info['name'] == 'python' and
-                        info['version'].startswith(('2.', '3.'))):
-                    info['depends'].append('pip')
-                info.update(meta_in_common)
-                if info.get('record_version', 0) > 1:
-                    log.debug("Ignoring record_version %d from %s",
-                              info["record_version"], info['url'])
-                    continue
 
-                package_record = PackageRecord(**info)
+def _take_item(items):
+    # hand out each item once, dropping our reference to it
+    def take(position):
+        item, items[position] = items[position], None
+        return item
+    return take
 
-                _package_records.append(package_record)
-                _names_index[package_record.name].append(package_record)
-                for ftr_name in package_record.track_features:
-                    _track_features_index[ftr_name].append(package_record)
 
-        self._internal_state = _internal_state
-        return _internal_state
+class _LazyPackageRecords(Sequence):
+    """Sequence of PackageRecord, each built on first access.
+
+    ``get_info(position)`` supplies the raw record dict that ``make_record`` turns into a
+    PackageRecord; it is called at most once per position.
+    """
+
+    def __init__(self, count, get_info, make_record):
+        self._get_info = get_info
+        self._make_record = make_record
+        self._records = [None] * count
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._records)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        prec = self._records[position]
+        if prec is None:
+            with self._lock:
+                prec = self._records[position]
+                if prec is None:
+                    prec = self._make_record(self._get_info(position))
+                    self._records[position] = prec
+        return prec
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+
+class _LazyRecordIndex(object):
+    """Read-only stand-in for a ``defaultdict(list)`` index of PackageRecord by key.
+
+    Only the records under a key that is actually looked up are built.
+    """
+
+    def __init__(self, package_records, keys, get_positions):
+        self._package_records = package_records
+        self._keys = keys
+        self._get_positions = get_positions
+
+    def __getitem__(self, key):
+        return [self._package_records[i] for i in self._get_positions(key) or ()]
+
+    def get(self, key, default=None):
+        return self[key] if key in self._keys else default
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def keys(self):
+        return list(self._keys)
+
+
+def _load_subdir_data_cache(url, repodata_fn, argparse_args):
+    """Worker for ``SubdirData._load_all_in_processes``.
+
+    Returns the ``(repodata_fn, etag, mod_stamp)`` the written columnar cache is valid for,
+    or None if the subdir could not be loaded.
+    """
+    # a spawned (rather than forked) worker starts out with a context built from scratch
+    if context._argparse_args != argparse_args:
+        context.__init__(argparse_args=argparse_args)
+    subdir_data = SubdirData(Channel(url), repodata_fn=repodata_fn)
+    try:
+        _internal_state = subdir_data._load()
+    except Exception:
+        log.debug("Failed to load %s in repodata worker", url, exc_info=True)
+        return None
+    return subdir_data.repodata_fn, _internal_state.get('_etag'), _internal_state.get('_mod')
 
 
 def read_mod_and_etag(path):
@@ -463,7 +765,18 @@ class Response304ContentUnchanged(Exception):
     pass
 
 
-def fetch_repodata_remote_request(url, etag, mod_stamp, repodata_fn=REPODATA_FN):
+def fetch_repodata_remote_request(url, etag, mod_stamp, repodata_fn=REPODATA_FN,
+                                  cache_path=None):
+    """
+    Fetch repodata, returning the raw repodata text with the ``_url``, ``_etag``, ``_mod``
+    and ``_cache_control`` fields added.
+
+    If ``cache_path`` is given, the response is instead decompressed chunk by chunk as it
+    arrives and written straight to ``cache_path``, which is then returned.  The compressed
+    body, the decompressed bytes and the decoded text then never need to be held in memory.
+
+    Returns None when the channel has no repodata for this subdir.
+    """
     if not context.ssl_verify:
         warnings.simplefilter('ignore', InsecureRequestWarning)
 
@@ -476,13 +789,15 @@ def fetch_repodata_remote_request(url, etag, mod_stamp, repodata_fn=REPODATA_FN)
         headers["If-Modified-Since"] = mod_stamp
 
     headers['Accept-Encoding'] = 'gzip, deflate, compress, identity'
+    if zstandard:
+        headers['Accept-Encoding'] = 'zstd, ' + headers['Accept-Encoding']
     headers['Content-Type'] = 'application/json'
     filename = repodata_fn
 
     try:
         timeout = context.remote_connect_timeout_secs, context.remote_read_timeout_secs
         resp = session.get(join_url(url, filename), headers=headers, proxies=session.proxies,
-                           timeout=timeout)
+                           timeout=timeout, stream=True)
         if log.isEnabledFor(DEBUG):
             log.debug(stringify(resp, content_max_len=256))
         resp.raise_for_status()
@@ -595,20 +910,21 @@ def fetch_repodata_remote_request(url, etag, mod_stamp, repodata_fn=REPODATA_FN)
                              caused_by=e)
 
     if resp.status_code == 304:
+        resp.close()
         raise Response304ContentUnchanged()
 
-    def maybe_decompress(filename, resp_content):
-        return ensure_text_type(bz2.decompress(resp_content)
-                                if filename.endswith('.bz2')
-                                else resp_content).strip()
-
-    json_str = maybe_decompress(filename, resp.content)
-
     saved_fields = {'_url': url}
     add_http_value_to_dict(resp, 'Etag', saved_fields, '_etag')
     add_http_value_to_dict(resp, 'Last-Modified', saved_fields, '_mod')
     add_http_value_to_dict(resp, 'Cache-Control', saved_fields, '_cache_control')
 
+    with closing(resp):
+        chunks = iter_repodata_content(resp, filename)
+        if cache_path:
+            write_raw_repodata(cache_path, saved_fields, chunks)
+            return cache_path
+        json_str = ensure_text_type(b''.join(chunks)).strip()
+
     # add extra values to the raw repodata json
     if json_str and json_str != "{}":
         raw_repodata_str = u"%s, %s" % (
@@ -620,6 +936,98 @@ def fetch_repodata_remote_request(url, etag, mod_stamp, repodata_fn=REPODATA_FN)
     return raw_repodata_str
 
 
+def _zstd_decompressobj(what):
+    if zstandard is None:
+        raise CondaDependencyError("The zstandard package is required to decompress %s."
+                                   % what)
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+def iter_repodata_content(resp, filename, chunk_size=2 ** 16):
+    """
+    Yield the decoded bytes of a repodata response as they arrive, undoing both the
+    negotiated Content-Encoding and any compression implied by the file name
+    (``repodata.json.bz2``, ``repodata.json.zst``).
+    """
+    if resp.headers.get('Content-Encoding', '').strip().lower() == 'zstd':
+        decompressor = _zstd_decompressobj(resp.url)
+        chunks = (decompressor.decompress(chunk)
+                  for chunk in resp.raw.stream(chunk_size, decode_content=False))
+    else:
+        # gzip and deflate are decoded by requests
+        chunks = resp.iter_content(chunk_size)
+
+    if filename.endswith('.bz2'):
+        decompressor = bz2.BZ2Decompressor()
+    elif filename.endswith('.zst'):
+        decompressor = _zstd_decompressobj(filename)
+    else:
+        return chunks
+    return (decompressor.decompress(chunk) for chunk in chunks)
+
+
+def write_raw_repodata(cache_path, saved_fields, chunks):
+    """
+    Write a repodata json document, given as an iterable of byte chunks, to ``cache_path``
+    with ``saved_fields`` merged in at the top of the object, where read_mod_and_etag looks
+    for them.  The file is written next to ``cache_path`` and moved into place once complete.
+    """
+    chunks = iter(chunks)
+    head = b''
+    for chunk in chunks:
+        head += chunk
+        # enough to tell whether the object is empty: '{' and the next non-blank byte
+        if head.lstrip()[1:].lstrip():
+            break
+    head = head.lstrip()
+
+    tmp_path = '%s.%s.tmp' % (cache_path, uuid4().hex[:8])
+    try:
+        with open(tmp_path, 'wb') as fh:
+            if head and not head.startswith(b'{'):
+                # not a bare json object (a byte order mark, say); merge through json instead
+                json_str = ensure_text_type(head + b''.join(chunks)).lstrip(u'\ufeff')
+                repodata = json.loads(json_str)
+                if not isinstance(repodata, dict):
+                    raise ValueError("repodata is not a json object: %s" % cache_path)
+                raw_repodata = odict(saved_fields)
+                raw_repodata.update(repodata)
+                fh.write(ensure_binary(json.dumps(raw_repodata)))
+            else:
+                body = head[1:].lstrip()
+                if not body or body.startswith(b'}'):
+                    fh.write(ensure_binary(json.dumps(saved_fields)))
+                else:
+                    fh.write(ensure_binary(json.dumps(saved_fields)[:-1] + ', '))
+                    fh.write(body)
+                    for chunk in chunks:
+                        fh.write(chunk)
+    except Exception:
+        rm_rf(tmp_path)
+        raise
+    backoff_rename(tmp_path, cache_path, force=True)
+
+
+def fetch_repodata_deltas(url, repodata_fn=REPODATA_FN):
+    # Deltas are only an optimization.  Any failure here falls back to fetching the full
+    #   repodata, which is where real problems with the channel get reported.
+    if not context.ssl_verify:
+        warnings.simplefilter('ignore', InsecureRequestWarning)
+
+    session = CondaSession()
+    try:
+        timeout = context.remote_connect_timeout_secs, context.remote_read_timeout_secs
+        resp = session.get(join_url(url, delta_fn(repodata_fn)), proxies=session.proxies,
+                           timeout=timeout)
+        if log.isEnabledFor(DEBUG):
+            log.debug(stringify(resp, content_max_len=256))
+        resp.raise_for_status()
+        return json.loads(ensure_text_type(resp.content))
+    except Exception as e:
+        log.debug("Repodata deltas not available for %s (%r)", join_url(url, repodata_fn), e)
+        return None
+
+
 def make_feature_record(feature_name):
     # necessary for the SAT solver to do the right thing with features
     pkg_name = "%s@" % feature_name
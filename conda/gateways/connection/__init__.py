@@ -19,12 +19,14 @@ def should_bypass_proxies_patched(should_bypass_proxies_func, url, no_proxy=None
 
 try:
     from requests import ConnectionError, HTTPError, Session
-    from requests.adapters import BaseAdapter, HTTPAdapter
+    from requests.adapters import BaseAdapter, DEFAULT_POOLSIZE, HTTPAdapter
     from requests.auth import AuthBase, _basic_auth_str
     from requests.cookies import extract_cookies_to_jar
-    from requests.exceptions import InvalidSchema, SSLError, ProxyError as RequestsProxyError
+    from requests.exceptions import (ChunkedEncodingError, InvalidSchema, SSLError,
+                                     ProxyError as RequestsProxyError)
     from requests.hooks import dispatch_hook
     from requests.models import Response
+    from requests.packages.urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
     from requests.packages.urllib3.exceptions import InsecureRequestWarning
     from requests.structures import CaseInsensitiveDict
     from requests.utils import get_auth_from_url, get_netrc_auth
@@ -37,13 +39,15 @@ try:
                                                    should_bypass_proxies)
 except ImportError:  # pragma: no cover
     from pip._vendor.requests import ConnectionError, HTTPError, Session
-    from pip._vendor.requests.adapters import BaseAdapter, HTTPAdapter
+    from pip._vendor.requests.adapters import BaseAdapter, DEFAULT_POOLSIZE, HTTPAdapter
     from pip._vendor.requests.auth import AuthBase, _basic_auth_str
     from pip._vendor.requests.cookies import extract_cookies_to_jar
-    from pip._vendor.requests.exceptions import (InvalidSchema, SSLError,
+    from pip._vendor.requests.exceptions import (ChunkedEncodingError, InvalidSchema, SSLError,
                                                  ProxyError as RequestsProxyError)
     from pip._vendor.requests.hooks import dispatch_hook
     from pip._vendor.requests.models import Response
+    from pip._vendor.requests.packages.urllib3.connectionpool import (HTTPConnectionPool,
+                                                                      HTTPSConnectionPool)
     from pip._vendor.requests.packages.urllib3.exceptions import InsecureRequestWarning
     from pip._vendor.requests.structures import CaseInsensitiveDict
     from pip._vendor.requests.utils import get_auth_from_url, get_netrc_auth
@@ -62,12 +66,16 @@ Response = Response
 CaseInsensitiveDict = CaseInsensitiveDict
 Session = Session
 HTTPAdapter = HTTPAdapter
+DEFAULT_POOLSIZE = DEFAULT_POOLSIZE
+HTTPConnectionPool = HTTPConnectionPool
+HTTPSConnectionPool = HTTPSConnectionPool
 AuthBase = AuthBase
 _basic_auth_str = _basic_auth_str
 extract_cookies_to_jar = extract_cookies_to_jar
 get_auth_from_url = get_auth_from_url
 get_netrc_auth = get_netrc_auth
 ConnectionError = ConnectionError
+ChunkedEncodingError = ChunkedEncodingError
 HTTPError = HTTPError
 InvalidSchema = InvalidSchema
 SSLError = SSLError
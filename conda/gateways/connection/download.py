@@ -3,9 +3,11 @@
 # SPDX-License-Identifier: BSD-3-Clause
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+from errno import ECONNRESET
 import hashlib
 from logging import DEBUG, getLogger
-from os.path import basename, exists, join
+from os.path import basename, exists, isfile, join
+import re
 import tempfile
 import warnings
 import sys
@@ -13,10 +15,11 @@ import os
 import ctypes
 from ctypes.util import find_library
 
-from . import (ConnectionError, HTTPError, InsecureRequestWarning, InvalidSchema,
-               SSLError, RequestsProxyError)
+from . import (ChunkedEncodingError, ConnectionError, HTTPError, InsecureRequestWarning,
+               InvalidSchema, SSLError, RequestsProxyError)
 from .session import CondaSession
 from ..disk.delete import rm_rf
+from ..disk.update import rename
 from ... import CondaError
 from ..._vendor.auxlib.ish import dals
 from ..._vendor.auxlib.logz import stringify
@@ -70,6 +73,145 @@ def preload_openssl():
         ctypes.WinDLL(libssl_path)
 
 
+PARTIAL_EXTENSION = '.partial'
+_CONTENT_RANGE_RE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+
+class _IncompleteDownloadError(CondaError):
+    """The response body ended before Content-Length bytes were received."""
+
+
+class _PartialDownload(object):
+    """
+    A download streamed into a ``.partial`` file next to its final target.
+
+    The bytes already written and the running checksum survive a dropped connection, so a
+    retry only asks the server for the remainder of the file using ``Range`` (guarded by
+    ``If-Range`` when the server gave us a validator) instead of starting from byte 0.
+    """
+
+    def __init__(self, url, target_full_path, checksum_type=None):
+        self.url = url
+        self.target_full_path = target_full_path
+        self.path = target_full_path + PARTIAL_EXTENSION
+        self.checksum_type = checksum_type
+        self.restart()
+        if checksum_type and isfile(self.path):
+            # Left behind by an earlier attempt. Without a validator we can't ask the server
+            # whether it still matches; if the final checksum doesn't, download() starts over.
+            with open(self.path, 'rb') as fh:
+                for chunk in iter(lambda: fh.read(2 ** 20), b''):
+                    self.checksum_builder.update(chunk)
+                    self.offset += len(chunk)
+            log.debug("found %d bytes of partial download for %s", self.offset, url)
+
+    def restart(self):
+        self.offset = 0
+        self.checksum_builder = hashlib.new(self.checksum_type) if self.checksum_type else None
+        self.validator = None
+        self.resumable = True
+        # True once bytes from an earlier response (or an earlier process) were kept
+        self.resumed = False
+
+    @property
+    def request_headers(self):
+        if not self.offset:
+            return {}
+        headers = {
+            'Range': 'bytes=%d-' % self.offset,
+            # ranges are computed over the encoded representation; ask for the plain bytes
+            'Accept-Encoding': 'identity',
+        }
+        if self.validator:
+            headers['If-Range'] = self.validator
+        return headers
+
+    def fetch(self, session, timeout, progress_update_callback=None):
+        if self.offset and not self.resumable:
+            self.restart()
+        resp = session.get(self.url, stream=True, proxies=session.proxies, timeout=timeout,
+                           headers=self.request_headers)
+        if log.isEnabledFor(DEBUG):
+            log.debug(stringify(resp, content_max_len=256))
+        if resp.status_code == 416 and self.offset:
+            # our partial file no longer describes this resource; start over
+            resp.close()
+            self.restart()
+            return self.fetch(session, timeout, progress_update_callback)
+        resp.raise_for_status()
+
+        match = _CONTENT_RANGE_RE.match(resp.headers.get('Content-Range', ''))
+        if resp.status_code == 206 and match and int(match.group(1)) == self.offset:
+            mode = 'ab'
+            self.resumed = True
+        else:
+            # full body (the server ignored the range, or If-Range told it the file changed)
+            self.restart()
+            mode = 'wb'
+        validator = resp.headers.get('ETag') or resp.headers.get('Last-Modified')
+        # weak entity tags can't be used with If-Range
+        self.validator = None if validator and validator.startswith('W/') else validator
+        self.resumable = resp.headers.get('Content-Encoding', 'identity') == 'identity'
+
+        content_length = int(resp.headers.get('Content-Length', 0))
+        start_offset = self.offset
+        streamed_bytes = 0
+        with open(self.path, mode) as fh:
+            for chunk in resp.iter_content(2 ** 14):
+                # chunk could be the decompressed form of the real data
+                # but we want the exact number of bytes read till now
+                streamed_bytes = resp.raw.tell()
+                try:
+                    fh.write(chunk)
+                except IOError as e:
+                    message = "Failed to write to %(target_path)s\n  errno: %(errno)d"
+                    # TODO: make this CondaIOError
+                    raise CondaError(message, target_path=self.target_full_path,
+                                     errno=e.errno)
+
+                self.checksum_builder and self.checksum_builder.update(chunk)
+                self.offset += len(chunk)
+
+                if content_length and 0 <= streamed_bytes <= content_length:
+                    if progress_update_callback:
+                        progress_update_callback((start_offset + streamed_bytes)
+                                                 / (start_offset + content_length))
+
+        if content_length and streamed_bytes != content_length:
+            # TODO: needs to be a more-specific error type
+            message = dals("""
+            Downloaded bytes did not match Content-Length
+              url: %(url)s
+              target_path: %(target_path)s
+              Content-Length: %(content_length)d
+              downloaded bytes: %(downloaded_bytes)d
+            """)
+            raise _IncompleteDownloadError(message, url=self.url,
+                                           target_path=self.target_full_path,
+                                           content_length=content_length,
+                                           downloaded_bytes=streamed_bytes)
+
+
+def _verify_download(partial, checksum=None, size=None):
+    """Return a ``ChecksumMismatchError`` if ``partial`` doesn't match, otherwise None."""
+    url, target_full_path = partial.url, partial.target_full_path
+    if checksum:
+        checksum_type = partial.checksum_type
+        actual_checksum = partial.checksum_builder.hexdigest()
+        if actual_checksum != checksum:
+            log.debug("%s mismatch for download: %s (%s != %s)",
+                      checksum_type, url, actual_checksum, checksum)
+            return ChecksumMismatchError(
+                url, target_full_path, checksum_type, checksum, actual_checksum
+            )
+    if size is not None:
+        actual_size = partial.offset
+        if actual_size != size:
+            log.debug("size mismatch for download: %s (%s != %s)", url, actual_size, size)
+            return ChecksumMismatchError(url, target_full_path, "size", size, actual_size)
+    return None
+
+
 @time_recorder("download")
 def download(
         url, target_full_path, md5=None, sha256=None, size=None, progress_update_callback=None
@@ -81,81 +223,50 @@ def download(
     if not context.ssl_verify:
         disable_ssl_verify_warning()
 
+    # prefer sha256 over md5 when both are available
+    checksum_type = checksum = None
+    if sha256:
+        checksum_type = "sha256"
+        checksum = sha256
+    elif md5:
+        checksum_type = "md5"
+        checksum = md5
+
     try:
         timeout = context.remote_connect_timeout_secs, context.remote_read_timeout_secs
         session = CondaSession()
-        resp = session.get(url, stream=True, proxies=session.proxies, timeout=timeout)
-        if log.isEnabledFor(DEBUG):
-            log.debug(stringify(resp, content_max_len=256))
-        resp.raise_for_status()
+        partial = _PartialDownload(url, target_full_path, checksum_type)
 
-        content_length = int(resp.headers.get('Content-Length', 0))
+        def fetch():
+            retries_left = context.remote_max_retries
+            while True:
+                try:
+                    partial.fetch(session, timeout, progress_update_callback)
+                    return
+                except (ConnectionError, ChunkedEncodingError, _IncompleteDownloadError) as e:
+                    if retries_left <= 0:
+                        raise
+                    log.debug("%s, resuming download of %s at byte %d", e, url, partial.offset)
+                except (IOError, OSError) as e:
+                    if e.errno != ECONNRESET or retries_left <= 0:
+                        raise
+                    log.debug("%s, resuming download of %s at byte %d", e, url, partial.offset)
+                retries_left -= 1
 
-        # prefer sha256 over md5 when both are available
-        checksum_builder = checksum_type = checksum = None
-        if sha256:
-            checksum_builder = hashlib.new("sha256")
-            checksum_type = "sha256"
-            checksum = sha256
-        elif md5:
-            checksum_builder = hashlib.new("md5") if md5 else None
-            checksum_type = "md5"
-            checksum = md5
-
-        size_builder = 0
-        try:
-            with open(target_full_path, 'wb') as fh:
-                streamed_bytes = 0
-                for chunk in resp.iter_content(2 ** 14):
-                    # chunk could be the decompressed form of the real data
-                    # but we want the exact number of bytes read till now
-                    streamed_bytes = resp.raw.tell()
-                    try:
-                        fh.write(chunk)
-                    except IOError as e:
-                        message = "Failed to write to %(target_path)s\n  errno: %(errno)d"
-                        # TODO: make this CondaIOError
-                        raise CondaError(message, target_path=target_full_path, errno=e.errno)
-
-                    checksum_builder and checksum_builder.update(chunk)
-                    size_builder += len(chunk)
-
-                    if content_length and 0 <= streamed_bytes <= content_length:
-                        if progress_update_callback:
-                            progress_update_callback(streamed_bytes / content_length)
-
-            if content_length and streamed_bytes != content_length:
-                # TODO: needs to be a more-specific error type
-                message = dals("""
-                Downloaded bytes did not match Content-Length
-                  url: %(url)s
-                  target_path: %(target_path)s
-                  Content-Length: %(content_length)d
-                  downloaded bytes: %(downloaded_bytes)d
-                """)
-                raise CondaError(message, url=url, target_path=target_full_path,
-                                 content_length=content_length,
-                                 downloaded_bytes=streamed_bytes)
-
-        except (IOError, OSError) as e:
-            if e.errno == 104:
-                # Connection reset by peer
-                log.debug("%s, trying again" % e)
-            raise
+        fetch()
+        mismatch = _verify_download(partial, checksum, size)
+        if mismatch and partial.resumed:
+            # The kept bytes may belong to an older copy of the file (a .partial left behind
+            # without a validator, say); the only way to know is a download from byte 0.
+            log.debug("%s, downloading %s again from byte 0", mismatch, url)
+            partial.restart()
+            fetch()
+            mismatch = _verify_download(partial, checksum, size)
+        if mismatch:
+            rm_rf(partial.path)
+            raise mismatch
 
-        if checksum:
-            actual_checksum = checksum_builder.hexdigest()
-            if actual_checksum != checksum:
-                log.debug("%s mismatch for download: %s (%s != %s)",
-                          checksum_type, url, actual_checksum, checksum)
-                raise ChecksumMismatchError(
-                    url, target_full_path, checksum_type, checksum, actual_checksum
-                )
-        if size is not None:
-            actual_size = size_builder
-            if actual_size != size:
-                log.debug("size mismatch for download: %s (%s != %s)", url, actual_size, size)
-                raise ChecksumMismatchError(url, target_full_path, "size", size, actual_size)
+        rename(partial.path, target_full_path, force=True)
 
     except RequestsProxyError:
         raise ProxyError()  # see #3962
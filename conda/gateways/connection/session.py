@@ -3,11 +3,13 @@
 # SPDX-License-Identifier: BSD-3-Clause
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import atexit
 from logging import getLogger
-from threading import local
+from threading import Lock, local
 
-from . import (AuthBase, BaseAdapter, HTTPAdapter, Session, _basic_auth_str,
-               extract_cookies_to_jar, get_auth_from_url, get_netrc_auth, Retry)
+from . import (AuthBase, BaseAdapter, DEFAULT_POOLSIZE, HTTPAdapter, HTTPConnectionPool,
+               HTTPSConnectionPool, Session, _basic_auth_str, extract_cookies_to_jar,
+               get_auth_from_url, get_netrc_auth, Retry)
 from .adapters.ftp import FTPAdapter
 from .adapters.localfs import LocalFSAdapter
 from .adapters.s3 import S3Adapter
@@ -34,25 +36,126 @@ class EnforceUnusedAdapter(BaseAdapter):
         raise RuntimeError(message)
 
     def close(self):
-        raise NotImplementedError()
+        pass
+
+
+class _ConnectionCounts(object):
+    """Tally of HTTP(S) connections opened vs. reused from a keep-alive pool."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.created = 0
+        self.reused = 0
+
+    def record(self, reused):
+        with self._lock:
+            if reused:
+                self.reused += 1
+            else:
+                self.created += 1
+
+    def reset(self):
+        with self._lock:
+            self.created = self.reused = 0
+
+    def dump(self):
+        with self._lock:
+            return {'created': self.created, 'reused': self.reused}
+
+
+_connection_counts = _ConnectionCounts()
+
+
+def connection_counts(reset=False):
+    """
+    Return ``{'created': int, 'reused': int}`` for the HTTP(S) connections CondaSession has
+    handed out so far in this process.  With ``reset=True`` the counters start over.
+    """
+    counts = _connection_counts.dump()
+    if reset:
+        _connection_counts.reset()
+    return counts
+
+
+@atexit.register
+def log_connection_counts():
+    counts = connection_counts()
+    if counts['created'] or counts['reused']:
+        log.debug("HTTP(S) connections: %(created)d created, %(reused)d reused from the pool",
+                  counts)
+
+
+class _CountingPoolMixin(object):
+
+    def _get_conn(self, timeout=None):
+        conn = super(_CountingPoolMixin, self)._get_conn(timeout=timeout)
+        # A connection coming back out of the pool still holds its socket; a brand new one
+        # (or one urllib3 found dropped and closed) has to connect, and handshake, again.
+        _connection_counts.record(reused=getattr(conn, 'sock', None) is not None)
+        return conn
+
+
+class _CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class CondaHTTPAdapter(HTTPAdapter):
+    """
+    An HTTPAdapter whose pools count created vs. reused connections, and whose pool size
+    defaults to the number of threads that may talk to one channel host at the same time.
+    """
+    pool_classes_by_scheme = {
+        'http': _CountingHTTPConnectionPool,
+        'https': _CountingHTTPSConnectionPool,
+    }
+
+    def __init__(self, pool_maxsize=None, **kwargs):
+        if pool_maxsize is None:
+            pool_maxsize = max(DEFAULT_POOLSIZE, context.repodata_threads or 0,
+                               context.fetch_threads)
+        super(CondaHTTPAdapter, self).__init__(pool_maxsize=pool_maxsize, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(CondaHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = self.pool_classes_by_scheme
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super(CondaHTTPAdapter, self).proxy_manager_for(proxy, **proxy_kwargs)
+        if not proxy.lower().startswith('socks'):
+            # SOCKS proxy managers bring their own connection pool classes
+            manager.pool_classes_by_scheme = self.pool_classes_by_scheme
+        return manager
 
 
 class CondaSessionType(type):
     """
     Takes advice from https://github.com/requests/requests/issues/1871#issuecomment-33327847
     and creates one Session instance per thread.
+
+    The sessions of all threads share one mounted CondaHTTPAdapter, whose urllib3 pool managers
+    are thread-safe, so repodata and package downloads from different threads reuse the same
+    keep-alive connections instead of each thread opening (and TLS-handshaking) its own.
     """
 
     def __new__(mcs, name, bases, dct):
         dct['_thread_local'] = local()
+        dct['_http_adapter'] = None
+        dct['_generation'] = 0
+        dct['_lock'] = Lock()
         return super(CondaSessionType, mcs).__new__(mcs, name, bases, dct)
 
     def __call__(cls):
-        try:
-            return cls._thread_local.session
-        except AttributeError:
-            session = cls._thread_local.session = super(CondaSessionType, cls).__call__()
-            return session
+        thread_local = cls._thread_local
+        generation = cls._generation
+        if getattr(thread_local, 'generation', None) != generation:
+            # first call in this thread, or the context was reset since the last one
+            thread_local.session = super(CondaSessionType, cls).__call__()
+            thread_local.generation = generation
+        return thread_local.session
 
 
 @with_metaclass(CondaSessionType)
@@ -73,10 +176,7 @@ class CondaSession(Session):
             self.mount("s3://", unused_adapter)
 
         else:
-            # Configure retries
-            retry = Retry(total=context.remote_max_retries,
-                          backoff_factor=context.remote_backoff_factor)
-            http_adapter = HTTPAdapter(max_retries=retry)
+            http_adapter = self._get_http_adapter()
             self.mount("http://", http_adapter)
             self.mount("https://", http_adapter)
             self.mount("ftp://", FTPAdapter())
@@ -93,6 +193,26 @@ class CondaSession(Session):
         elif context.client_ssl_cert:
             self.cert = context.client_ssl_cert
 
+    @classmethod
+    def _get_http_adapter(cls):
+        with cls._lock:
+            if cls._http_adapter is None:
+                # Configure retries
+                retry = Retry(total=context.remote_max_retries,
+                              backoff_factor=context.remote_backoff_factor)
+                cls._http_adapter = CondaHTTPAdapter(max_retries=retry)
+            return cls._http_adapter
+
+    @classmethod
+    def _reset_state(cls):
+        # the next CondaSession() in each thread picks up the new context; release the old
+        #   pooled sockets
+        with cls._lock:
+            http_adapter, cls._http_adapter = cls._http_adapter, None
+            cls._generation += 1
+        if http_adapter is not None:
+            http_adapter.close()
+
 
 class CondaHttpAuth(AuthBase):
     # TODO: make this class thread-safe by adding some of the requests.auth.HTTPDigestAuth() code
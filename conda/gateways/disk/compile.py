@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012 Anaconda, Inc
+# SPDX-License-Identifier: BSD-3-Clause
+"""
+Compile .py files to .pyc files with the python interpreter of the target prefix.
+
+``PycCompilePool`` keeps a few worker processes of the target interpreter running, each
+reading batches of ``(py, pyc)`` path pairs as json lines from its stdin, compiling them with
+``py_compile``, and writing one result per file back to its stdout.  Every reply carries the
+id of its batch, so anything else written to stdout, e.g. by an activation script, is
+skipped.  Batches are handed to whichever worker is free, and the workers are reused by every
+later compile of the same interpreter, until the pool is closed or conda exits.  A worker
+that fails to answer a batch is killed and replaced.
+
+The worker script runs under every python version conda can install, including python 2.7.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import atexit
+from collections import namedtuple
+from itertools import count
+import json
+from logging import getLogger
+import os
+from os.path import abspath
+from subprocess import PIPE, Popen
+import tempfile
+from threading import Lock
+
+from .delete import rm_rf
+from ... import ACTIVE_SUBPROCESSES
+from ..._vendor.auxlib.ish import dals
+from ...base.context import context
+from ...common.compat import ensure_binary, on_win
+from ...common.io import ThreadLimitedThreadPoolExecutor
+from ...utils import wrap_subprocess_call
+
+log = getLogger(__name__)
+
+# files sent to a worker at a time; small enough to keep every worker busy until the end
+BATCH_SIZE = 32
+
+_COMPILE_WORKER = dals("""
+    import json
+    import py_compile
+    import sys
+
+
+    def main():
+        stdin, stdout = sys.stdin, sys.stdout
+        while True:
+            line = stdin.readline()
+            if not line:
+                return
+            request = json.loads(line)
+            results = []
+            for py_path, pyc_path in request["files"]:
+                try:
+                    py_compile.compile(py_path, pyc_path, doraise=True)
+                except Exception as e:
+                    try:
+                        results.append("%s: %s" % (e.__class__.__name__, e))
+                    except Exception:
+                        results.append(repr(e))
+                else:
+                    results.append(None)
+            reply = {"conda_pyc_batch": request["batch"], "errors": results}
+            stdout.write(json.dumps(reply) + "\\n")
+            stdout.flush()
+
+
+    main()
+""")
+
+PycCompileResult = namedtuple('PycCompileResult', ('py_path', 'pyc_path', 'error'))
+
+
+class PycCompileWorkerError(EnvironmentError):
+    """A compile worker exited or stopped answering."""
+
+
+class _PycCompileWorker(object):
+
+    def __init__(self, python_exe_full_path, prefix, worker_script):
+        self._stderr = tempfile.TemporaryFile()
+        self.script_caller, command_args = wrap_subprocess_call(
+            on_win, context.root_prefix, prefix, context.dev, context.verbosity >= 2,
+            [python_exe_full_path, '-Wi', '-u', worker_script])
+        log.trace("starting pyc compile worker %s", command_args)
+        self.process = Popen(command_args, cwd=prefix, stdin=PIPE, stdout=PIPE,
+                             stderr=self._stderr)
+        ACTIVE_SUBPROCESSES.add(self.process)
+        self._batch_ids = count()
+        self.broken = False
+
+    @property
+    def alive(self):
+        return not self.broken and self.process.poll() is None
+
+    def compile(self, batch):
+        try:
+            return self._compile(batch)
+        except PycCompileWorkerError:
+            # the worker may still send a reply to this batch; never hand it another one
+            self.kill()
+            raise
+
+    def _compile(self, batch):
+        batch_id = next(self._batch_ids)
+        try:
+            self.process.stdin.write(ensure_binary(json.dumps({'batch': batch_id,
+                                                               'files': batch}) + "\n"))
+            self.process.stdin.flush()
+            while True:
+                line = self.process.stdout.readline()
+                if not line:
+                    raise PycCompileWorkerError("pyc compile worker exited\n%s"
+                                                % self.stderr())
+                reply = self._parse_reply(line)
+                if reply is not None and reply.get('conda_pyc_batch') == batch_id:
+                    break
+                log.trace("ignoring pyc compile worker output %r", line)
+        except (IOError, OSError) as e:
+            raise PycCompileWorkerError("pyc compile worker failed: %r\n%s"
+                                        % (e, self.stderr()))
+        errors = reply.get('errors')
+        if not isinstance(errors, list) or len(errors) != len(batch):
+            raise PycCompileWorkerError("pyc compile worker failed: %r\n%s"
+                                        % (line, self.stderr()))
+        return errors
+
+    @staticmethod
+    def _parse_reply(line):
+        try:
+            reply = json.loads(line.decode('utf-8'))
+        except ValueError:
+            return None
+        return reply if isinstance(reply, dict) else None
+
+    def kill(self):
+        self.broken = True
+        if self.process.poll() is None:
+            try:
+                self.process.kill()
+            except (IOError, OSError) as e:
+                log.debug("error killing pyc compile worker\n  %r", e)
+
+    def stderr(self):
+        try:
+            self._stderr.seek(0)
+            return self._stderr.read().decode('utf-8', errors='replace')
+        except (IOError, OSError):
+            return ''
+
+    def close(self):
+        process = self.process
+        try:
+            process.stdin.close()
+            process.wait()
+        except (IOError, OSError) as e:
+            log.debug("error stopping pyc compile worker\n  %r", e)
+            if process.poll() is None:
+                process.kill()
+        ACTIVE_SUBPROCESSES.discard(process)
+        process.stdout.close()
+        self._stderr.close()
+        if self.script_caller is not None:
+            if 'CONDA_TEST_SAVE_TEMPS' not in os.environ:
+                rm_rf(self.script_caller)
+            else:
+                log.warning('CONDA_TEST_SAVE_TEMPS :: retaining pyc compile worker script %s',
+                            self.script_caller)
+
+
+class PycCompilePool(object):
+    """
+    Worker processes of the interpreter ``python_exe_full_path``, activated in ``prefix``.
+    Workers are started on first use, at most ``max_workers`` of them.
+    """
+
+    def __init__(self, python_exe_full_path, prefix, max_workers=None):
+        self.python_exe_full_path = python_exe_full_path
+        self.prefix = prefix
+        self.max_workers = max_workers or context.compile_processes
+        self._workers = []
+        self._worker_script = None
+        self._lock = Lock()
+
+    def _get_workers(self, n_workers):
+        with self._lock:
+            workers = [w for w in self._workers if w.alive]
+            for worker in self._workers:
+                if not worker.alive:
+                    worker.close()
+            self._workers = workers
+            if self._worker_script is None:
+                fd, self._worker_script = tempfile.mkstemp(suffix='.py')
+                with os.fdopen(fd, 'wb') as fh:
+                    fh.write(ensure_binary(_COMPILE_WORKER))
+            while len(workers) < n_workers:
+                try:
+                    workers.append(_PycCompileWorker(self.python_exe_full_path, self.prefix,
+                                                     self._worker_script))
+                except (IOError, OSError) as e:
+                    log.info("unable to start pyc compile worker for %s\n  %r",
+                             self.python_exe_full_path, e)
+                    break
+            return workers[:n_workers]
+
+    def compile(self, py_full_paths, pyc_full_paths):
+        """
+        Compile each of ``py_full_paths`` to the matching path in ``pyc_full_paths``.
+
+        Returns a ``PycCompileResult`` for every file, in order; ``error`` is None for the
+        files that compiled.
+        """
+        pairs = list(zip(py_full_paths, pyc_full_paths))
+        if not pairs:
+            return []
+        batches = [pairs[i:i + BATCH_SIZE] for i in range(0, len(pairs), BATCH_SIZE)]
+        workers = self._get_workers(min(self.max_workers, len(batches)))
+        errors = {}
+        pending = iter(batches)
+        pending_lock = Lock()
+
+        def run(worker):
+            while True:
+                with pending_lock:
+                    batch = next(pending, None)
+                if batch is None:
+                    return
+                try:
+                    batch_errors = worker.compile(batch)
+                except PycCompileWorkerError as e:
+                    # the worker is gone; the other workers take over the remaining batches
+                    log.info("%s", e)
+                    errors.update((pyc, "%s: %s" % (e.__class__.__name__, e))
+                                  for _, pyc in batch)
+                    return
+                errors.update((pyc, error) for (_, pyc), error in zip(batch, batch_errors))
+
+        if len(workers) == 1:
+            run(workers[0])
+        elif workers:
+            with ThreadLimitedThreadPoolExecutor(len(workers)) as executor:
+                tuple(executor.map(run, workers))
+
+        no_worker_error = "no pyc compile worker available for %s" % self.python_exe_full_path
+        return [PycCompileResult(py, pyc, errors.get(pyc, no_worker_error))
+                for py, pyc in pairs]
+
+    def close(self):
+        with self._lock:
+            workers, self._workers = self._workers, []
+            for worker in workers:
+                worker.close()
+            if self._worker_script is not None:
+                rm_rf(self._worker_script)
+                self._worker_script = None
+
+
+_pools = {}
+_pools_lock = Lock()
+
+
+def get_pyc_compile_pool(python_exe_full_path, prefix):
+    """
+    Return the shared ``PycCompilePool`` for ``python_exe_full_path`` in ``prefix``.
+
+    A new pool is made if the interpreter was replaced since the pool was created, e.g. by a
+    transaction that updated python, so .pyc files always match the installed interpreter.
+    """
+    try:
+        st = os.stat(python_exe_full_path)
+        interpreter_id = (st.st_ino, st.st_mtime, st.st_size)
+    except (IOError, OSError):
+        interpreter_id = None
+    key = (abspath(python_exe_full_path), abspath(prefix))
+    with _pools_lock:
+        pool, pool_interpreter_id = _pools.get(key, (None, None))
+        if pool is not None and pool_interpreter_id != interpreter_id:
+            pool.close()
+            pool = None
+        if pool is None:
+            pool = PycCompilePool(python_exe_full_path, prefix)
+            _pools[key] = pool, interpreter_id
+        return pool
+
+
+@atexit.register
+def close_pyc_compile_pools():
+    with _pools_lock:
+        pools = [pool for pool, _ in _pools.values()]
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -15,8 +15,9 @@ import tempfile
 import warnings as _warnings
 
 from . import mkdir_p
+from .compile import get_pyc_compile_pool
 from .delete import path_is_clean, rm_rf
-from .link import islink, lexists, link, readlink, symlink
+from .link import islink, lexists, link, readlink, reflink, symlink
 from .permissions import make_executable
 from .update import touch
 from ... import CondaError
@@ -331,6 +332,28 @@ def _do_copy(src, dst):
         log.debug('%r', e)
 
 
+def reflink_or_copy(src, dst):
+    # on unix, make sure relative symlinks stay symlinks
+    if islink(src):
+        copy(src, dst)
+        return
+    try:
+        log.trace("reflinking %s => %s", src, dst)
+        reflink(src, dst)
+    except (IOError, OSError) as e:
+        log.debug("reflink failed. falling back to copy\n"
+                  "  error: %r\n"
+                  "  src: %s\n"
+                  "  dst: %s", e, src, dst)
+        _do_copy(src, dst)
+        return
+
+    try:
+        copystat(src, dst)
+    except (IOError, OSError) as e:  # pragma: no cover
+        log.debug('%r', e)
+
+
 def create_link(src, dst, link_type=LinkType.hardlink, force=False):
     if link_type == LinkType.directory:
         # A directory is technically not a link.  So link_type is a misnomer.
@@ -371,58 +394,36 @@ def create_link(src, dst, link_type=LinkType.hardlink, force=False):
         _do_softlink(src, dst)
     elif link_type == LinkType.copy:
         copy(src, dst)
+    elif link_type == LinkType.reflink:
+        reflink_or_copy(src, dst)
     else:
         raise CondaError("Did not expect linktype=%r" % link_type)
 
 
 def compile_multiple_pyc(python_exe_full_path, py_full_paths, pyc_full_paths, prefix, py_ver):
+    # py_ver is unused; the workers compile with whatever python_exe_full_path is
     py_full_paths = tuple(py_full_paths)
     pyc_full_paths = tuple(pyc_full_paths)
     if len(py_full_paths) == 0:
         return []
 
-    fd, filename = tempfile.mkstemp()
-    try:
-        for f in py_full_paths:
-            f = os.path.relpath(f, prefix)
-            if hasattr(f, 'encode'):
-                f = f.encode(sys.getfilesystemencoding(), errors='replace')
-            os.write(fd, f + b"\n")
-        os.close(fd)
-        command = ["-Wi", "-m", "compileall", "-q", "-l", "-i", filename]
-        # if the python version in the prefix is 3.5+, we have some extra args.
-        #    -j 0 will do the compilation in parallel, with os.cpu_count() cores
-        if int(py_ver[0]) >= 3 and int(py_ver.split('.')[1]) > 5:
-            command.extend(["-j", "0"])
-        command[0:0] = [python_exe_full_path]
-        # command[0:0] = ['--cwd', prefix, '--dev', '-p', prefix, python_exe_full_path]
-        log.trace(command)
-        from conda.gateways.subprocess import any_subprocess
-        # from conda.common.io import env_vars
-        # This stack does not maintain its _argparse_args correctly?
-        # from conda.base.context import stack_context_default
-        # with env_vars({}, stack_context_default):
-        #     stdout, stderr, rc = run_command(Commands.RUN, *command)
-        stdout, stderr, rc = any_subprocess(command, prefix)
-    finally:
-        os.remove(filename)
+    pool = get_pyc_compile_pool(python_exe_full_path, prefix)
+    results = pool.compile(py_full_paths, pyc_full_paths)
 
     created_pyc_paths = []
-    for py_full_path, pyc_full_path in zip(py_full_paths, pyc_full_paths):
-        if not isfile(pyc_full_path):
+    for result in results:
+        if result.error is not None:
             message = dals("""
-            pyc file failed to compile successfully (run_command failed)
+            pyc file failed to compile successfully
             python_exe_full_path: %s
             py_full_path: %s
             pyc_full_path: %s
-            compile rc: %s
-            compile stdout: %s
-            compile stderr: %s
+            error: %s
             """)
-            log.info(message, python_exe_full_path, py_full_path, pyc_full_path,
-                     rc, stdout, stderr)
+            log.info(message, python_exe_full_path, result.py_path, result.pyc_path,
+                     result.error)
         else:
-            created_pyc_paths.append(pyc_full_path)
+            created_pyc_paths.append(result.pyc_path)
 
     return created_pyc_paths
 
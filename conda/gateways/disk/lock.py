@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012 Anaconda, Inc
+# SPDX-License-Identifier: BSD-3-Clause
+"""
+Advisory, cross-process file locks.
+
+Unlike the lock directories in ``conda.lock``, these are taken with ``fcntl.flock`` (or
+``msvcrt.locking`` on Windows), so acquiring one is atomic, and the operating system releases
+it if the process holding it dies.  Lock files are left in place after release;
+removing them would let a waiting process lock a file that has already been replaced.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from contextlib import contextmanager
+from errno import EACCES, EAGAIN, EDEADLK
+from logging import getLogger
+import os
+from os.path import dirname, isdir
+from time import sleep
+
+from .create import mkdir_p
+
+try:
+    import fcntl
+except ImportError:  # pragma: unix no cover
+    fcntl = None
+    import msvcrt
+
+log = getLogger(__name__)
+
+_LOCK_BUSY_ERRNOS = (EACCES, EAGAIN, EDEADLK)
+
+
+def _try_lock(fd):
+    try:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:  # pragma: unix no cover
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except (IOError, OSError) as e:
+        if e.errno in _LOCK_BUSY_ERRNOS:
+            return False
+        raise
+    return True
+
+
+def _unlock(fd):
+    if fcntl:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:  # pragma: unix no cover
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def advisory_lock(lock_file_path, poll_interval=0.1, blocking=True):
+    """
+    Hold an exclusive lock on ``lock_file_path`` for the duration of the context, waiting for
+    any other holder to release it first.  With ``blocking=False`` there is no wait; the
+    context yields False if another holder has the lock, and True otherwise.
+
+    Locking is best effort.  If the lock file can't be created or the filesystem doesn't
+    support locking, the context still runs (and yields True), just without the lock.
+    """
+    try:
+        if not isdir(dirname(lock_file_path)):
+            mkdir_p(dirname(lock_file_path))
+        fd = os.open(lock_file_path, os.O_RDWR | os.O_CREAT, 0o666)
+    except (IOError, OSError) as e:
+        log.debug("unable to create lock file %s; continuing without a lock\n  %r",
+                  lock_file_path, e)
+        yield True
+        return
+
+    locked = False
+    busy = False
+    try:
+        try:
+            locked = _try_lock(fd)
+            if not locked and not blocking:
+                busy = True
+            elif not locked:
+                log.info("waiting for another conda process to release %s", lock_file_path)
+                while not locked:
+                    sleep(poll_interval)
+                    locked = _try_lock(fd)
+        except (IOError, OSError) as e:
+            # e.g. ENOLCK on a network filesystem without lock support
+            log.debug("unable to lock %s; continuing without a lock\n  %r", lock_file_path, e)
+        yield not busy
+    finally:
+        try:
+            if locked:
+                _unlock(fd)
+        finally:
+            os.close(fd)
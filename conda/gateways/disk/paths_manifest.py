@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012 Anaconda, Inc
+# SPDX-License-Identifier: BSD-3-Clause
+"""
+Pre-parsed, binary copy of an extracted package's ``info/paths.json``.
+
+Parsing ``paths.json`` is cheap; validating every entry through ``PathDataV1(**entry)`` is not,
+and packages like qt or boost list tens of thousands of paths.  The manifest stores each entry
+as one fixed-width row, so reading it back is a single read plus one ``struct`` unpack per
+path, and the ``PathDataV1`` objects are rebuilt from values that were validated when the
+manifest was written.
+
+The file layout is::
+
+    magic | format version | row count | header length | header | rows | string offsets | strings
+
+All integers are little-endian.  The header is a utf-8 json object holding the size and mtime
+of the ``paths.json`` the manifest was built from, the number of strings in the string table,
+and the rarely used ``inode_paths`` lists by row.  Path and prefix placeholder strings are
+stored in the string table; sha256 values are stored as raw digests.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from binascii import hexlify, unhexlify
+import json
+from logging import getLogger
+from os import stat
+from os.path import join
+import re
+import struct
+from uuid import uuid4
+
+from .update import backoff_rename
+from ...common.compat import ensure_binary, integer_types, iteritems, string_types, text_type
+from ...models.enums import FileMode, PathType
+from ...models.records import PathDataV1, PathsData
+
+log = getLogger(__name__)
+
+PATHS_MANIFEST_FN = 'paths_manifest.bin'
+MANIFEST_MAGIC = b'CONDAPM\x00'
+MANIFEST_FORMAT_VERSION = 1
+
+_PREFIX = struct.Struct('<8sIII')
+# path, prefix_placeholder, flags, path_type, file_mode, size_in_bytes, sha256, sha256_in_prefix
+_ROW = struct.Struct('<IIBBBxQ32s32s')
+
+_HAS_PREFIX_PLACEHOLDER = 0x01
+_HAS_FILE_MODE = 0x02
+_HAS_NO_LINK = 0x04
+_NO_LINK = 0x08
+_HAS_SHA256 = 0x10
+_HAS_SIZE_IN_BYTES = 0x20
+_HAS_SHA256_IN_PREFIX = 0x40
+_HAS_INODE_PATHS = 0x80
+
+_PATH_TYPES = tuple(PathType)
+_FILE_MODES = tuple(FileMode)
+_SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+_INITD_KEY = '_%s__initd' % PathDataV1.__name__
+
+
+class _UnrepresentableEntry(ValueError):
+    """A paths.json entry holds a value the manifest can't round-trip exactly."""
+
+
+def _paths_json_stat(extracted_package_directory):
+    st = stat(join(extracted_package_directory, 'info', 'paths.json'))
+    return [st.st_size, st.st_mtime]
+
+
+def _sha256_digest(value):
+    if not isinstance(value, string_types) or not _SHA256_RE.match(value):
+        raise _UnrepresentableEntry(value)
+    return unhexlify(value)
+
+
+def _encode_rows(paths, intern):
+    rows = []
+    inode_paths = {}
+    for position, entry in enumerate(paths):
+        flags = 0
+        path = entry.get('_path')
+        if not isinstance(path, string_types):
+            raise _UnrepresentableEntry(path)
+        path_type_ix = _PATH_TYPES.index(PathType(entry['path_type']))
+        placeholder_ix = file_mode_ix = size_in_bytes = 0
+        sha256 = sha256_in_prefix = b''
+
+        for key, value in iteritems(entry):
+            if key == 'prefix_placeholder':
+                if not isinstance(value, string_types):
+                    raise _UnrepresentableEntry(value)
+                flags |= _HAS_PREFIX_PLACEHOLDER
+                placeholder_ix = intern(value)
+            elif key == 'file_mode':
+                flags |= _HAS_FILE_MODE
+                file_mode_ix = _FILE_MODES.index(FileMode(value))
+            elif key == 'no_link':
+                if not isinstance(value, bool):
+                    raise _UnrepresentableEntry(value)
+                flags |= _HAS_NO_LINK | (_NO_LINK if value else 0)
+            elif key == 'sha256':
+                flags |= _HAS_SHA256
+                sha256 = _sha256_digest(value)
+            elif key == 'sha256_in_prefix':
+                flags |= _HAS_SHA256_IN_PREFIX
+                sha256_in_prefix = _sha256_digest(value)
+            elif key == 'size_in_bytes':
+                if (not isinstance(value, integer_types) or isinstance(value, bool)
+                        or not 0 <= value < 2 ** 64):
+                    raise _UnrepresentableEntry(value)
+                flags |= _HAS_SIZE_IN_BYTES
+                size_in_bytes = value
+            elif key == 'inode_paths':
+                if (not isinstance(value, (list, tuple))
+                        or not all(isinstance(p, string_types) for p in value)):
+                    raise _UnrepresentableEntry(value)
+                flags |= _HAS_INODE_PATHS
+                inode_paths[text_type(position)] = list(value)
+
+        rows.append(_ROW.pack(intern(path), placeholder_ix, flags, path_type_ix, file_mode_ix,
+                              size_in_bytes, sha256, sha256_in_prefix))
+    return rows, inode_paths
+
+
+def write_paths_manifest(extracted_package_directory, paths_json_data=None):
+    """
+    Write the manifest for ``paths_json_data``, the parsed ``info/paths.json`` of
+    ``extracted_package_directory``.  The file is read when ``paths_json_data`` isn't given.
+
+    Returns True if the manifest was written.  Entries that can't be stored exactly, and errors
+    writing the file, leave the package without a manifest; ``read_paths_json`` then keeps
+    reading ``paths.json`` directly.
+    """
+    strings = {}
+
+    def intern(value):
+        ix = strings.get(value)
+        if ix is None:
+            ix = strings[value] = len(strings)
+        return ix
+
+    manifest_path = join(extracted_package_directory, 'info', PATHS_MANIFEST_FN)
+    try:
+        if paths_json_data is None:
+            with open(join(extracted_package_directory, 'info', 'paths.json')) as fh:
+                paths_json_data = json.load(fh)
+        if paths_json_data.get('paths_version') != 1:
+            return False
+        rows, inode_paths = _encode_rows(paths_json_data['paths'], intern)
+
+        encoded_strings = [ensure_binary(s)
+                           for s, _ in sorted(iteritems(strings), key=lambda x: x[1])]
+        string_offsets = [0]
+        for s in encoded_strings:
+            string_offsets.append(string_offsets[-1] + len(s))
+
+        header = ensure_binary(json.dumps({
+            'paths_json': _paths_json_stat(extracted_package_directory),
+            'string_count': len(encoded_strings),
+            'inode_paths': inode_paths,
+        }, separators=(',', ':')))
+
+        tmp_path = '%s.%s.tmp' % (manifest_path, uuid4().hex[:8])
+        with open(tmp_path, 'wb') as fh:
+            fh.write(_PREFIX.pack(MANIFEST_MAGIC, MANIFEST_FORMAT_VERSION, len(rows),
+                                  len(header)))
+            fh.write(header)
+            fh.write(b''.join(rows))
+            fh.write(struct.pack('<%dI' % len(string_offsets), *string_offsets))
+            fh.write(b''.join(encoded_strings))
+        backoff_rename(tmp_path, manifest_path, force=True)
+    except (KeyError, ValueError, struct.error) as e:
+        log.debug("not writing paths manifest for %s\n  %r", extracted_package_directory, e)
+        return False
+    except (IOError, OSError) as e:
+        log.debug("unable to write paths manifest %s\n  %r", manifest_path, e)
+        return False
+    return True
+
+
+def _iter_rows(data, offset, count):
+    if hasattr(_ROW, 'iter_unpack'):
+        return _ROW.iter_unpack(memoryview(data)[offset:offset + count * _ROW.size])
+    else:  # pragma: py3 no cover
+        return (_ROW.unpack_from(data, offset + i * _ROW.size) for i in range(count))
+
+
+def read_paths_manifest(extracted_package_directory):
+    """
+    Return the ``PathsData`` stored in the manifest of ``extracted_package_directory``, or None
+    if there is no manifest or it doesn't match the current ``info/paths.json``.
+    """
+    manifest_path = join(extracted_package_directory, 'info', PATHS_MANIFEST_FN)
+    try:
+        with open(manifest_path, 'rb') as fh:
+            data = fh.read()
+        magic, version, count, header_len = _PREFIX.unpack_from(data, 0)
+        if magic != MANIFEST_MAGIC or version != MANIFEST_FORMAT_VERSION:
+            log.debug("ignoring paths manifest with unknown format: %s", manifest_path)
+            return None
+        header_end = _PREFIX.size + header_len
+        header = json.loads(data[_PREFIX.size:header_end].decode('utf-8'))
+        if header['paths_json'] != _paths_json_stat(extracted_package_directory):
+            log.debug("ignoring stale paths manifest: %s", manifest_path)
+            return None
+
+        rows_end = header_end + count * _ROW.size
+        string_count = header['string_count']
+        strings_start = rows_end + 4 * (string_count + 1)
+        string_offsets = struct.unpack_from('<%dI' % (string_count + 1), data, rows_end)
+        strings = [data[strings_start + string_offsets[i]:
+                        strings_start + string_offsets[i + 1]].decode('utf-8')
+                   for i in range(string_count)]
+        inode_paths = header['inode_paths']
+
+        # Every value was validated when the manifest was written, so skip Entity.__init__ and
+        #   fill in each instance the way PathDataV1(**entry) would have.
+        new_path_data = PathDataV1.__new__
+        path_types, file_modes = _PATH_TYPES, _FILE_MODES
+        paths = []
+        for position, (path_ix, placeholder_ix, flags, path_type_ix, file_mode_ix,
+                       size_in_bytes, sha256, sha256_in_prefix) in enumerate(
+                _iter_rows(data, header_end, count)):
+            values = {'_path': strings[path_ix], 'path_type': path_types[path_type_ix],
+                      _INITD_KEY: True}
+            if flags:
+                if flags & _HAS_PREFIX_PLACEHOLDER:
+                    values['prefix_placeholder'] = strings[placeholder_ix]
+                if flags & _HAS_FILE_MODE:
+                    values['file_mode'] = file_modes[file_mode_ix]
+                if flags & _HAS_NO_LINK:
+                    values['no_link'] = bool(flags & _NO_LINK)
+                if flags & _HAS_SHA256:
+                    values['sha256'] = hexlify(sha256).decode('ascii')
+                if flags & _HAS_SIZE_IN_BYTES:
+                    values['size_in_bytes'] = size_in_bytes
+                if flags & _HAS_SHA256_IN_PREFIX:
+                    values['sha256_in_prefix'] = hexlify(sha256_in_prefix).decode('ascii')
+                if flags & _HAS_INODE_PATHS:
+                    values['inode_paths'] = tuple(inode_paths[text_type(position)])
+            path_data = new_path_data(PathDataV1)
+            path_data.__dict__ = values
+            paths.append(path_data)
+    except (IOError, OSError):
+        return None
+    except (KeyError, IndexError, ValueError, struct.error) as e:
+        log.debug("ignoring unreadable paths manifest %s\n  %r", manifest_path, e)
+        return None
+    return PathsData(paths_version=1, paths=paths)
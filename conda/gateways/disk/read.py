@@ -17,6 +17,7 @@ from os.path import isdir, isfile, join
 
 from .link import islink, lexists
 from .create import TemporaryDirectory
+from .paths_manifest import read_paths_manifest, write_paths_manifest
 from ..._vendor.auxlib.collection import first
 from ..._vendor.auxlib.compat import shlex_split_unicode
 from ..._vendor.auxlib.ish import dals
@@ -166,6 +167,9 @@ def read_paths_json(extracted_package_directory):
     info_dir = join(extracted_package_directory, 'info')
     paths_json_path = join(info_dir, 'paths.json')
     if isfile(paths_json_path):
+        paths_data = read_paths_manifest(extracted_package_directory)
+        if paths_data is not None:
+            return paths_data
         with open(paths_json_path) as paths_json:
             data = json.load(paths_json)
         if data.get('paths_version') != 1:
@@ -177,6 +181,8 @@ def read_paths_json(extracted_package_directory):
             paths_version=1,
             paths=(PathDataV1(**f) for f in data['paths']),
         )
+        # packages extracted by older versions of conda don't have a manifest yet
+        write_paths_manifest(extracted_package_directory, data)
     else:
         has_prefix_files = read_has_prefix(join(info_dir, 'has_prefix'))
         no_link = read_no_link(info_dir)
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012 Anaconda, Inc
+# SPDX-License-Identifier: BSD-3-Clause
+"""
+Directory scanning built on ``os.scandir``.
+
+``os.walk`` followed by a ``getsize`` or ``lstat`` per file costs one extra stat call for every
+entry, which adds up quickly on network filesystems.  ``scandir`` returns the file type with
+the directory listing, and each entry caches its own stat result, so a single ``lstat`` per file
+is enough to get both the size and the hard link count.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from collections import namedtuple
+from logging import getLogger
+from os import listdir, lstat, stat
+from os.path import join
+from stat import S_ISDIR
+
+from ...common.compat import on_win
+
+try:
+    from os import scandir
+except ImportError:  # pragma: py3 no cover
+    scandir = None
+
+log = getLogger(__name__)
+
+
+class _ListdirEntry(object):
+    # stands in for os.DirEntry where os.scandir is not available
+
+    def __init__(self, parent, name):
+        self.name = name
+        self.path = join(parent, name)
+        self._lstat = None
+
+    def stat(self, follow_symlinks=True):
+        if follow_symlinks:
+            return stat(self.path)
+        if self._lstat is None:
+            self._lstat = lstat(self.path)
+        return self._lstat
+
+    def is_dir(self, follow_symlinks=True):
+        try:
+            return S_ISDIR(self.stat(follow_symlinks).st_mode)
+        except OSError:
+            return False
+
+
+def iter_entries(path):
+    """Yield an ``os.DirEntry``-like object for each entry of ``path``."""
+    if scandir is not None:
+        it = scandir(path)
+        try:
+            for entry in it:
+                yield entry
+        finally:
+            # scandir iterators only grew a close() method in python 3.6
+            getattr(it, 'close', lambda: None)()
+    else:  # pragma: py3 no cover
+        for name in listdir(path):
+            yield _ListdirEntry(path, name)
+
+
+def entry_st_nlink(entry):
+    st_nlink = entry.stat(follow_symlinks=False).st_nlink
+    if on_win and st_nlink == 0:  # pragma: unix no cover
+        # stat results cached by scandir on Windows always report 0 links
+        from .link import CrossPlatformStLink
+        st_nlink = CrossPlatformStLink.st_nlink(entry.path)
+    return st_nlink
+
+
+DirectoryUsage = namedtuple('DirectoryUsage', ('path', 'size', 'hard_linked', 'errors'))
+
+
+def directory_usage(path, stop_at_hard_link=False):
+    """
+    Total the sizes of all files below ``path`` and note whether any of them has more than one
+    hard link.
+
+    With ``stop_at_hard_link``, the walk ends at the first hard-linked file.  ``size`` is then
+    only a partial total, which is fine for callers that are going to skip such a directory
+    anyway.  Files that can't be stat'ed are collected as ``(name, exception)`` pairs in
+    ``errors``, and directories that can't be listed as ``(path, exception)`` pairs.
+    """
+    size = 0
+    hard_linked = False
+    errors = []
+    stack = [path]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = tuple(iter_entries(current))
+        except (IOError, OSError) as e:
+            errors.append((current, e))
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                size += entry.stat(follow_symlinks=False).st_size
+                if not hard_linked and entry_st_nlink(entry) > 1:
+                    hard_linked = True
+                    if stop_at_hard_link:
+                        return DirectoryUsage(path, size, hard_linked, errors)
+            except (IOError, OSError) as e:
+                errors.append((entry.name, e))
+    return DirectoryUsage(path, size, hard_linked, errors)
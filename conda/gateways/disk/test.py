@@ -10,7 +10,7 @@ from uuid import uuid4
 
 from .create import create_link
 from .delete import rm_rf
-from .link import islink, lexists
+from .link import islink, lexists, reflink
 from ..._vendor.auxlib.decorators import memoize
 from ...base.constants import PREFIX_MAGIC_FILE
 from ...common.compat import text_type
@@ -83,5 +83,23 @@ def softlink_supported(source_file, dest_dir):
         rm_rf(test_path)
 
 
+@memoize
+def reflink_supported(source_file, dest_dir):
+    # copy-on-write clones need a filesystem that supports them (e.g. btrfs or XFS), holding
+    #   both the source and the destination
+    test_file = join(dest_dir, '.tmp.%s.%s' % (basename(source_file), text_type(uuid4())[:8]))
+    assert isfile(source_file), source_file
+    assert isdir(dest_dir), dest_dir
+    try:
+        reflink(source_file, test_file)
+        log.trace("reflink supported for %s => %s", source_file, dest_dir)
+        return True
+    except (IOError, OSError) as e:
+        log.trace("reflink IS NOT supported for %s => %s\n  %r", source_file, dest_dir, e)
+        return False
+    finally:
+        rm_rf(test_file)
+
+
 def is_conda_environment(prefix):
     return isfile(join(prefix, PREFIX_MAGIC_FILE))
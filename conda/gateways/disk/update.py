@@ -5,6 +5,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 from errno import EINVAL, EXDEV, EPERM
 from logging import getLogger
+import mmap
 import os
 from os.path import dirname, isdir, split, basename, join, exists
 import re
@@ -48,6 +49,24 @@ def update_file_in_place_as_binary(file_full_path, callback):
             fh.close()
 
 
+def update_file_in_place_as_mmap(file_full_path, callback):
+    # callback should be a callable that takes one positional argument, a writable memory map
+    #   of the file, and changes it in place; the length of the file can't change
+    # only the pages the callback reads or writes are loaded, and only the ones it writes to
+    #   are written back to disk
+    with exp_backoff_fn(open, file_full_path, 'rb+') as fh:
+        log.trace("in-place update path locked for %s", file_full_path)
+        if not os.fstat(fh.fileno()).st_size:
+            # empty files can't be mapped
+            callback(bytearray())
+            return
+        mm = mmap.mmap(fh.fileno(), 0)
+        try:
+            callback(mm)
+        finally:
+            mm.close()
+
+
 def rename(source_path, destination_path, force=False):
     if lexists(destination_path) and force:
         rm_rf(destination_path)
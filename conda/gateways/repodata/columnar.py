@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012 Anaconda, Inc
+# SPDX-License-Identifier: BSD-3-Clause
+"""
+Columnar, memory-mapped on-disk format for parsed repodata.
+
+The file layout is::
+
+    magic | format version | header length | header | sections
+
+All integers are little-endian uint32.  The header is a utf-8 json object holding the caller's
+metadata, the offset and length of each section, a package name -> (start, count) index into
+the ``name_order`` column, and a track_feature -> record positions index.
+
+The fn, name, version, build and depends fields of every record are stored as columns of
+indices into a shared string table, so they can be read without decoding anything else.  All
+remaining fields are stored as one compact json blob per record, decoded only when that record
+is asked for.  A record's blob can be copied from one cache file to the next as it is.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from collections import defaultdict
+from itertools import chain, repeat
+import json
+from logging import getLogger
+from mmap import ACCESS_READ, mmap
+import struct
+from uuid import uuid4
+
+from ..disk.update import backoff_rename
+from ...common.compat import ensure_binary, iteritems, string_types, text_type
+
+log = getLogger(__name__)
+
+CACHE_MAGIC = b'CONDARC\x00'
+CACHE_FORMAT_VERSION = 2
+
+COLUMN_KEYS = ('fn', 'name', 'version', 'build', 'depends')
+SECTIONS = ('name_order', 'fn', 'name', 'version', 'build', 'depends_offsets', 'depends',
+            'blob_offsets', 'string_offsets', 'strings', 'blobs')
+
+_PREFIX = struct.Struct('<8sII')
+_UINT32 = struct.Struct('<I')
+_UINT32_PAIR = struct.Struct('<II')
+
+
+def _pack_uint32(values):
+    return struct.pack('<%dI' % len(values), *values)
+
+
+def split_track_features(value):
+    if isinstance(value, string_types):
+        value = value.replace(' ', ',').split(',')
+    return tuple(f for f in (ff.strip() for ff in value) if f)
+
+
+def write_columnar_cache(path, meta, record_infos, exclude_keys=(), source=None,
+                         source_positions=None):
+    """Write ``record_infos``, an iterable of repodata record dicts, to ``path``.
+
+    ``meta`` must be json-serializable; it is handed back unchanged by ``ColumnarCache.meta``.
+    Keys in ``exclude_keys`` are left out of the stored records.  Where ``source_positions``,
+    a sequence running alongside ``record_infos``, gives a position rather than None, the same
+    record is stored at that position of the ColumnarCache ``source``.  It is copied from there
+    as it is, string table indices included, since the string table of ``source`` is carried
+    over to the new file.  The file is written to a temporary path and renamed into place, so
+    readers never observe a partial cache.
+    """
+    if source is None:
+        source_positions = repeat(None)
+        string_offsets, source_strings = [0], b''
+    else:
+        string_offsets = list(source._section_uint32('string_offsets'))
+        source_strings = source._section('strings')
+        source_fns, source_names, source_versions, source_builds = (
+            source._section_uint32(section) for section in ('fn', 'name', 'version', 'build')
+        )
+        source_depends_offsets = source._section_uint32('depends_offsets')
+        source_depends = source._section_uint32('depends')
+        source_blob_offsets = source._section_uint32('blob_offsets')
+        source_blobs = source._section('blobs')
+    strings = {}
+    string_base = len(string_offsets) - 1
+
+    def intern(value):
+        ix = strings.get(value)
+        if ix is None:
+            ix = strings[value] = string_base + len(strings)
+        return ix
+
+    skip_keys = frozenset(chain(COLUMN_KEYS, exclude_keys))
+    encoder = json.JSONEncoder(separators=(',', ':'))
+    fns, names, versions, builds = [], [], [], []
+    depends_offsets, depends = [0], []
+    blob_offsets, blobs = [0], []
+    positions_by_name = defaultdict(list)
+    track_features = defaultdict(list)
+    blob_end = 0
+
+    for position, (info, source_position) in enumerate(zip(record_infos, source_positions)):
+        if source_position is None:
+            fns.append(intern(info['fn']))
+            names.append(intern(info['name']))
+            versions.append(intern(info['version']))
+            builds.append(intern(info['build']))
+            depends.extend(intern(dep) for dep in info.get('depends') or ())
+            blob = ensure_binary(encoder.encode(
+                {k: v for k, v in iteritems(info) if k not in skip_keys}
+            ))
+        else:
+            fns.append(source_fns[source_position])
+            names.append(source_names[source_position])
+            versions.append(source_versions[source_position])
+            builds.append(source_builds[source_position])
+            depends.extend(source_depends[source_depends_offsets[source_position]:
+                                          source_depends_offsets[source_position + 1]])
+            blob = source_blobs[source_blob_offsets[source_position]:
+                                source_blob_offsets[source_position + 1]]
+        depends_offsets.append(len(depends))
+        blobs.append(blob)
+        blob_end += len(blob)
+        blob_offsets.append(blob_end)
+        positions_by_name[info['name']].append(position)
+        if info.get('track_features'):
+            for feature_name in split_track_features(info['track_features']):
+                track_features[feature_name].append(position)
+
+    name_order = []
+    name_groups = {}
+    for name in sorted(positions_by_name):
+        positions = positions_by_name[name]
+        name_groups[name] = (len(name_order), len(positions))
+        name_order.extend(positions)
+
+    encoded_strings = [ensure_binary(s)
+                       for s, _ in sorted(iteritems(strings), key=lambda x: x[1])]
+    for s in encoded_strings:
+        string_offsets.append(string_offsets[-1] + len(s))
+
+    section_data = {
+        'name_order': _pack_uint32(name_order),
+        'fn': _pack_uint32(fns),
+        'name': _pack_uint32(names),
+        'version': _pack_uint32(versions),
+        'build': _pack_uint32(builds),
+        'depends_offsets': _pack_uint32(depends_offsets),
+        'depends': _pack_uint32(depends),
+        'blob_offsets': _pack_uint32(blob_offsets),
+        'string_offsets': _pack_uint32(string_offsets),
+        'strings': source_strings + b''.join(encoded_strings),
+        'blobs': b''.join(blobs),
+    }
+    sections = {}
+    offset = 0
+    for section in SECTIONS:
+        sections[section] = (offset, len(section_data[section]))
+        offset += len(section_data[section])
+
+    header = ensure_binary(json.dumps({
+        'meta': meta,
+        'count': len(names),
+        'sections': sections,
+        'names': name_groups,
+        'track_features': track_features,
+    }, separators=(',', ':')))
+
+    tmp_path = '%s.%s.tmp' % (path, uuid4().hex[:8])
+    with open(tmp_path, 'wb') as fh:
+        fh.write(_PREFIX.pack(CACHE_MAGIC, CACHE_FORMAT_VERSION, len(header)))
+        fh.write(header)
+        for section in SECTIONS:
+            fh.write(section_data[section])
+    backoff_rename(tmp_path, path, force=True)
+
+
+class ColumnarCache(object):
+    """Read-only, memory-mapped view of a file written by ``write_columnar_cache``.
+
+    Only the header is parsed on open.  Column values are unpacked straight from the mapping
+    on access, and full record dicts are only decoded through ``info()``.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as fh:
+            self._mmap = mmap(fh.fileno(), 0, access=ACCESS_READ)
+        try:
+            magic, version, header_len = _PREFIX.unpack_from(self._mmap, 0)
+            if magic != CACHE_MAGIC or version != CACHE_FORMAT_VERSION:
+                raise ValueError("Unrecognized columnar cache format in %s" % path)
+            header_end = _PREFIX.size + header_len
+            header = json.loads(self._mmap[_PREFIX.size:header_end].decode('utf-8'))
+        except Exception:
+            self.close()
+            raise
+        self.path = path
+        self.meta = header['meta']
+        self.names = header['names']
+        self.track_features = header['track_features']
+        self._count = header['count']
+        self._sections = {k: header_end + v[0] for k, v in iteritems(header['sections'])}
+        self._section_sizes = {k: v[1] for k, v in iteritems(header['sections'])}
+        self._strings = {}
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        self._mmap.close()
+
+    def _section(self, section):
+        start = self._sections[section]
+        return self._mmap[start:start + self._section_sizes[section]]
+
+    def _section_uint32(self, section):
+        return self._uint32_range(section, 0, self._section_sizes[section] // 4)
+
+    def _uint32(self, section, i):
+        return _UINT32.unpack_from(self._mmap, self._sections[section] + 4 * i)[0]
+
+    def _uint32_range(self, section, start, stop):
+        return struct.unpack_from('<%dI' % (stop - start), self._mmap,
+                                  self._sections[section] + 4 * start)
+
+    def _bytes(self, offsets_section, data_section, i):
+        start, stop = _UINT32_PAIR.unpack_from(self._mmap, self._sections[offsets_section] + 4 * i)
+        base = self._sections[data_section]
+        return self._mmap[base + start:base + stop]
+
+    def string(self, ix):
+        value = self._strings.get(ix)
+        if value is None:
+            value = self._strings[ix] = text_type(
+                self._bytes('string_offsets', 'strings', ix).decode('utf-8')
+            )
+        return value
+
+    def positions(self, name):
+        """Record positions for package ``name``, in original record order."""
+        group = self.names.get(name)
+        if not group:
+            return ()
+        start, count = group
+        return self._uint32_range('name_order', start, start + count)
+
+    def fn(self, i):
+        return self.string(self._uint32('fn', i))
+
+    def name(self, i):
+        return self.string(self._uint32('name', i))
+
+    def version(self, i):
+        return self.string(self._uint32('version', i))
+
+    def build(self, i):
+        return self.string(self._uint32('build', i))
+
+    def depends(self, i):
+        start, stop = _UINT32_PAIR.unpack_from(self._mmap, self._sections['depends_offsets']
+                                               + 4 * i)
+        return [self.string(ix) for ix in self._uint32_range('depends', start, stop)]
+
+    def info(self, i):
+        """Decode the full record dict stored at position ``i``."""
+        info = json.loads(self._bytes('blob_offsets', 'blobs', i).decode('utf-8'))
+        info['fn'] = self.fn(i)
+        info['name'] = self.name(i)
+        info['version'] = self.version(i)
+        info['build'] = self.build(i)
+        info['depends'] = self.depends(i)
+        return info
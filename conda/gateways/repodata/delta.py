@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012 Anaconda, Inc
+# SPDX-License-Identifier: BSD-3-Clause
+"""
+Incremental repodata updates.
+
+A channel may publish, next to each repodata file, a delta document named after it (for
+``repodata.json``, ``repodata.delta.json``)::
+
+    {
+      "latest": {"_etag": "...", "_mod": "..."},
+      "deltas": [
+        {
+          "from": {"_etag": "...", "_mod": "..."},
+          "to": {"_etag": "...", "_mod": "..."},
+          "add": {"packages": {fn: record, ...}, "packages.conda": {...}},
+          "remove": {"packages": [fn, ...], "packages.conda": [...]}
+        },
+        ...
+      ]
+    }
+
+``from`` and ``to`` identify repodata states by the same ``Etag`` and ``Last-Modified`` values
+the client stores in its cached repodata as ``_etag`` and ``_mod``.  A client holding a cached
+state walks the chain of deltas starting at that state, and only when the chain ends at
+``latest`` does it apply them instead of downloading the full repodata again.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from collections import defaultdict
+from logging import getLogger
+from os.path import splitext
+
+from ...common.compat import iteritems, odict
+
+log = getLogger(__name__)
+
+PACKAGE_KEYS = ('packages', 'packages.conda')
+STATE_KEYS = ('_etag', '_mod')
+
+
+def delta_fn(repodata_fn):
+    return splitext(repodata_fn)[0] + '.delta.json'
+
+
+def same_state(state1, state2):
+    """Whether two ``{'_etag': ..., '_mod': ...}`` dicts identify the same repodata."""
+    if state1.get('_etag') and state2.get('_etag'):
+        return state1['_etag'] == state2['_etag']
+    if state1.get('_mod') and state2.get('_mod'):
+        return state1['_mod'] == state2['_mod']
+    return False
+
+
+def find_delta_chain(delta_document, etag, mod_stamp):
+    """The deltas leading from the cached state to the latest one, in the order to apply them.
+
+    Returns an empty list if the cached state already is the latest one, and None if there is
+    no unbroken chain of deltas from it.
+    """
+    latest = delta_document.get('latest') or {}
+    deltas = delta_document.get('deltas') or ()
+    current = {'_etag': etag, '_mod': mod_stamp}
+    chain = []
+    while not same_state(current, latest):
+        delta = next((d for d in deltas if same_state(d.get('from') or {}, current)), None)
+        if delta is None or len(chain) >= len(deltas):
+            return None
+        chain.append(delta)
+        current = delta.get('to') or {}
+    return chain
+
+
+def apply_repodata_delta(repodata, delta):
+    """Apply a single delta to the ``repodata`` dict, in place."""
+    for key, fns in iteritems(delta.get('remove') or {}):
+        packages = repodata.get(key) or {}
+        for fn in fns:
+            packages.pop(fn, None)
+    for key, packages in iteritems(delta.get('add') or {}):
+        repodata.setdefault(key, {}).update(packages)
+    to_state = delta.get('to') or {}
+    for key in STATE_KEYS:
+        if to_state.get(key):
+            repodata[key] = to_state[key]
+        else:
+            repodata.pop(key, None)
+    return repodata
+
+
+def merge_repodata_deltas(chain):
+    """Fold a chain of deltas into one delta with the same effect when applied.
+
+    An entry added by one delta and removed by a later one is only removed; an entry removed
+    and then added again is in both ``remove`` and ``add``, so it ends up where a fresh addition
+    would, as it does when the deltas are applied one by one.
+    """
+    add = odict()
+    remove = defaultdict(set)
+    for delta in chain:
+        for key, fns in iteritems(delta.get('remove') or {}):
+            for fn in fns:
+                if key in add:
+                    add[key].pop(fn, None)
+                remove[key].add(fn)
+        for key, packages in iteritems(delta.get('add') or {}):
+            add.setdefault(key, odict()).update(packages)
+    return {
+        'from': (chain[0].get('from') or {}) if chain else {},
+        'to': (chain[-1].get('to') or {}) if chain else {},
+        'add': add,
+        'remove': {key: sorted(fns) for key, fns in iteritems(remove)},
+    }
+
+
+def make_repodata_delta(old_repodata, new_repodata, from_state, to_state):
+    """Compute the delta turning ``old_repodata`` into ``new_repodata``.
+
+    Meant for channel tooling and tests; ``from_state`` and ``to_state`` are the
+    ``{'_etag': ..., '_mod': ...}`` dicts the two repodata versions are served with.
+    """
+    add, remove = {}, {}
+    for key in PACKAGE_KEYS:
+        old_packages = old_repodata.get(key) or {}
+        new_packages = new_repodata.get(key) or {}
+        added = {fn: info for fn, info in iteritems(new_packages)
+                 if old_packages.get(fn) != info}
+        removed = sorted(fn for fn in old_packages if fn not in new_packages)
+        if added:
+            add[key] = added
+        if removed:
+            remove[key] = removed
+    return {
+        'from': {k: v for k, v in iteritems(from_state) if k in STATE_KEYS},
+        'to': {k: v for k, v in iteritems(to_state) if k in STATE_KEYS},
+        'add': add,
+        'remove': remove,
+    }
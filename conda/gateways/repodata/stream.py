@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012 Anaconda, Inc
+# SPDX-License-Identifier: BSD-3-Clause
+"""
+Incremental parsing of repodata json.
+
+The file is read in chunks and the entries of ``packages`` / ``packages.conda`` are decoded as
+soon as they are complete, so the raw text of a repodata file is never held in memory as a whole
+next to what is parsed from it.  The complete entries of a chunk are decoded together in one
+``raw_decode`` call, which keeps the parse nearly as fast as ``json.loads`` on the whole text.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from json import JSONDecoder, JSONEncoder
+from logging import getLogger
+import re
+
+from ...common.compat import iteritems, odict
+
+from .delta import PACKAGE_KEYS, STATE_KEYS
+
+log = getLogger(__name__)
+
+CHUNK_SIZE = 1 << 18
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_MEMBER_NAME = re.compile(r'[ \t\n\r]*("(?:[^"\\]|\\.)*")[ \t\n\r]*:', re.DOTALL)
+# the end of an object member whose value is an object, followed by another such member
+_OBJECT_MEMBER_BOUNDARY = re.compile(
+    r'\}[ \t\n\r]*,(?=[ \t\n\r]*"[^"\\]*"[ \t\n\r]*:[ \t\n\r]*\{)')
+
+_encode = JSONEncoder().encode
+
+
+class _JsonStreamReader(object):
+
+    def __init__(self, fh, chunk_size=CHUNK_SIZE):
+        self._fh = fh
+        self._chunk_size = chunk_size
+        self._decoder = JSONDecoder()
+        self._buffer = fh.read(0)
+        self._pos = 0
+        self._eof = False
+        self._batch_failed = False
+
+    def _fill(self, size):
+        data = self._fh.read(size)
+        if not data:
+            self._eof = True
+        self._buffer = self._buffer[self._pos:] + data
+        self._pos = 0
+        self._batch_failed = False
+
+    def next_char(self):
+        """Consume and return the next non-whitespace character, or '' at end of input."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                char = self._buffer[self._pos]
+                self._pos += 1
+                return char
+            if self._eof:
+                return ''
+            self._fill(self._chunk_size)
+
+    def expect(self, expected):
+        char = self.next_char()
+        if char != expected:
+            raise ValueError("Expecting '%s' but found '%s' at char %d of buffered repodata"
+                             % (expected, char, self._pos))
+
+    def expect_end(self):
+        char = self.next_char()
+        if char:
+            raise ValueError("Extra data '%s' at char %d of buffered repodata"
+                             % (char, self._pos))
+
+    def end_of_object(self):
+        """Consume the ',' or '}' following an object member; True for '}'."""
+        char = self.next_char()
+        if char not in (',', '}'):
+            raise ValueError("Expecting ',' or '}' but found '%s' at char %d of buffered "
+                             "repodata" % (char, self._pos))
+        return char == '}'
+
+    def peek_char(self):
+        char = self.next_char()
+        if char:
+            self._pos -= 1
+        return char
+
+    def member_name(self):
+        """Consume the name and ':' of the next object member, returning the name."""
+        while True:
+            match = _MEMBER_NAME.match(self._buffer, self._pos)
+            if match:
+                self._pos = match.end()
+                name = match.group(1)
+                return self._decoder.decode(name) if '\\' in name else name[1:-1]
+            if self._eof:
+                raise ValueError("Expecting property name at char %d of buffered repodata"
+                                 % self._pos)
+            self._fill(self._chunk_size)
+
+    def value(self):
+        """Consume and decode the next complete json value."""
+        read_size = self._chunk_size
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except ValueError:
+                if self._eof:
+                    raise
+            else:
+                # a number running up to the end of the buffer may continue in the next chunk
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            self._fill(read_size)
+            read_size *= 2
+
+    def members(self):
+        """Consume the members of the object whose '{' was just consumed, up to and including
+        its '}', yielding ``(name, value)`` for each.
+        """
+        for _, members in self.member_runs():
+            for item in iteritems(members):
+                yield item
+
+    def member_runs(self):
+        """Like ``members``, but yield the members in runs, as ``(text, members)``.
+
+        ``members`` maps the name of each member in the run to its value, and ``text`` is the
+        raw json of the run, without the enclosing braces, or None where it isn't kept.
+        """
+        self._batch_failed = False
+        if self.peek_char() == '}':
+            self._pos += 1
+            return
+        while True:
+            if not self._batch_failed:
+                if len(self._buffer) - self._pos < self._chunk_size and not self._eof:
+                    self._fill(self._chunk_size)
+                run = self._members_batch()
+                if run is not None:
+                    yield run
+                    continue
+                self._batch_failed = True
+            name = self.member_name()
+            yield None, {name: self.value()}
+            if self.end_of_object():
+                return
+
+    def _members_batch(self):
+        """Decode the members up to the last member boundary in the buffer as one object,
+        returning their text and the decoded object.
+
+        A boundary inside a nested object, or past the end of this object, makes the decode
+        fail or stop short; None is returned then and the members are read one at a time.
+        """
+        boundary = None
+        for boundary in _OBJECT_MEMBER_BOUNDARY.finditer(self._buffer, self._pos):
+            pass
+        if boundary is None:
+            return None
+        text = self._buffer[self._pos:boundary.start() + 1]
+        try:
+            batch, end = self._decoder.raw_decode('{%s}' % text)
+        except ValueError:
+            return None
+        if end != len(text) + 2:
+            return None
+        self._pos = boundary.end()
+        return text, batch
+
+
+def _iter_members(reader, package_keys):
+    """Yield ``(key, runs, value)`` for each top-level member of the repodata ``reader`` reads.
+
+    ``runs`` is the ``member_runs()`` of an object under one of ``package_keys``, which must be
+    exhausted before the next member is read, and None for any other key.
+    """
+    char = reader.next_char()
+    if not char:
+        return
+    if char != '{':
+        raise ValueError("Expecting '{' but found '%s' at start of repodata" % char)
+    if reader.peek_char() == '}':
+        reader.expect('}')
+    else:
+        while True:
+            key = reader.member_name()
+            if key in package_keys:
+                reader.expect('{')
+                yield key, reader.member_runs(), None
+            else:
+                yield key, None, reader.value()
+            if reader.end_of_object():
+                break
+    reader.expect_end()
+
+
+def iter_repodata(fh, package_keys=PACKAGE_KEYS, chunk_size=CHUNK_SIZE):
+    """Parse repodata json incrementally from the text file object ``fh``.
+
+    Yields ``(key, fn, info)`` for each entry of the objects under ``package_keys``, and
+    ``(key, None, value)`` for every other top-level key and for an empty object under one of
+    ``package_keys``.  Blank input is read as an empty object, as ``json.loads(raw or '{}')``.
+    """
+    reader = _JsonStreamReader(fh, chunk_size)
+    for key, runs, value in _iter_members(reader, package_keys):
+        if runs is None:
+            yield key, None, value
+            continue
+        empty = True
+        for _, members in runs:
+            for fn, info in iteritems(members):
+                yield key, fn, info
+            empty = False
+        if empty:
+            yield key, None, {}
+
+
+class _MembersWriter(object):
+    """Writes the members of a json object to ``out``, separated by commas."""
+
+    def __init__(self, out):
+        self._out = out
+        self.count = 0
+
+    def write_raw(self, text):
+        if self.count:
+            self._out.write(', ')
+        self._out.write(text)
+        self.count += 1
+
+    def write(self, name, value_json):
+        self.write_raw('%s: %s' % (_encode(name), value_json))
+
+
+def _patch_packages(out, key, runs, removed, added):
+    out.write('{')
+    members = _MembersWriter(out)
+    for text, run in runs:
+        if text is not None and not any(fn in removed or fn in added for fn in run):
+            members.write_raw(text.strip())
+            for fn, info in iteritems(run):
+                yield key, fn, info
+            continue
+        for fn, info in iteritems(run):
+            if fn in removed:
+                continue
+            if fn in added:
+                info = added.pop(fn)
+            members.write(fn, _encode(info))
+            yield key, fn, info
+    for fn, info in iteritems(added):
+        members.write(fn, _encode(info))
+        yield key, fn, info
+    out.write('}')
+    if not members.count:
+        yield key, None, {}
+
+
+def patch_repodata(fh, out, delta, package_keys=PACKAGE_KEYS, chunk_size=CHUNK_SIZE):
+    """Write the repodata json read from ``fh`` to the text file object ``out``, with ``delta``
+    applied as ``apply_repodata_delta`` applies it to the parsed document.
+
+    Yields the entries of the patched document as ``iter_repodata`` would read them back from
+    ``out``, which is complete once they are exhausted.  Runs of entries the delta leaves alone
+    are copied as they are rather than encoded again.  The state keys of the delta's ``to``
+    come first in ``out``, where read_mod_and_etag finds them.
+    """
+    removed = {key: frozenset(fns) for key, fns in iteritems(delta.get('remove') or {})}
+    added = odict((key, odict(packages)) for key, packages in iteritems(delta.get('add') or {}))
+    to_state = delta.get('to') or {}
+    out.write('{')
+    members = _MembersWriter(out)
+    for key in STATE_KEYS:
+        if to_state.get(key):
+            members.write(key, _encode(to_state[key]))
+            yield key, None, to_state[key]
+
+    reader = _JsonStreamReader(fh, chunk_size)
+    for key, runs, value in _iter_members(reader, package_keys):
+        if runs is not None:
+            members.write_raw('%s: ' % _encode(key))
+            for entry in _patch_packages(out, key, runs, removed.get(key, ()),
+                                         added.pop(key, None) or {}):
+                yield entry
+        elif key not in STATE_KEYS:
+            members.write(key, _encode(value))
+            yield key, None, value
+    for key, packages in iteritems(added):
+        members.write_raw('%s: ' % _encode(key))
+        for entry in _patch_packages(out, key, (), (), packages):
+            yield entry
+    out.write('}')
+
+
+def iter_repodata_obj(json_obj, package_keys=PACKAGE_KEYS):
+    """Yield the entries of the already parsed repodata ``json_obj`` as ``iter_repodata``
+    yields them from its json text.
+    """
+    for key, value in iteritems(json_obj):
+        if key in package_keys and isinstance(value, dict) and value:
+            for fn, info in iteritems(value):
+                yield key, fn, info
+        else:
+            yield key, None, value
+
+
+def load_repodata(fh, chunk_size=CHUNK_SIZE):
+    """Equivalent of ``json.loads(fh.read() or '{}')`` for repodata, built entry by entry from
+    ``iter_repodata``.
+    """
+    repodata = {}
+    for key, fn, value in iter_repodata(fh, chunk_size=chunk_size):
+        if fn is None:
+            repodata[key] = value
+        else:
+            repodata.setdefault(key, {})[fn] = value
+    return repodata
@@ -71,6 +71,8 @@ class LinkType(Enum):
     softlink = 2
     copy = 3
     directory = 4
+    # a copy that shares data blocks with its source until either is written
+    reflink = 5
 
     def __int__(self):
         return self.value
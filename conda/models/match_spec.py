@@ -4,6 +4,7 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 from abc import ABCMeta, abstractmethod, abstractproperty
+from collections import OrderedDict
 
 try:
     from collections.abc import Mapping
@@ -14,6 +15,7 @@ from logging import getLogger
 from operator import attrgetter
 from os.path import basename
 import re
+from threading import Lock
 
 from .channel import Channel
 from .version import BuildNumberMatch, VersionSpec
@@ -21,6 +23,7 @@ from .._vendor.auxlib.collection import frozendict
 from .._vendor.auxlib.decorators import memoizedproperty
 from .._vendor.toolz import concat, concatv, groupby
 from ..base.constants import CONDA_PACKAGE_EXTENSION_V1
+from ..base.context import context
 from ..common.compat import (isiterable, iteritems, itervalues, string_types, text_type,
                              with_metaclass)
 from ..common.io import dashlist
@@ -30,6 +33,49 @@ from ..exceptions import CondaValueError, InvalidMatchSpec
 
 log = getLogger(__name__)
 
+
+class _LRUCache(object):
+    """A size-bounded, thread-safe mapping that evicts the least recently used key."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                return default
+            self._data[key] = value
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Distinct dependency strings across the defaults and conda-forge channels number in the
+# tens of thousands; the bound only keeps pathological inputs from growing without limit.
+_CACHE_MAXSIZE = 2 ** 17
+
+
 class MatchSpecType(type):
 
     def __call__(cls, spec_arg=None, **kwargs):
@@ -44,6 +90,16 @@ class MatchSpecType(type):
                 new_kwargs.update(**kwargs)
                 return super(MatchSpecType, cls).__call__(**new_kwargs)
             elif isinstance(spec_arg, string_types):
+                if not kwargs and cls is MatchSpec:
+                    # MatchSpec instances are immutable, so one instance per spec string
+                    # can be shared; e.g. Resolve.ms_depends sees the same depends strings
+                    # on every solve.
+                    spec = _INTERNED_SPECS.get(spec_arg)
+                    if spec is None:
+                        parsed = _parse_spec_str(spec_arg)
+                        spec = super(MatchSpecType, cls).__call__(**parsed)
+                        _INTERNED_SPECS[spec_arg] = spec
+                    return spec
                 parsed = _parse_spec_str(spec_arg)
                 if kwargs:
                     parsed = dict(parsed, **kwargs)
@@ -169,6 +225,10 @@ class MatchSpec(object):
     FIELD_NAMES_SET = frozenset(FIELD_NAMES)
     _MATCHER_CACHE = {}
 
+    @staticmethod
+    def _reset_state():
+        _INTERNED_SPECS.clear()
+
     def __init__(self, optional=False, target=None, **kwargs):
         self._optional = optional
         self._target = target
@@ -558,7 +618,10 @@ def _parse_channel(channel_val):
     return channel_name, chn.subdir
 
 
-_PARSE_CACHE = {}
+_PARSE_CACHE = _LRUCache(_CACHE_MAXSIZE)
+_INTERNED_SPECS = _LRUCache(_CACHE_MAXSIZE)
+# interned specs hold Channel objects, which are only valid for the current context
+context.register_reset_callaback(MatchSpec._reset_state)
 
 
 def _parse_spec_str(spec_str):
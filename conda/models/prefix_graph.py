@@ -35,12 +35,16 @@ class PrefixGraph(object):
         specs = set(specs)
         self.graph = graph = {}  # Dict[PrefixRecord, Set[PrefixRecord]]
         self.spec_matches = spec_matches = {}  # Dict[PrefixRecord, Set[MatchSpec]]
+        records_by_name = defaultdict(list)
+        for rec in records:
+            records_by_name[rec.name].append(rec)
         for node in records:
-            parent_match_specs = tuple(MatchSpec(d) for d in node.depends)
-            parent_nodes = set(
-                rec for rec in records
-                if any(m.match(rec) for m in parent_match_specs)
-            )
+            parent_nodes = set()
+            for m in (MatchSpec(d) for d in node.depends):
+                # only records with the spec's name can match it
+                name = m.get_exact_value('name')
+                candidates = records if name is None else records_by_name.get(name, ())
+                parent_nodes.update(rec for rec in candidates if m.match(rec))
             graph[node] = parent_nodes
             matching_specs = IndexedSet(s for s in specs if s.match(node))
             if matching_specs:
@@ -146,10 +150,10 @@ class PrefixGraph(object):
 
     def all_descendants(self, node):
         graph = self.graph
-        inverted_graph = {
-            node: set(key for key in graph if node in graph[key])
-            for node in graph
-        }
+        inverted_graph = {node: set() for node in graph}
+        for key, parent_nodes in iteritems(graph):
+            for parent_node in parent_nodes:
+                inverted_graph.setdefault(parent_node, set()).add(key)
 
         nodes = [node]
         nodes_seen = set()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2012 Anaconda, Inc
+# SPDX-License-Identifier: BSD-3-Clause
+"""
+Secondary indexes for selecting the records a MatchSpec may match.
+
+Callers that key their records by name can look up exact-name specs directly; ``RecordIndex``
+is for everything else (glob names like ``py*``, or specs constraining only ``build``,
+``md5``, ``subdir`` or ``track_features``), which would otherwise test every record.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from collections import defaultdict
+from logging import getLogger
+
+from .match_spec import FeatureMatch, GlobLowerStrMatch
+from ..common.compat import iteritems, text_type
+
+log = getLogger(__name__)
+
+# ordered by the cost of building the index; md5 of a PackageCacheRecord can mean hashing
+# the tarball, so that index is only built when nothing else narrows the candidates
+_INDEXED_FIELDS = ('name', 'subdir', 'build', 'track_features', 'md5')
+
+
+def _field_key(field_name, value):
+    if field_name == 'track_features':
+        return FeatureMatch(value).exact_value
+    return text_type(value)
+
+
+class RecordIndex(object):
+    """Candidate selection for ``MatchSpec`` queries over a fixed collection of records.
+
+    Indexes are built lazily, per field, the first time a spec constrains that field.
+    ``candidates`` returns a superset of the matching records, in their original order;
+    callers still filter them with ``MatchSpec.match``.
+    """
+
+    def __init__(self, records):
+        self._records = tuple(records)
+        self._field_indexes = {}
+        self._glob_positions = {}
+
+    def __len__(self):
+        return len(self._records)
+
+    def _field_index(self, field_name):
+        index = self._field_indexes.get(field_name)
+        if index is None:
+            index = defaultdict(list)
+            for position, record in enumerate(self._records):
+                index[_field_key(field_name, getattr(record, field_name))].append(position)
+            index = self._field_indexes[field_name] = dict(index)
+        return index
+
+    def _name_glob_positions(self, pattern):
+        positions = self._glob_positions.get(pattern)
+        if positions is None:
+            name_match = GlobLowerStrMatch(pattern).match
+            positions = self._glob_positions[pattern] = sorted(
+                position
+                for name, name_positions in iteritems(self._field_index('name'))
+                if name_match(name)
+                for position in name_positions
+            )
+        return positions
+
+    def _positions(self, spec):
+        """Sorted positions of the records ``spec`` may match, or None if no index applies."""
+        best = None
+        for field_name in _INDEXED_FIELDS:
+            if best is not None and (field_name == 'md5' or not best):
+                break
+            value = spec.get_exact_value(field_name)
+            if value is not None:
+                positions = self._field_index(field_name).get(_field_key(field_name, value), ())
+            elif field_name == 'name' and spec.get_raw_value('name') not in (None, '*'):
+                positions = self._name_glob_positions(spec.get_raw_value('name'))
+            else:
+                continue
+            if best is None or len(positions) < len(best):
+                best = positions
+        return best
+
+    def candidates(self, spec):
+        positions = self._positions(spec)
+        if positions is None:
+            return self._records
+        records = self._records
+        return tuple(records[position] for position in positions)
+
+    def query(self, spec):
+        """Generate the records matching ``spec``, in their original order."""
+        return (record for record in self.candidates(spec) if spec.match(record))
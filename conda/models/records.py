@@ -19,11 +19,12 @@ from .channel import Channel
 from .enums import FileMode, LinkType, NoarchType, PackageType, PathType, Platform
 from .match_spec import MatchSpec
 from .._vendor.auxlib.entity import (BooleanField, ComposableField, DictSafeMixin, Entity,
-                                     EnumField, IntegerField, ListField, NumberField,
+                                     EnumField, Field, IntegerField, ListField, NumberField,
                                      StringField)
 from .._vendor.boltons.timeutils import dt_to_timestamp, isoparse
 from ..base.context import context
-from ..common.compat import isiterable, itervalues, string_types, text_type
+from ..common.compat import isiterable, itervalues, odict, string_types, text_type
+from ..common.constants import NULL
 from ..exceptions import PathNotFoundError
 
 
@@ -426,13 +427,53 @@ class PackageCacheRecord(PackageRecord):
             return md5sum
 
 
+_DEFERRED_FIELDS = '__deferred_fields'
+
+
+class _DeferredFields(object):
+    # the not yet loaded fields of a PrefixRecord made by PrefixRecord.lazy()
+
+    def __init__(self, names, load):
+        self.pending = set(names)
+        self._load = load
+        self._values = None
+
+    def values(self):
+        if self._values is None:
+            self._values = self._load()
+        return self._values
+
+
+class _DeferredFieldMixin(object):
+    # a field that PrefixRecord.lazy() can leave unloaded until it is first used
+
+    def __get__(self, instance, instance_type):
+        if instance is not None and _DEFERRED_FIELDS in instance.__dict__:
+            instance._load_deferred_field(self.name)
+        return super(_DeferredFieldMixin, self).__get__(instance, instance_type)
+
+    def __set__(self, instance, val):
+        if _DEFERRED_FIELDS in instance.__dict__:
+            instance._load_deferred_field(self.name)
+        super(_DeferredFieldMixin, self).__set__(instance, val)
+
+
+class DeferredListField(_DeferredFieldMixin, ListField):
+    pass
+
+
+class DeferredComposableField(_DeferredFieldMixin, ComposableField):
+    pass
+
+
 class PrefixRecord(PackageRecord):
 
     package_tarball_full_path = StringField(required=False)
     extracted_package_dir = StringField(required=False)
 
-    files = ListField(string_types, default=(), required=False)
-    paths_data = ComposableField(PathsData, required=False, nullable=True, default_in_dump=False)
+    files = DeferredListField(string_types, default=(), required=False)
+    paths_data = DeferredComposableField(PathsData, required=False, nullable=True,
+                                         default_in_dump=False)
     link = ComposableField(Link, required=False)
     # app = ComposableField(App, required=False)
 
@@ -445,6 +486,51 @@ class PrefixRecord(PackageRecord):
     # # a new concept introduced in 4.4 for private env packages
     # leased_paths = ListField(LeasedPathEntry, required=False)
 
+    # the largest parts of a conda-meta record, which most commands never look at
+    deferred_fields = ('files', 'paths_data')
+
+    @classmethod
+    def lazy(cls, header, load_deferred_fields):
+        """
+        Make a PrefixRecord from ``header``, a conda-meta record without its
+        ``deferred_fields``.  ``load_deferred_fields`` is called the first time one of them is
+        used, and returns a dict holding whichever of them the record has.  Each field is only
+        built from that dict when it is used itself.
+        """
+        prefix_record = cls(**header)
+        prefix_record.__dict__[_DEFERRED_FIELDS] = _DeferredFields(cls.deferred_fields,
+                                                                   load_deferred_fields)
+        return prefix_record
+
+    def dump_header(self):
+        """
+        The ``dump()`` of this record without its ``deferred_fields``, as taken by ``lazy()``.
+        """
+        deferred_fields = self.deferred_fields
+        return odict((field.name, field.dump(self, self.__class__, value))
+                     for field, value in ((field, getattr(self, field.name, NULL))
+                                          for field in itervalues(self.__fields__)
+                                          if field.in_dump and field.name not in deferred_fields)
+                     if value is not NULL and not (value is field.default
+                                                   and not field.default_in_dump))
+
+    @property
+    def deferred_fields_loaded(self):
+        return _DEFERRED_FIELDS not in self.__dict__
+
+    def _load_deferred_field(self, key):
+        deferred = self.__dict__.get(_DEFERRED_FIELDS)
+        if deferred is None or key not in deferred.pending:
+            return
+        values = deferred.values()
+        if key in values:
+            # set through the plain field, so this doesn't trigger another load
+            Field.__set__(self.__fields__[key], self, values[key])
+        # only after the value is in place, for threads reading the field concurrently
+        deferred.pending.discard(key)
+        if not deferred.pending:
+            self.__dict__.pop(_DEFERRED_FIELDS, None)
+
     # @classmethod
     # def load(cls, conda_meta_json_path):
     #     return cls()
@@ -2,6 +2,7 @@
 # Copyright (C) 2012 Anaconda, Inc
 # SPDX-License-Identifier: BSD-3-Clause
 from __future__ import absolute_import, division, print_function, unicode_literals
+from bisect import bisect_left, bisect_right
 from logging import getLogger
 import operator as op
 import re
@@ -591,6 +592,97 @@ class VersionSpec(BaseSpec):  # lgtm [py/missing-equals]
 VersionMatch = VersionSpec
 
 
+def _sort_keys(version_orders):
+    """Plain tuples that order like ``version_orders`` do, for sorting them in one pass.
+
+    Components are padded with the fill value to the same shape across all the given
+    versions, and each value is tagged so that strings order before numbers.
+    """
+    shapes = []
+    for part in ('version', 'local'):
+        shape = []
+        for vo in version_orders:
+            components = getattr(vo, part)
+            shape.extend([0] * (len(components) - len(shape)))
+            for j, component in enumerate(components):
+                shape[j] = max(shape[j], len(component))
+        shapes.append((part, shape))
+
+    def sort_key(vo):
+        key = []
+        for part, shape in shapes:
+            components = getattr(vo, part)
+            for j, width in enumerate(shape):
+                component = components[j] if j < len(components) else ()
+                for k in range(width):
+                    c = component[k] if k < len(component) else vo.fillvalue
+                    key.append((0, c) if isinstance(c, string_types) else (1, c))
+        return tuple(key)
+
+    return [sort_key(vo) for vo in version_orders]
+
+
+class RankedVersions(object):
+    """The distinct values of a collection of version strings, ranked by ``VersionOrder``.
+
+    ``mask(version_spec)`` evaluates a ``VersionSpec`` once per distinct version rather than
+    once per record, resolving ``==``, ``!=``, ``<``, ``<=``, ``>`` and ``>=`` by binary search
+    over the ranked versions.  The result is indexed by ``rank[version_str]``.
+    """
+
+    _RANGE_OPERATORS = (op.__eq__, op.__ne__, op.__lt__, op.__le__, op.__gt__, op.__ge__)
+
+    def __init__(self, version_strs):
+        versions = list(set(version_strs))
+        orders = [VersionOrder(v) for v in versions]
+        keys = _sort_keys(orders)
+        ranked = sorted(range(len(versions)), key=keys.__getitem__)
+        self._orders = [orders[i] for i in ranked]
+        self._versions = [versions[i] for i in ranked]
+        self.rank = {v: i for i, v in enumerate(self._versions)}
+        self._masks = {}
+
+    def __len__(self):
+        return len(self._versions)
+
+    def mask(self, version_spec):
+        mask = self._masks.get(version_spec)
+        if mask is None:
+            mask = self._masks[version_spec] = self._make_mask(version_spec)
+        return mask
+
+    def _make_mask(self, version_spec):
+        matcher = version_spec.match
+        if hasattr(version_spec, 'tup'):
+            combine = any if matcher == version_spec.any_match else all
+            return [combine(m) for m in zip(*(self.mask(s) for s in version_spec.tup))]
+        elif (matcher == version_spec.operator_match
+              and version_spec.operator_func in self._RANGE_OPERATORS):
+            operator_func = version_spec.operator_func
+            # [start, stop) is the run of versions equal to matcher_vo
+            start = bisect_left(self._orders, version_spec.matcher_vo)
+            stop = bisect_right(self._orders, version_spec.matcher_vo, start)
+            n = len(self._orders)
+            if operator_func is op.__eq__:
+                ranges = ((start, stop),)
+            elif operator_func is op.__ne__:
+                ranges = ((0, start), (stop, n))
+            elif operator_func is op.__lt__:
+                ranges = ((0, start),)
+            elif operator_func is op.__le__:
+                ranges = ((0, stop),)
+            elif operator_func is op.__gt__:
+                ranges = ((stop, n),)
+            else:
+                ranges = ((start, n),)
+            mask = [False] * n
+            for lo, hi in ranges:
+                mask[lo:hi] = [True] * (hi - lo)
+            return mask
+        else:
+            return [bool(matcher(v)) for v in self._versions]
+
+
 @with_metaclass(SingleStrArgCachingType)
 class BuildNumberMatch(BaseSpec):  # lgtm [py/missing-equals]
     _cache_ = {}
@@ -15,16 +15,17 @@ from .base.constants import ChannelPriority, MAX_CHANNEL_PRIORITY, SatSolverChoi
 from .base.context import context
 from .common.compat import iteritems, iterkeys, itervalues, odict, on_win, text_type
 from .common.io import time_recorder
-from .common.logic import (Clauses, PycoSatSolver, PyCryptoSatSolver, PySatSolver, TRUE,
-                           minimal_unsatisfiable_subset)
+from .common.logic import (Clauses, PycoSatSolver, PyCryptoSatSolver, PySatRC2Solver,
+                           PySatSolver, TRUE, minimal_unsatisfiable_subset)
 from .common.toposort import toposort
 from .exceptions import (CondaDependencyError, InvalidSpec, ResolvePackageNotFound,
                          UnsatisfiableError)
 from .models.channel import Channel, MultiChannel
 from .models.enums import NoarchType, PackageType
 from .models.match_spec import MatchSpec
+from .models.record_index import RecordIndex
 from .models.records import PackageRecord
-from .models.version import VersionOrder
+from .models.version import RankedVersions, VersionOrder, VersionSpec
 
 log = getLogger(__name__)
 stdoutlog = getLogger('conda.stdoutlog')
@@ -33,10 +34,14 @@ stdoutlog = getLogger('conda.stdoutlog')
 Unsatisfiable = UnsatisfiableError
 ResolvePackageNotFound = ResolvePackageNotFound
 
+# the fields a MatchSpec can constrain besides name and version
+_NON_VERSION_FIELDS = tuple(f for f in MatchSpec.FIELD_NAMES if f not in ('name', 'version'))
+
 _sat_solvers = odict([
     (SatSolverChoice.PYCOSAT, PycoSatSolver),
     (SatSolverChoice.PYCRYPTOSAT, PyCryptoSatSolver),
     (SatSolverChoice.PYSAT, PySatSolver),
+    (SatSolverChoice.PYSAT_RC2, PySatRC2Solver),
 ])
 
 
@@ -117,10 +122,13 @@ class Resolve(object):
         self.groups = groups  # Dict[package_name, List[PackageRecord]]
         self.trackers = trackers  # Dict[track_feature, Set[PackageRecord]]
         self._cached_find_matches = {}  # Dict[MatchSpec, Set[PackageRecord]]
+        self._record_index = None  # RecordIndex, for specs without an exact name
+        self._ranked_groups = {}  # Dict[package_name, Tuple[RankedVersions, List[int]]]
         self.ms_depends_ = {}  # Dict[PackageRecord, List[MatchSpec]]
         self._reduced_index_cache = {}
         self._pool_cache = {}
         self._strict_channel_cache = {}
+        self._valid_spec_cache = {}  # Dict[Tuple[PackageRecord, MatchSpec], bool]
 
         self._system_precs = {_ for _ in index if (
             hasattr(_, 'package_type') and _.package_type == PackageType.VIRTUAL_SYSTEM)}
@@ -197,24 +205,31 @@ class Resolve(object):
         return result
 
     def valid2(self, spec_or_prec, filter_out, optional=True):
+        # MatchSpec instances are interned and shared across Resolve instances, so results are
+        # cached here by the record whose dependency the spec is rather than on the spec itself.
+        valid_specs = self._valid_spec_cache
+
         def is_valid(_spec_or_prec):
             if isinstance(_spec_or_prec, MatchSpec):
                 return is_valid_spec(_spec_or_prec)
             else:
                 return is_valid_prec(_spec_or_prec)
 
-        @memoizemethod
-        def is_valid_spec(_spec):
-            return optional and _spec.optional or any(
-                is_valid_prec(_prec) for _prec in self.find_matches(_spec)
-            )
+        def is_valid_spec(_spec, _parent=None):
+            key = _parent, _spec
+            val = valid_specs.get(key)
+            if val is None:
+                val = valid_specs[key] = optional and _spec.optional or any(
+                    is_valid_prec(_prec) for _prec in self.find_matches(_spec)
+                )
+            return val
 
         def is_valid_prec(prec):
             val = filter_out.get(prec)
             if val is None:
                 filter_out[prec] = False
                 try:
-                    has_valid_deps = all(is_valid_spec(ms) for ms in self.ms_depends(prec))
+                    has_valid_deps = all(is_valid_spec(ms, prec) for ms in self.ms_depends(prec))
                 except InvalidSpec:
                     val = filter_out[prec] = "invalid dep specs"
                 else:
@@ -775,18 +790,39 @@ class Resolve(object):
         spec_name = spec.get_exact_value('name')
         if spec_name:
             candidate_precs = self.groups.get(spec_name, ())
+            if candidate_precs and 'version' in spec:
+                candidate_precs = self._find_version_matches(spec_name,
+                                                             spec.get_raw_value('version'))
+                if not any(field in spec for field in _NON_VERSION_FIELDS):
+                    res = self._cached_find_matches[spec] = tuple(candidate_precs)
+                    return res
         elif spec.get_exact_value('track_features'):
             feature_names = spec.get_exact_value('track_features')
             candidate_precs = concat(
                 self.trackers.get(feature_name, ()) for feature_name in feature_names
             )
         else:
-            candidate_precs = itervalues(self.index)
+            if self._record_index is None:
+                self._record_index = RecordIndex(itervalues(self.index))
+            candidate_precs = self._record_index.candidates(spec)
 
         res = tuple(p for p in candidate_precs if spec.match(p))
         self._cached_find_matches[spec] = res
         return res
 
+    def _find_version_matches(self, name, version_spec_str):
+        # the group's records whose version matches, without comparing versions per record
+        ranked_group = self._ranked_groups.get(name)
+        if ranked_group is None:
+            group = self.groups[name]
+            ranked_versions = RankedVersions(prec.version for prec in group)
+            ranked_group = self._ranked_groups[name] = (
+                ranked_versions, [ranked_versions.rank[prec.version] for prec in group]
+            )
+        ranked_versions, ranks = ranked_group
+        mask = ranked_versions.mask(VersionSpec(version_spec_str))
+        return [prec for prec, rank in zip(self.groups[name], ranks) if mask[rank]]
+
     def ms_depends(self, prec):
         # type: (PackageRecord) -> List[MatchSpec]
         deps = self.ms_depends_.get(prec)
@@ -323,6 +323,25 @@ class ContextCustomRcTests(TestCase):
             assert context.repodata_threads == 1
             assert context.execute_threads == 3
 
+    def test_compile_processes(self):
+        assert context.compile_processes >= 1
+        with env_var('CONDA_COMPILE_PROCESSES', '3',
+                     stack_callback=conda_tests_ctxt_mgmt_def_pol):
+            assert context.compile_processes == 3
+
+    def test_package_cache_size_budget(self):
+        assert context.package_cache_size_budget == 0
+        for value, expected in (('1048576', 2 ** 20), ('512MB', 512 * 2 ** 20),
+                                ('1.5 GiB', 3 * 2 ** 29), ('20g', 20 * 2 ** 30)):
+            with env_var('CONDA_PACKAGE_CACHE_SIZE_BUDGET', value,
+                         stack_callback=conda_tests_ctxt_mgmt_def_pol):
+                assert context.package_cache_size_budget == expected
+
+        with env_var('CONDA_PACKAGE_CACHE_SIZE_BUDGET', 'lots',
+                     stack_callback=conda_tests_ctxt_mgmt_def_pol):
+            with pytest.raises(ValidationError):
+                context.package_cache_size_budget
+
 
 class ContextDefaultRcTests(TestCase):
 
@@ -1,25 +1,32 @@
 import json
+import os
 from os.path import abspath, basename, dirname, join
 
 import pytest
 
 from conda import CondaMultiError
-from conda.base.constants import PACKAGE_CACHE_MAGIC_FILE
+from conda.base.constants import CONDA_TEMP_EXTENSION, PACKAGE_CACHE_MAGIC_FILE
 from conda.base.context import conda_tests_ctxt_mgmt_def_pol
 from conda.common.io import env_vars, env_var
 from conda.core.index import get_index
 from conda.core.package_cache_data import PackageCacheData, ProgressiveFetchExtract
-from conda.core.path_actions import CacheUrlAction
+from conda.core.path_actions import CacheUrlAction, ExtractPackageAction, package_cache_lock
 from conda.exceptions import ChecksumMismatchError
 from conda.exports import url_path
 from conda.gateways.disk.create import copy
+from conda.gateways.disk.paths_manifest import read_paths_manifest
 from conda.gateways.disk.permissions import make_read_only
-from conda.gateways.disk.read import isfile, listdir, yield_lines
-from conda.models.records import PackageRecord
+from conda.gateways.disk.read import compute_sha256sum, isfile, listdir, yield_lines
+from conda.models.records import PackageRecord, PathDataV1, PathsData
 from tests.test_create import make_temp_package_cache
 from conda.common.compat import on_win
 import datetime
 
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
 CHANNEL_DIR = abspath(join(dirname(__file__), '..', 'data', 'conda_format_repo'))
 CONDA_PKG_REPO = url_path(CHANNEL_DIR)
 
@@ -123,6 +130,28 @@ def test_tar_bz2_in_pkg_cache_used_instead_of_conda_pkg():
         assert urls_text[0] == zlib_tar_bz2_prec.url
 
 
+def test_pipelined_fetch_extract_keeps_per_package_rollback():
+    missing_prec = PackageRecord.from_objects(
+        zlib_tar_bz2_prec,
+        build="missing_0",
+        fn="zlib-1.2.11-missing_0.tar.bz2",
+        url="%s/%s/%s" % (CONDA_PKG_REPO, subdir, "zlib-1.2.11-missing_0.tar.bz2"),
+    )
+    with make_temp_package_cache() as pkgs_dir:
+        with env_vars({"CONDA_FETCH_THREADS": "2", "CONDA_EXTRACT_THREADS": "2"},
+                      stack_callback=conda_tests_ctxt_mgmt_def_pol):
+            pfe = ProgressiveFetchExtract((missing_prec, zlib_tar_bz2_prec))
+            with pytest.raises(CondaMultiError) as exc:
+                pfe.execute()
+        assert len(exc.value.errors) == 1
+
+        pkgs_dir_files = listdir(pkgs_dir)
+        assert zlib_tar_bz2_fn in pkgs_dir_files
+        assert isfile(join(pkgs_dir, zlib_base_fn, "info", "repodata_record.json"))
+        assert "zlib-1.2.11-missing_0.tar.bz2" not in pkgs_dir_files
+        assert "zlib-1.2.11-missing_0" not in pkgs_dir_files
+
+
 @pytest.mark.integration
 def test_tar_bz2_in_pkg_cache_doesnt_overwrite_conda_pkg():
     """
@@ -372,3 +401,190 @@ def test_instantiating_package_cache_when_both_tar_bz2_and_conda_exist_read_only
         assert zlib_base_fn not in pkgs_dir_files
         assert zlib_tar_bz2_fn in pkgs_dir_files
         assert zlib_conda_fn in pkgs_dir_files
+
+
+def test_package_cache_index_skips_rescanning_pkgs_dir():
+    with make_temp_package_cache() as pkgs_dir:
+        copy(join(CHANNEL_DIR, subdir, zlib_tar_bz2_fn), join(pkgs_dir, zlib_tar_bz2_fn))
+        pcrecs = tuple(PackageCacheData(pkgs_dir).iter_records())
+        assert [pcrec.fn for pcrec in pcrecs] == [zlib_tar_bz2_fn]
+        assert isfile(join(pkgs_dir, "cache", "cache_index.json"))
+
+        def load_counting_rescans():
+            PackageCacheData._cache_.clear()
+            with patch("conda.core.package_cache_data.listdir", wraps=os.listdir) as mock_listdir:
+                with patch.object(PackageCacheData, "_make_single_record", autospec=True,
+                                  side_effect=PackageCacheData._make_single_record) as mock_make:
+                    pcrecs = tuple(PackageCacheData(pkgs_dir).iter_records())
+            return pcrecs, mock_listdir.call_count, [c[0][1] for c in mock_make.call_args_list]
+
+        # extracting the tarball on first load changed pkgs_dir, so list it once more
+        _, listdir_calls, _ = load_counting_rescans()
+        assert listdir_calls == 1
+        # the listing was indexed within an mtime tick of the last change to pkgs_dir, which
+        #   a later change could share; it is trusted once a listing is indexed a tick later
+        _, listdir_calls, _ = load_counting_rescans()
+        assert listdir_calls == 1
+        st = os.stat(pkgs_dir)
+        os.utime(pkgs_dir, (st.st_atime, st.st_mtime - 10))
+        load_counting_rescans()
+        pcrecs2, listdir_calls, rebuilt = load_counting_rescans()
+        assert pcrecs2 == pcrecs
+        assert pcrecs2[0].extracted_package_dir == pcrecs[0].extracted_package_dir
+        assert (listdir_calls, rebuilt) == (0, [])
+
+        # a changed repodata_record.json invalidates just that entry
+        rr_path = join(pkgs_dir, zlib_base_fn, "info", "repodata_record.json")
+        st = os.stat(rr_path)
+        os.utime(rr_path, (st.st_atime, st.st_mtime + 10))
+        _, listdir_calls, rebuilt = load_counting_rescans()
+        assert (listdir_calls, rebuilt) == (0, [zlib_tar_bz2_fn])
+
+        # entries added to pkgs_dir are found through its mtime
+        copy(join(CHANNEL_DIR, subdir, zlib_conda_fn), join(pkgs_dir, zlib_conda_fn))
+        pcrecs3, listdir_calls, rebuilt = load_counting_rescans()
+        assert listdir_calls == 1
+        assert rebuilt == [zlib_conda_fn]
+        assert len(pcrecs3) == 1
+
+
+def test_evict_least_recently_used_unlinked_packages():
+    with make_temp_package_cache() as pkgs_dir:
+        fns = {}
+        for sd in ("linux-64", "osx-64", "win-64"):
+            fn = next(fn for fn in os.listdir(join(CHANNEL_DIR, sd)) if fn.endswith(".tar.bz2"))
+            copy(join(CHANNEL_DIR, sd, fn), join(pkgs_dir, fn))
+            fns[sd] = fn
+        pcd = PackageCacheData(pkgs_dir)
+        pcrecs = {pcrec.fn: pcrec for pcrec in pcd.iter_records()}
+        assert sorted(pcrecs) == sorted(fns.values())
+
+        # win-64 is the least recently used, but an environment still hard-links its files
+        PackageCacheData.record_usage([pcrecs[fns["win-64"]]], timestamp=100)
+        PackageCacheData.record_usage([pcrecs[fns["linux-64"]]], timestamp=200)
+        PackageCacheData.record_usage([pcrecs[fns["osx-64"]]], timestamp=300)
+        win_extracted_dir = pcrecs[fns["win-64"]].extracted_package_dir
+        os.link(join(win_extracted_dir, "info", "index.json"), join(dirname(pkgs_dir), "linked"))
+
+        assert PackageCacheData.evict_all(0) == ()
+        assert pcd.evict(10 ** 12) == ()
+
+        # just over budget: only the least recently used unlinked package goes
+        PackageCacheData._cache_.clear()
+        pcd = PackageCacheData(pkgs_dir)
+        total_size = sum(pcd._cache_index.extracted_size(pcrec) + pcrec.size
+                         for pcrec in pcd.iter_records())
+
+        # but not while another process is fetching or extracting it
+        with package_cache_lock(pkgs_dir, fns["linux-64"]):
+            with package_cache_lock(pkgs_dir, fns["osx-64"][:-len(".tar.bz2")]):
+                assert pcd.evict(total_size - 1) == ()
+        assert isfile(join(pkgs_dir, fns["linux-64"]))
+
+        evicted = pcd.evict(total_size - 1)
+        assert [pcrec.fn for pcrec in evicted] == [fns["linux-64"]]
+        assert not isfile(join(pkgs_dir, fns["linux-64"]))
+        assert not os.path.isdir(pcrecs[fns["linux-64"]].extracted_package_dir)
+        assert os.path.isdir(win_extracted_dir)
+
+        PackageCacheData._cache_.clear()
+        assert sorted(pcrec.fn for pcrec in PackageCacheData(pkgs_dir).iter_records()) == \
+            sorted((fns["osx-64"], fns["win-64"]))
+
+
+def test_extract_reuses_package_extracted_by_another_process():
+    with make_temp_package_cache() as pkgs_dir:
+        copy(join(CHANNEL_DIR, subdir, zlib_tar_bz2_fn), join(pkgs_dir, zlib_tar_bz2_fn))
+
+        def make_action():
+            return ExtractPackageAction(
+                source_full_path=join(pkgs_dir, zlib_tar_bz2_fn),
+                target_pkgs_dir=pkgs_dir,
+                target_extracted_dirname=zlib_base_fn,
+                record_or_spec=zlib_tar_bz2_prec,
+                sha256=zlib_tar_bz2_prec.sha256,
+                size=zlib_tar_bz2_prec.size,
+                md5=zlib_tar_bz2_prec.md5,
+            )
+
+        extracted_dir = join(pkgs_dir, zlib_base_fn)
+        make_action().execute()
+        assert isfile(join(extracted_dir, "info", "repodata_record.json"))
+        with open(join(extracted_dir, "info", "paths.json")) as fh:
+            paths_json = json.load(fh)
+        assert read_paths_manifest(extracted_dir) == PathsData(
+            paths_version=1,
+            paths=(PathDataV1(**f) for f in paths_json["paths"]),
+        )
+        assert not any(fn.endswith(CONDA_TEMP_EXTENSION) for fn in listdir(pkgs_dir))
+
+        # a second process that planned the same extraction finds the finished directory
+        #   once it holds the lock, and leaves it alone on rollback
+        second = make_action()
+        with patch("conda.core.path_actions.extract_tarball") as extract_tarball:
+            second.execute()
+        assert not extract_tarball.called
+        second.reverse()
+        assert isfile(join(extracted_dir, "info", "repodata_record.json"))
+
+        PackageCacheData._cache_.clear()
+        pcrec = next(PackageCacheData(pkgs_dir).query(zlib_tar_bz2_prec))
+        assert pcrec.extracted_package_dir == extracted_dir
+
+
+def test_cache_url_reuses_tarball_fetched_by_another_process():
+    with make_temp_package_cache() as pkgs_dir:
+        copy(join(CHANNEL_DIR, subdir, zlib_tar_bz2_fn), join(pkgs_dir, zlib_tar_bz2_fn))
+        cache_axn = CacheUrlAction(
+            url=zlib_tar_bz2_prec.url,
+            target_pkgs_dir=pkgs_dir,
+            target_package_basename=zlib_tar_bz2_fn,
+            sha256=zlib_tar_bz2_prec.sha256,
+            size=zlib_tar_bz2_prec.size,
+        )
+        with patch.object(CacheUrlAction, "_execute_local") as execute_local:
+            cache_axn.execute()
+        assert not execute_local.called
+        assert isfile(join(pkgs_dir, zlib_tar_bz2_fn))
+
+        # a tarball that doesn't match is still replaced
+        cache_axn.sha256 = "0" * 64
+        with patch.object(CacheUrlAction, "_execute_local") as execute_local:
+            cache_axn.execute()
+        assert execute_local.called
+        assert isfile(cache_axn.hold_path)
+        cache_axn.reverse()
+        assert isfile(join(pkgs_dir, zlib_tar_bz2_fn))
+
+
+def test_cache_url_reverse_keeps_tarball_fetched_by_another_process():
+    with make_temp_package_cache() as pkgs_dir:
+        tarball = join(pkgs_dir, zlib_tar_bz2_fn)
+        with open(tarball, "w") as fh:
+            fh.write("stale")
+
+        def make_action():
+            return CacheUrlAction(
+                url=zlib_tar_bz2_prec.url,
+                target_pkgs_dir=pkgs_dir,
+                target_package_basename=zlib_tar_bz2_fn,
+                sha256=zlib_tar_bz2_prec.sha256,
+                size=zlib_tar_bz2_prec.size,
+            )
+
+        first, second = make_action(), make_action()
+        assert first.hold_path != second.hold_path
+        with patch.object(CacheUrlAction, "_execute_local") as execute_local:
+            first.execute()
+        assert execute_local.called
+        assert isfile(first.hold_path)
+
+        # a second process fetches the package, then the first one rolls back
+        second.execute()
+        assert isfile(first.hold_path)
+        first.reverse()
+        assert not isfile(first.hold_path)
+        assert compute_sha256sum(tarball) == zlib_tar_bz2_prec.sha256
+        second.cleanup()
+        assert compute_sha256sum(tarball) == zlib_tar_bz2_prec.sha256
+        assert not any(fn.endswith(CONDA_TEMP_EXTENSION) for fn in listdir(pkgs_dir))
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import json
 from logging import getLogger
 from os.path import basename, dirname, isdir, isfile, join, lexists, getsize
 import sys
@@ -17,7 +18,8 @@ from conda.common.compat import PY2, on_win
 from conda.common.path import get_bin_directory_short_path, get_python_noarch_target_path, \
     get_python_short_path, get_python_site_packages_short_path, parse_entry_point_def, pyc_path, \
     win_path_ok
-from conda.core.path_actions import CompileMultiPycAction, CreatePythonEntryPointAction, LinkPathAction
+from conda.core.path_actions import CompileMultiPycAction, CreatePrefixRecordAction, \
+    CreatePythonEntryPointAction, LinkPathAction
 from conda.exceptions import ParseError
 from conda.gateways.disk.create import create_link, mkdir_p
 from conda.gateways.disk.delete import rm_rf
@@ -27,7 +29,7 @@ from conda.gateways.disk.read import compute_md5sum, compute_sha256sum
 from conda.gateways.disk.test import softlink_supported
 from conda.gateways.disk.update import touch
 from conda.models.enums import LinkType, NoarchType, PathType
-from conda.models.records import PathDataV1
+from conda.models.records import PackageRecord, PathDataV1, PrefixRecord
 
 log = getLogger(__name__)
 
@@ -360,6 +362,30 @@ class PathActionsTests(TestCase):
         axn.reverse()
         assert not lexists(axn.target_full_path)
 
+    def test_CreatePrefixRecordAction_records_reflink_as_copy(self):
+        # conda versions without LinkType.reflink must still be able to read the record
+        extracted_package_dir = join(self.pkgs_dir, 'reflinked-1.0-0')
+        package_info = AttrDict(
+            repodata_record=PackageRecord(name='reflinked', version='1.0', build='0',
+                                          build_number=0, channel='defaults',
+                                          subdir=context.subdir, fn='reflinked-1.0-0.tar.bz2'),
+            package_metadata=None,
+            extracted_package_dir=extracted_package_dir,
+            package_tarball_full_path=extracted_package_dir + '.tar.bz2',
+            url=None,
+        )
+        touch(join(self.prefix, 'conda-meta', 'history'), mkdir=True)
+        axn, = CreatePrefixRecordAction.create_actions({}, package_info, self.prefix,
+                                                       LinkType.reflink, 'reflinked', ())
+        axn.execute()
+        with open(axn.target_full_path) as fh:
+            record = json.load(fh)
+        assert record['link'] == {'source': extracted_package_dir, 'type': LinkType.copy.value}
+        assert PrefixRecord(**record).link.type == LinkType.copy
+
+        axn.reverse()
+        assert not lexists(axn.target_full_path)
+
     # @pytest.mark.skipif(on_win, reason="unix-only test")
     # def test_CreateApplicationSoftlinkAction_basic_symlink_unix(self):
     #     from conda.core.path_actions import CreateApplicationSoftlinkAction
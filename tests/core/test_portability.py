@@ -1,12 +1,19 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function, unicode_literals
 
-from conda.core.portability import SHEBANG_REGEX, replace_long_shebang
+from conda.common.compat import on_win
+from conda.core.portability import (SHEBANG_REGEX, _PaddingError, binary_replace,
+                                    replace_long_shebang, update_prefix)
+from conda.gateways.disk.create import TemporaryDirectory
 from conda.models.enums import FileMode
 from logging import getLogger
+import os
+from os.path import join
 import re
 from unittest import TestCase
 
+import pytest
+
 log = getLogger(__name__)
 
 
@@ -76,3 +83,52 @@ class ReplaceShebangTests(TestCase):
         new_shebang = b"#!/usr/bin/env escaped\\ space --and --flags -x"
         new_expected_data = b'\n'.join((new_shebang, content_line, content_line, content_line))
         assert new_expected_data == new_data
+
+
+@pytest.mark.skipif(on_win, reason="binary prefix replacement is only done on unix")
+class UpdatePrefixBinaryTests(TestCase):
+
+    placeholder = '/opt/anaconda1anaconda2anaconda3'
+
+    def _update_prefix(self, data, new_prefix):
+        with TemporaryDirectory() as td:
+            path = join(td, 'libfoo.so')
+            with open(path, 'wb') as fh:
+                fh.write(data)
+            os.utime(path, (0, 0))
+            update_prefix(path, new_prefix, self.placeholder, FileMode.binary)
+            with open(path, 'rb') as fh:
+                return fh.read(), os.stat(path).st_mtime
+
+    def test_update_prefix_matches_binary_replace(self):
+        a = self.placeholder.encode('utf-8')
+        data = (b'\x7fELF' + b'\x01' * 5000 + a + b'/lib:' + a + b'/lib64\x00tail' +
+                b'\x00' * 5000 + a + b'\x00' + a)
+        new_data, _ = self._update_prefix(data, '/usr/local/env')
+        assert len(new_data) == len(data)
+        assert new_data == binary_replace(data, a, b'/usr/local/env')
+        assert b'/usr/local/env/lib:/usr/local/env/lib64\x00' in new_data
+        # a placeholder without a terminating null character is left alone
+        assert new_data.endswith(b'\x00' + a)
+
+    def test_update_prefix_leaves_unchanged_files_alone(self):
+        data = b'\x7fELF' + b'\x00' * 100
+        new_data, mtime = self._update_prefix(data, '/usr/local/env')
+        assert new_data == data
+        assert mtime == 0
+
+        new_data, mtime = self._update_prefix(b'', '/usr/local/env')
+        assert new_data == b''
+
+    def test_padding_error_leaves_file_untouched(self):
+        a = self.placeholder.encode('utf-8')
+        # the first string fits, the second doesn't
+        data = b'short ' + a + b'\x00' + a + a + b'\x00'
+        with TemporaryDirectory() as td:
+            path = join(td, 'libfoo.so')
+            with open(path, 'wb') as fh:
+                fh.write(data)
+            with pytest.raises(_PaddingError):
+                update_prefix(path, '/' + 'x' * 40, self.placeholder, FileMode.binary)
+            with open(path, 'rb') as fh:
+                assert fh.read() == data
@@ -4,17 +4,22 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 from contextlib import contextmanager
-from os.path import isdir, join, lexists
+import json
+from os.path import isdir, isfile, join, lexists
 from tempfile import gettempdir
 from unittest import TestCase
 from uuid import uuid4
 
 from conda.common.compat import on_win, odict
 from conda.core.prefix_data import PrefixData, get_conda_anchor_files_and_records
+from conda.models.records import PrefixRecord
 from test_data.env_metadata import (
     PATH_TEST_ENV_1, PATH_TEST_ENV_2, PATH_TEST_ENV_3, PATH_TEST_ENV_4,
 )
-from conda.base.constants import PREFIX_STATE_FILE
+from conda.base.constants import (
+    PREFIX_MAGIC_FILE, PREFIX_RECORDS_INDEX_FILE, PREFIX_SITE_PACKAGES_INDEX_FILE,
+    PREFIX_STATE_FILE,
+)
 from conda.gateways.disk import mkdir_p
 from conda.gateways.disk.delete import rm_rf
 
@@ -50,9 +55,13 @@ def set_on_win(val):
     win_path_ok_saved_1 = conda.core.prefix_data.win_path_ok
     win_path_ok_saved_2 = conda.common.pkg_formats.python.win_path_ok
     rm_rf_saved = conda.core.prefix_data.rm_rf
+    save_records_index_saved = conda.core.prefix_data.PrefixRecordsIndex.save
+    save_site_packages_index_saved = conda.core.prefix_data.SitePackagesIndex.save
     try:
         conda.common.path.on_win = val
         conda.core.prefix_data.rm_rf = lambda x: None
+        conda.core.prefix_data.PrefixRecordsIndex.save = lambda self: None
+        conda.core.prefix_data.SitePackagesIndex.save = lambda self: None
         if val and not on_win:
             conda.core.prefix_data.win_path_ok = lambda x: x
             conda.common.pkg_formats.python.win_path_ok = lambda x: x
@@ -62,6 +71,8 @@ def set_on_win(val):
         conda.core.prefix_data.win_path_ok = win_path_ok_saved_1
         conda.common.pkg_formats.python.win_path_ok = win_path_ok_saved_2
         conda.core.prefix_data.rm_rf = rm_rf_saved
+        conda.core.prefix_data.PrefixRecordsIndex.save = save_records_index_saved
+        conda.core.prefix_data.SitePackagesIndex.save = save_site_packages_index_saved
 
 
 def test_pip_interop_windows():
@@ -236,4 +247,151 @@ class PrefixDatarUnitTests(TestCase):
         }
         self.pd.unset_environment_env_vars(['WOAH'])
         env_vars = self.pd.get_environment_env_vars()
-        assert env_vars_one == env_vars
\ No newline at end of file
+        assert env_vars_one == env_vars
+
+    def test_path_owners(self):
+        def prefix_record(name, files):
+            return PrefixRecord(name=name, version='1.0', build='0', build_number=0,
+                                channel='test', subdir='noarch', fn='%s-1.0-0.tar.bz2' % name,
+                                files=files)
+
+        # remove() only deletes conda-meta records from a writable prefix
+        open(join(self.prefix, PREFIX_MAGIC_FILE), 'a').close()
+        assert self.pd.path_owners('bin/a') == ()
+        self.pd.insert(prefix_record('pkg-a', ['bin/a', 'lib/shared']))
+        assert self.pd.path_owners('bin/a') == (self.pd.get('pkg-a'),)
+
+        # inserted after the index was built
+        self.pd.insert(prefix_record('pkg-b', ['bin/b', 'lib/shared']))
+        assert self.pd.path_owners('bin/b') == (self.pd.get('pkg-b'),)
+        assert set(rec.name for rec in self.pd.path_owners('lib/shared')) == {'pkg-a', 'pkg-b'}
+
+        self.pd.remove('pkg-a')
+        assert self.pd.path_owners('bin/a') == ()
+        assert self.pd.path_owners('lib/shared') == (self.pd.get('pkg-b'),)
+
+        # rebuilt from conda-meta on reload
+        self.pd.reload()
+        assert self.pd.path_owners('bin/b') == (self.pd.get('pkg-b'),)
+        assert self.pd.path_owners('bin/a') == ()
+
+    def test_deferred_fields_and_records_index(self):
+        open(join(self.prefix, PREFIX_MAGIC_FILE), 'a').close()
+        paths = [{'_path': 'bin/tool', 'path_type': 'hardlink', 'sha256': 'c' * 64,
+                  'size_in_bytes': 3}]
+        self.pd.insert(PrefixRecord(name='tool', version='1.0', build='0', build_number=0,
+                                    channel='test', subdir='noarch', fn='tool-1.0-0.tar.bz2',
+                                    files=['bin/tool'],
+                                    paths_data={'paths_version': 1, 'paths': paths}))
+        full_dump = self.pd.get('tool').dump()
+        records_index_path = join(self.prefix, PREFIX_RECORDS_INDEX_FILE)
+
+        def loaded_record():
+            PrefixData._cache_.pop(self.prefix, None)
+            return PrefixData(self.prefix).get('tool')
+
+        # the first load parses the json file and writes the index
+        prefix_record = loaded_record()
+        assert not prefix_record.deferred_fields_loaded
+        assert isfile(records_index_path)
+        assert prefix_record.files == ('bin/tool',)
+        assert 'paths_data' not in prefix_record.__dict__
+        assert prefix_record.dump() == full_dump
+        assert prefix_record.deferred_fields_loaded
+
+        # later loads take the record from the index, and only read its json file on demand
+        with open(records_index_path) as fh:
+            records_index = json.load(fh)
+        assert 'files' not in records_index['entries']['tool-1.0-0.json'][1]
+        prefix_record = loaded_record()
+        assert prefix_record.name == 'tool'
+        assert not prefix_record.deferred_fields_loaded
+        assert prefix_record.paths_data.paths[0].path == 'bin/tool'
+        assert prefix_record.dump() == full_dump
+
+        # a rewritten record invalidates its entry
+        record_json_path = join(self.prefix, 'conda-meta', 'tool-1.0-0.json')
+        with open(record_json_path) as fh:
+            json_data = json.load(fh)
+        json_data['files'].append('bin/tool-extra')
+        json_data['depends'] = ['python']
+        with open(record_json_path, 'w') as fh:
+            json.dump(json_data, fh)
+        prefix_record = loaded_record()
+        assert prefix_record.depends == ('python',)
+        assert prefix_record.files == ('bin/tool', 'bin/tool-extra')
+
+        # and records removed from conda-meta are dropped from it
+        PrefixData(self.prefix).remove('tool')
+        PrefixData._cache_.pop(self.prefix, None)
+        assert PrefixData(self.prefix).get('tool', None) is None
+        with open(records_index_path) as fh:
+            assert json.load(fh)['entries'] == {}
+
+    def test_site_packages_index(self):
+        import conda.core.prefix_data
+
+        open(join(self.prefix, PREFIX_MAGIC_FILE), 'a').close()
+        site_packages = 'lib/python3.7/site-packages'
+        mkdir_p(join(self.prefix, site_packages))
+        self.pd.insert(PrefixRecord(name='python', version='3.7.3', build='0', build_number=0,
+                                    channel='test', subdir='noarch', fn='python-3.7.3-0.tar.bz2',
+                                    files=['bin/python3.7']))
+
+        def write_dist_info(name, version):
+            dist_info = join(self.prefix, site_packages, '%s-1.0.dist-info' % name)
+            mkdir_p(dist_info)
+            with open(join(dist_info, 'METADATA'), 'w') as fh:
+                fh.write('Metadata-Version: 2.1\nName: %s\nVersion: %s\n' % (name, version))
+            with open(join(dist_info, 'RECORD'), 'w') as fh:
+                fh.write('%s/__init__.py,sha256=AAAA,12\n%s-1.0.dist-info/RECORD,,\n'
+                         % (name, name))
+            return dist_info
+
+        write_dist_info('spam', '1.0')
+        eggs_dist_info = write_dist_info('eggs', '1.0')
+
+        read_python_record = conda.core.prefix_data.read_python_record
+        parsed = []
+
+        def load():
+            PrefixData._cache_.pop(self.prefix, None)
+            prefix_data = PrefixData(self.prefix, pip_interop_enabled=True)
+            return {rec.name: rec for rec in prefix_data.iter_records()}
+
+        def counting_read_python_record(prefix_path, anchor_file, python_version):
+            parsed.append(anchor_file.split('/')[-2])
+            return read_python_record(prefix_path, anchor_file, python_version)
+
+        conda.core.prefix_data.read_python_record = counting_read_python_record
+        try:
+            records = load()
+            assert sorted(parsed) == ['eggs-1.0.dist-info', 'spam-1.0.dist-info']
+            assert isfile(join(self.prefix, PREFIX_SITE_PACKAGES_INDEX_FILE))
+            spam_dump = records['spam'].dump()
+
+            # unchanged distributions come from the index, and are only parsed for their files
+            del parsed[:]
+            records = load()
+            assert parsed == []
+            assert records['spam'].version == '1.0'
+            assert not records['spam'].deferred_fields_loaded
+            assert '%s/spam/__init__.py' % site_packages in records['spam'].files
+            assert parsed == ['spam-1.0.dist-info']
+            assert records['spam'].dump() == spam_dump
+
+            # changed metadata is parsed again, and removed distributions are dropped
+            write_dist_info('spam', '1.1')
+            rm_rf(eggs_dist_info)
+            del parsed[:]
+            records = load()
+            assert parsed == ['spam-1.0.dist-info']
+            assert records['spam'].version == '1.1'
+            assert 'eggs' not in records
+            with open(join(self.prefix, PREFIX_SITE_PACKAGES_INDEX_FILE)) as fh:
+                site_packages_index = json.load(fh)
+            assert list(site_packages_index['python_records']) == [
+                '%s/spam-1.0.dist-info/RECORD' % site_packages
+            ]
+        finally:
+            conda.core.prefix_data.read_python_record = read_python_record
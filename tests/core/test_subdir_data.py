@@ -1,20 +1,37 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import bz2
+from copy import deepcopy
+from errno import ENOSPC
+import json
 from logging import getLogger
+import os
 from os.path import dirname, join
+from threading import Thread
 from unittest import TestCase
 
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:  # pragma: no cover
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
 import pytest
 
+from conda import CondaError
 from conda.base.context import context, conda_tests_ctxt_mgmt_def_pol
 from conda.common.compat import iteritems
 from conda.common.disk import temporary_content_in_file
 from conda.common.io import env_var
+from conda.common.url import path_to_url
 from conda.core.index import get_index
 from conda.core.subdir_data import Response304ContentUnchanged, cache_fn_url, read_mod_and_etag, \
-    SubdirData, fetch_repodata_remote_request, UnavailableInvalidChannel
-from conda.models.channel import Channel
+    SubdirData, fetch_repodata_remote_request, UnavailableInvalidChannel, write_raw_repodata
+from conda.gateways.disk import mkdir_p
+from conda.gateways.disk.create import TemporaryDirectory
+from conda.gateways.repodata.columnar import write_columnar_cache
+from conda.gateways.repodata.delta import make_repodata_delta
+from conda.models.channel import Channel, all_channel_urls
 
 try:
     from unittest.mock import patch
@@ -189,6 +206,69 @@ class FetchLocalRepodataTests(TestCase):
         with pytest.raises(UnavailableInvalidChannel):
             result = fetch_repodata_remote_request(url, etag, mod_stamp)
 
+    def test_fetch_repodata_streams_bz2_to_cache_path(self):
+        repodata = {"info": {"subdir": "linux-64"},
+                    "packages": {"a-1-0.tar.bz2": {"name": "a", "version": "1"}}}
+        with TemporaryDirectory() as tmpdir:
+            with open(join(tmpdir, "repodata.json.bz2"), "wb") as fh:
+                fh.write(bz2.compress(json.dumps(repodata).encode("utf-8")))
+            url = path_to_url(tmpdir)
+            cache_path = join(tmpdir, "cache.json")
+            result = fetch_repodata_remote_request(url, None, None, "repodata.json.bz2",
+                                                   cache_path=cache_path)
+            assert result == cache_path
+            with open(cache_path) as fh:
+                cached = json.load(fh)
+            assert cached.pop("_url") == url
+            assert cached.pop("_mod") == read_mod_and_etag(cache_path)["_mod"]
+            assert cached == repodata
+
+            # an empty document only carries the saved header fields
+            with open(join(tmpdir, "repodata.json.bz2"), "wb") as fh:
+                fh.write(bz2.compress(b" { }\n"))
+            fetch_repodata_remote_request(url, None, None, "repodata.json.bz2",
+                                          cache_path=cache_path)
+            with open(cache_path) as fh:
+                assert sorted(json.load(fh)) == ["_mod", "_url"]
+
+    def test_fetch_repodata_negotiates_zstd(self):
+        zstandard = pytest.importorskip("zstandard")
+        body = json.dumps({"packages": {"a-1-0.tar.bz2": {"name": "a"}}}).encode("utf-8")
+
+        class ZstdHandler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                assert "zstd" in self.headers.get("Accept-Encoding")
+                payload = zstandard.ZstdCompressor().compress(body)
+                self.send_response(200)
+                self.send_header("Content-Encoding", "zstd")
+                self.send_header("Content-Length", str(len(payload)))
+                self.send_header("Etag", '"abc"')
+                self.end_headers()
+                self.wfile.write(payload)
+
+        server = HTTPServer(("127.0.0.1", 0), ZstdHandler)
+        server_thread = Thread(target=server.serve_forever)
+        server_thread.daemon = True
+        server_thread.start()
+        try:
+            url = "http://127.0.0.1:%d/linux-64" % server.server_address[1]
+            with TemporaryDirectory() as tmpdir:
+                cache_path = join(tmpdir, "cache.json")
+                fetch_repodata_remote_request(url, None, None, cache_path=cache_path)
+                with open(cache_path) as fh:
+                    cached = json.load(fh)
+            assert cached["_etag"] == '"abc"'
+            assert cached["packages"] == {"a-1-0.tar.bz2": {"name": "a"}}
+
+            raw_repodata_str = fetch_repodata_remote_request(url, None, None)
+            assert json.loads(raw_repodata_str)["packages"] == cached["packages"]
+        finally:
+            server.shutdown()
+            server.server_close()
+
 
 def test_subdir_data_prefers_conda_to_tar_bz2():
     channel = Channel(join(dirname(__file__), "..", "data", "conda_format_repo", context.subdir))
@@ -220,3 +300,277 @@ def test_use_only_tar_bz2():
 #         sd.load()
 #         print(sd._names_index.keys())
 #         assert 0
+
+
+def test_subdir_data_columnar_cache():
+    channel = Channel(join(dirname(__file__), "..", "data", "conda_format_repo", context.subdir))
+    with env_var('CONDA_USE_ONLY_TAR_BZ2', False, stack_callback=conda_tests_ctxt_mgmt_def_pol):
+        sd = SubdirData(channel)
+        eager_precs = tuple(sd.iter_records())
+
+        sd2 = SubdirData(channel)
+        mod_etag_headers = read_mod_and_etag(sd2.cache_path_json)
+        state = sd2._read_columnar_cache(mod_etag_headers.get('_etag'),
+                                         mod_etag_headers.get('_mod'))
+        assert state is not None
+        assert state['_schannel'] == channel.canonical_name
+        lazy_precs = state['_package_records']
+        assert not any(lazy_precs._records)
+        assert tuple(state['_names_index']['zlib']) == tuple(sd.query('zlib'))
+        assert state['_names_index']['not-a-package'] == []
+        assert tuple(lazy_precs) == eager_precs
+        assert all(p1.dump() == p2.dump() for p1, p2 in zip(lazy_precs, eager_precs))
+
+    with env_var('CONDA_USE_ONLY_TAR_BZ2', True, stack_callback=conda_tests_ctxt_mgmt_def_pol):
+        # the cached state is only valid for the settings it was written with
+        assert SubdirData(channel)._read_columnar_cache(mod_etag_headers.get('_etag'),
+                                                        mod_etag_headers.get('_mod')) is None
+
+
+def test_process_raw_repodata_str_is_lazy():
+    channel = Channel('https://conda.anaconda.org/lazy-test/%s' % context.subdir)
+    repodata = {
+        "info": {"subdir": context.subdir},
+        "packages": {
+            "numpy-1.16.4-py37_0.tar.bz2": {
+                "name": "numpy", "version": "1.16.4", "build": "py37_0", "build_number": 0,
+                "depends": ["python 3.7.*"],
+            },
+            "python-3.7.3-0.tar.bz2": {
+                "name": "python", "version": "3.7.3", "build": "0", "build_number": 0,
+                "depends": [], "track_features": "debug",
+            },
+        },
+    }
+    sd = SubdirData(channel)
+    with env_var("CONDA_ADD_PIP_AS_PYTHON_DEPENDENCY", "false", stack_callback=conda_tests_ctxt_mgmt_def_pol):
+        sd._process_raw_repodata_str(json.dumps(repodata))
+    sd._loaded = True
+    assert not any(sd._package_records._records)
+
+    numpy, = sd.query("numpy")
+    assert numpy.url == "https://conda.anaconda.org/lazy-test/%s/numpy-1.16.4-py37_0.tar.bz2" % context.subdir
+    assert numpy.channel == channel
+    assert sum(1 for prec in sd._package_records._records if prec) == 1
+
+    python, = sd._track_features_index["debug"]
+    assert python.name == "python"
+    assert len(tuple(sd.iter_records())) == 2
+
+
+def test_read_cached_json_streams_records():
+    channel = Channel('https://conda.anaconda.org/stream-test/%s' % context.subdir)
+    a = {"name": "a", "version": "1", "build": "0", "build_number": 0, "depends": []}
+    # packages.conda ahead of packages, so each .conda record is parsed before its .tar.bz2
+    raw = ('{"_etag": "\\"abc\\"", "packages.conda": {"a-1-0.conda": %s}, '
+           '"packages": {"a-1-0.tar.bz2": %s, "a-2-0.tar.bz2": %s}, "info": {"subdir": "%s"}}'
+           % (json.dumps(dict(a, md5="c")), json.dumps(dict(a, md5="t", size=3)),
+              json.dumps(dict(a, version="2")), context.subdir))
+    with TemporaryDirectory() as td:
+        with env_var('CONDA_PKGS_DIRS', td, stack_callback=conda_tests_ctxt_mgmt_def_pol):
+            sd = SubdirData(channel)
+            mkdir_p(dirname(sd.cache_path_json))
+            with open(sd.cache_path_json, 'w') as fh:
+                fh.write(raw)
+            with patch('conda.core.subdir_data.json.loads') as loads:
+                _internal_state = sd._read_cached_json()
+                assert loads.call_count == 0
+            assert _internal_state['_etag'] == '"abc"'
+            sd._set_internal_state(_internal_state)
+            assert sorted(prec.fn for prec in sd.query("a")) == ["a-1-0.conda", "a-2-0.tar.bz2"]
+            conda_prec, = sd.query("a=1")
+            assert conda_prec.md5 == "c"
+            assert conda_prec.legacy_bz2_md5 == "t"
+            assert conda_prec.legacy_bz2_size == 3
+
+            with open(sd.cache_path_json, 'w') as fh:
+                fh.write(raw[:-10])
+            with pytest.raises(CondaError):
+                sd._read_cached_json()
+
+
+def test_write_raw_repodata():
+    saved_fields = {"_url": "https://conda.anaconda.org/conda-test/linux-64", "_etag": '"abc"'}
+    with TemporaryDirectory() as td:
+        cache_path = join(td, "repodata.json")
+
+        write_raw_repodata(cache_path, saved_fields, [b' {"info"', b': {}, "packages": {}}'])
+        with open(cache_path) as fh:
+            assert json.load(fh) == dict(saved_fields, info={}, packages={})
+        assert read_mod_and_etag(cache_path)["_etag"] == '"abc"'
+
+        write_raw_repodata(cache_path, saved_fields, [b'{', b' ', b'}'])
+        with open(cache_path) as fh:
+            assert json.load(fh) == saved_fields
+
+        # not a bare object; merged through json rather than spliced
+        write_raw_repodata(cache_path, saved_fields, [b'\xef\xbb\xbf{"packages": {}}'])
+        with open(cache_path) as fh:
+            assert json.load(fh) == dict(saved_fields, packages={})
+
+        with pytest.raises(ValueError):
+            write_raw_repodata(cache_path, saved_fields, [b'[]'])
+        with open(cache_path) as fh:
+            assert json.load(fh) == dict(saved_fields, packages={})
+
+
+def test_subdir_data_applies_repodata_deltas():
+    def write_json(path, obj):
+        with open(path, 'w') as fh:
+            json.dump(obj, fh)
+
+    with TemporaryDirectory() as channel_dir:
+        subdir_dir = join(channel_dir, context.subdir)
+        mkdir_p(subdir_dir)
+        v1 = {
+            "info": {"subdir": context.subdir},
+            "packages": {
+                "a-1-0.tar.bz2": {"name": "a", "version": "1", "build": "0", "build_number": 0,
+                                  "depends": []},
+            },
+        }
+        v2 = deepcopy(v1)
+        v2["packages"]["a-2-0.tar.bz2"] = {"name": "a", "version": "2", "build": "0",
+                                           "build_number": 0, "depends": ["b"]}
+        write_json(join(subdir_dir, "repodata.json"), v1)
+        channel = Channel(subdir_dir)
+
+        with env_var('CONDA_USE_REPODATA_DELTAS', 'true', stack_callback=conda_tests_ctxt_mgmt_def_pol):
+            sd = SubdirData(channel)
+            assert [prec.version for prec in sd.query("a")] == ["1"]
+            cached_mod = read_mod_and_etag(sd.cache_path_json)["_mod"]
+
+            write_json(join(subdir_dir, "repodata.delta.json"), {
+                "latest": {"_mod": "Tue, 15 Oct 2019 12:00:00 GMT"},
+                "deltas": [make_repodata_delta(v1, v2, {"_mod": cached_mod},
+                                               {"_mod": "Tue, 15 Oct 2019 12:00:00 GMT"})],
+            })
+            with patch('conda.core.subdir_data.fetch_repodata_remote_request') as remote_request:
+                sd2 = SubdirData(channel)
+                assert sorted(prec.version for prec in sd2.query("a")) == ["1", "2"]
+                assert remote_request.call_count == 0
+            assert read_mod_and_etag(sd2.cache_path_json)["_mod"] == "Tue, 15 Oct 2019 12:00:00 GMT"
+            with open(sd2.cache_path_json) as fh:
+                assert "a-2-0.tar.bz2" in json.load(fh)["packages"]
+
+            # our state is no longer in the chain; fall back to a full fetch
+            write_json(join(subdir_dir, "repodata.delta.json"), {"latest": {"_mod": "other"}})
+            sd3 = SubdirData(channel)
+            assert [prec.version for prec in sd3.query("a")] == ["1"]
+
+
+def test_subdir_data_repodata_deltas_patch_the_cache():
+    def record(name, version, depends=()):
+        return {"name": name, "version": version, "build": "0", "build_number": 0,
+                "depends": list(depends), "md5": "%s-%s" % (name, version), "size": 1}
+
+    def write_json(path, obj):
+        with open(path, 'w') as fh:
+            json.dump(obj, fh)
+
+    def dumped_records(sd):
+        return [prec.dump() for prec in sd.iter_records()]
+
+    v1 = {
+        "info": {"subdir": context.subdir},
+        "packages": {
+            "a-1-0.tar.bz2": record("a", "1"),
+            "b-1-0.tar.bz2": record("b", "1"),
+            "c-1-0.tar.bz2": record("c", "1"),
+            "python-3.7-0.tar.bz2": record("python", "3.7"),
+        },
+        "packages.conda": {
+            "a-1-0.conda": record("a", "1"),
+            "b-1-0.conda": record("b", "1"),
+            "d-1-0.conda": record("d", "1"),
+        },
+    }
+    v2 = deepcopy(v1)
+    # the .tar.bz2 of a comes back, b's legacy fields change, c is replaced in place
+    del v2["packages.conda"]["a-1-0.conda"]
+    v2["packages"]["b-1-0.tar.bz2"]["md5"] = "b-1-rebuilt"
+    v2["packages"]["c-1-0.tar.bz2"] = record("c", "1", depends=["d"])
+    v2["packages.conda"]["e-1-0.conda"] = record("e", "1")
+    v2["packages"]["e-1-0.tar.bz2"] = record("e", "1")
+
+    with TemporaryDirectory() as channel_dir:
+        subdir_dir = join(channel_dir, context.subdir)
+        mkdir_p(subdir_dir)
+        write_json(join(subdir_dir, "repodata.json"), v1)
+        channel = Channel(subdir_dir)
+
+        with env_var('CONDA_USE_REPODATA_DELTAS', 'true', stack_callback=conda_tests_ctxt_mgmt_def_pol):
+            sd = SubdirData(channel)
+            sd.load()
+            cached_mod = read_mod_and_etag(sd.cache_path_json)["_mod"]
+            new_mod = "Tue, 15 Oct 2019 12:00:00 GMT"
+            write_json(join(subdir_dir, "repodata.delta.json"), {
+                "latest": {"_mod": new_mod},
+                "deltas": [make_repodata_delta(v1, v2, {"_mod": cached_mod}, {"_mod": new_mod})],
+            })
+
+            # a rewrite that fails part way leaves the cached repodata as it was
+            def failing_patch(fh, out, delta):
+                out.write('{"_mod": "%s", "packages": {' % new_mod)
+                raise IOError(ENOSPC, "No space left on device")
+                yield
+
+            with open(sd.cache_path_json) as fh:
+                cached = fh.read()
+            with patch('conda.core.subdir_data.patch_repodata', failing_patch):
+                with pytest.raises(IOError):
+                    SubdirData(channel).load()
+            with open(sd.cache_path_json) as fh:
+                assert fh.read() == cached
+
+            with patch('conda.core.subdir_data.fetch_repodata_remote_request') as remote_request, \
+                    patch('conda.core.subdir_data.write_columnar_cache',
+                          wraps=write_columnar_cache) as write_cache:
+                sd2 = SubdirData(channel).load()
+                assert remote_request.call_count == 0
+            # only the records the delta touches are encoded again
+            source_positions = write_cache.call_args[1]["source_positions"]
+            copied = [info["fn"] for info, position in
+                      zip(write_cache.call_args[0][2], source_positions) if position is not None]
+            assert sorted(copied) == ["d-1-0.conda", "python-3.7-0.tar.bz2"]
+
+            with open(sd2.cache_path_json) as fh:
+                patched = json.load(fh)
+            assert patched == dict(v2, _mod=new_mod, _url=sd.url_w_credentials)
+            assert list(patched)[0] == "_mod"
+            assert read_mod_and_etag(sd2.cache_path_json)["_mod"] == new_mod
+            assert not [fn for fn in os.listdir(dirname(sd2.cache_path_json))
+                        if fn.endswith(".tmp")]
+
+            # the same records, in the same order, as parsing the patched repodata afresh
+            fresh = SubdirData(channel)
+            fresh._set_internal_state(fresh._process_raw_repodata(patched))
+            expected = dumped_records(fresh)
+            assert dumped_records(sd2) == expected
+            assert [prec["fn"] for prec in expected] == [
+                "b-1-0.conda", "d-1-0.conda", "e-1-0.conda", "a-1-0.tar.bz2", "c-1-0.tar.bz2",
+                "python-3.7-0.tar.bz2",
+            ]
+            b = next(prec for prec in expected if prec["name"] == "b")
+            assert b["legacy_bz2_md5"] == "b-1-rebuilt"
+            python = next(prec for prec in expected if prec["name"] == "python")
+            assert "pip" in python["depends"]
+            sd3 = SubdirData(channel)
+            sd3._set_internal_state(sd3._read_columnar_cache(None, new_mod))
+            assert dumped_records(sd3) == expected
+
+
+def test_subdir_data_load_all_in_processes():
+    channel = Channel(join(dirname(__file__), "..", "data", "conda_format_repo"))
+    subdirs = (context.subdir, "noarch")
+    expected = SubdirData.query_all("zlib", channels=[channel], subdirs=subdirs)
+    assert expected
+
+    with env_var('CONDA_REPODATA_PROCESSES', '2', stack_callback=conda_tests_ctxt_mgmt_def_pol):
+        subdir_datas = [SubdirData(Channel(url)) for url in
+                        all_channel_urls([channel], subdirs=subdirs)]
+        SubdirData._load_all_in_processes(subdir_datas)
+        assert all(sd._loaded for sd in subdir_datas)
+
+        result = SubdirData.query_all("zlib", channels=[channel], subdirs=subdirs)
+        assert sorted(prec.fn for prec in result) == sorted(prec.fn for prec in expected)
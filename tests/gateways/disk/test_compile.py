@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from os.path import isfile, join
+import sys
+
+from conda._vendor.auxlib.ish import dals
+from conda.common.path import pyc_path
+from conda.gateways.disk import compile as compile_module
+from conda.gateways.disk.compile import _COMPILE_WORKER, PycCompilePool, get_pyc_compile_pool
+from conda.gateways.disk.create import TemporaryDirectory, compile_multiple_pyc, mkdir_p
+
+PY_VER = '%d.%d' % sys.version_info[:2]
+
+
+def _write_py_files(prefix, n_files, broken=()):
+    site_packages = join(prefix, 'lib', 'site-packages', 'pkg')
+    mkdir_p(site_packages)
+    py_full_paths = []
+    for i in range(n_files):
+        py_full_path = join(site_packages, 'module_%d.py' % i)
+        with open(py_full_path, 'w') as fh:
+            fh.write('def (:\n' if i in broken else 'VALUE = %d\n' % i)
+        py_full_paths.append(py_full_path)
+    return py_full_paths, [pyc_path(p, PY_VER) for p in py_full_paths]
+
+
+def test_compile_multiple_pyc():
+    with TemporaryDirectory() as prefix:
+        mkdir_p(join(prefix, 'conda-meta'))
+        py_full_paths, pyc_full_paths = _write_py_files(prefix, 100, broken=(3,))
+        created = compile_multiple_pyc(sys.executable, py_full_paths, pyc_full_paths, prefix,
+                                       PY_VER)
+        assert sorted(created) == sorted(p for i, p in enumerate(pyc_full_paths) if i != 3)
+        assert all(isfile(p) for p in created)
+        assert not isfile(pyc_full_paths[3])
+        get_pyc_compile_pool(sys.executable, prefix).close()
+
+
+def test_pyc_compile_pool_reports_each_file():
+    with TemporaryDirectory() as prefix:
+        mkdir_p(join(prefix, 'conda-meta'))
+        py_full_paths, pyc_full_paths = _write_py_files(prefix, 70, broken=(0, 65))
+        pool = PycCompilePool(sys.executable, prefix, max_workers=2)
+        try:
+            results = pool.compile(py_full_paths, pyc_full_paths)
+            assert [r.pyc_path for r in results] == pyc_full_paths
+            assert [i for i, r in enumerate(results) if r.error is not None] == [0, 65]
+            assert 'SyntaxError' in results[0].error
+            workers = list(pool._workers)
+            assert len(workers) == 2
+
+            # the workers are kept for the next compile
+            results = pool.compile(py_full_paths[1:2], pyc_full_paths[1:2])
+            assert results[0].error is None
+            assert pool._workers == workers
+
+            # a dead worker is replaced
+            workers[0].process.kill()
+            workers[0].process.wait()
+            results = pool.compile(py_full_paths[1:2], pyc_full_paths[1:2])
+            assert results[0].error is None
+            assert workers[0] not in pool._workers
+        finally:
+            pool.close()
+        assert pool._workers == []
+
+
+def test_get_pyc_compile_pool_is_shared():
+    with TemporaryDirectory() as prefix:
+        pool = get_pyc_compile_pool(sys.executable, prefix)
+        try:
+            assert get_pyc_compile_pool(sys.executable, prefix) is pool
+        finally:
+            pool.close()
+
+
+def test_pyc_compile_pool_skips_worker_chatter(monkeypatch):
+    # activation scripts may echo to stdout, before and between the worker's replies
+    chatty_worker = compile_module._COMPILE_WORKER.replace(
+        '        stdout.write(json.dumps(reply)',
+        '        stdout.write("activated\\n[1, 2]\\n{}\\n")\n'
+        '        stdout.write(json.dumps(reply)')
+    assert chatty_worker != compile_module._COMPILE_WORKER
+    monkeypatch.setattr(compile_module, '_COMPILE_WORKER',
+                        'print("activating")\n' + chatty_worker)
+    with TemporaryDirectory() as prefix:
+        mkdir_p(join(prefix, 'conda-meta'))
+        py_full_paths, pyc_full_paths = _write_py_files(prefix, 40, broken=(1, 35))
+        pool = PycCompilePool(sys.executable, prefix, max_workers=1)
+        try:
+            for _ in range(2):
+                results = pool.compile(py_full_paths, pyc_full_paths)
+                assert [i for i, r in enumerate(results) if r.error is not None] == [1, 35]
+                assert all(isfile(r.pyc_path) for r in results if r.error is None)
+                assert not isfile(pyc_full_paths[1])
+        finally:
+            pool.close()
+
+
+def test_pyc_compile_pool_discards_failed_worker(monkeypatch):
+    # a worker that answers with something that is not a reply is killed, not reused
+    monkeypatch.setattr(compile_module, '_COMPILE_WORKER', dals("""
+        import json
+        import sys
+
+        request = json.loads(sys.stdin.readline())
+        sys.stdout.write(json.dumps({"conda_pyc_batch": request["batch"], "errors": []}))
+        sys.stdout.write("\\n")
+        sys.stdout.flush()
+        sys.stdin.readline()
+    """))
+    with TemporaryDirectory() as prefix:
+        mkdir_p(join(prefix, 'conda-meta'))
+        py_full_paths, pyc_full_paths = _write_py_files(prefix, 2)
+        pool = PycCompilePool(sys.executable, prefix, max_workers=1)
+        try:
+            results = pool.compile(py_full_paths, pyc_full_paths)
+            assert all('PycCompileWorkerError' in r.error for r in results)
+            worker, = pool._workers
+            assert not worker.alive
+            assert worker.process.wait() is not None
+
+            monkeypatch.setattr(compile_module, '_COMPILE_WORKER', _COMPILE_WORKER)
+            pool._worker_script = None
+            results = pool.compile(py_full_paths, pyc_full_paths)
+            assert all(r.error is None for r in results)
+            assert worker not in pool._workers
+        finally:
+            pool.close()
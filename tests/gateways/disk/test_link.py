@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function, unicode_literals
+import errno
 from logging import getLogger
 import os
 from os.path import join, isdir, lexists, isfile, exists
@@ -10,11 +11,18 @@ import uuid
 import pytest
 
 from conda.common.compat import on_win, PY2
-from conda.gateways.disk.create import mkdir_p
+from conda.core.link import determine_link_type
+from conda.gateways.disk.create import create_link, mkdir_p
 from conda.gateways.disk.delete import rm_rf
-from conda.gateways.disk.link import link, islink, readlink, stat_nlink, symlink
-from conda.gateways.disk.test import softlink_supported
+from conda.gateways.disk.link import link, islink, readlink, reflink, stat_nlink, symlink
+from conda.gateways.disk.test import reflink_supported, softlink_supported
 from conda.gateways.disk.update import touch
+from conda.models.enums import LinkType
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
 
 log = getLogger(__name__)
 
@@ -91,3 +99,70 @@ class LinkSymlinkUnlinkIslinkReadlinkTests(TestCase):
         os.unlink(path2_symlink)
         assert not lexists(path2_symlink)
         assert not exists(path2_symlink)
+
+
+def _fake_ficlone(dst_fd, src_fd):
+    os.write(dst_fd, os.read(src_fd, 1 << 20))
+
+
+def _unsupported_ficlone(dst_fd, src_fd):
+    raise OSError(errno.EOPNOTSUPP, "Operation not supported")
+
+
+class ReflinkTests(TestCase):
+
+    def setUp(self):
+        self.test_dir = join(gettempdir(), str(uuid.uuid4())[:8])
+        mkdir_p(self.test_dir)
+        self.src = join(self.test_dir, 'src')
+        with open(self.src, 'wb') as fh:
+            fh.write(b'data')
+        os.chmod(self.src, 0o755)
+
+    def tearDown(self):
+        rm_rf(self.test_dir)
+
+    def test_reflink(self):
+        dst = join(self.test_dir, 'dst')
+        with patch('conda.gateways.disk.link._ficlone', side_effect=_fake_ficlone) as ficlone:
+            create_link(self.src, dst, LinkType.reflink)
+        assert ficlone.call_count == 1
+        with open(dst, 'rb') as fh:
+            assert fh.read() == b'data'
+        assert os.stat(dst).st_ino != os.stat(self.src).st_ino
+        if not on_win:
+            assert os.stat(dst).st_mode == os.stat(self.src).st_mode
+
+    def test_reflink_falls_back_to_copy(self):
+        dst = join(self.test_dir, 'dst')
+        with patch('conda.gateways.disk.link._ficlone', side_effect=_unsupported_ficlone):
+            with pytest.raises(OSError):
+                reflink(self.src, dst)
+            assert not lexists(dst)
+
+            create_link(self.src, dst, LinkType.reflink)
+        with open(dst, 'rb') as fh:
+            assert fh.read() == b'data'
+        assert stat_nlink(self.src) == 1
+
+    def test_reflink_supported(self):
+        supported_dir = join(self.test_dir, 'supported')
+        unsupported_dir = join(self.test_dir, 'unsupported')
+        mkdir_p(supported_dir)
+        mkdir_p(unsupported_dir)
+        with patch('conda.gateways.disk.link._ficlone', side_effect=_fake_ficlone):
+            assert reflink_supported(self.src, supported_dir)
+        with patch('conda.gateways.disk.link._ficlone', side_effect=_unsupported_ficlone):
+            assert not reflink_supported(self.src, unsupported_dir)
+        assert os.listdir(supported_dir) == os.listdir(unsupported_dir) == []
+
+    def test_determine_link_type_prefers_reflink_to_copy(self):
+        pkg_dir = join(self.test_dir, 'pkg')
+        mkdir_p(join(pkg_dir, 'info'))
+        touch(join(pkg_dir, 'info', 'index.json'))
+        prefix = join(self.test_dir, 'prefix')
+        mkdir_p(prefix)
+        with patch('conda.gateways.disk.link._ficlone', side_effect=_fake_ficlone), \
+                patch('conda.core.link.context') as context:
+            context.always_copy = True
+            assert determine_link_type(pkg_dir, prefix) == LinkType.reflink
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from os.path import isfile, join
+from subprocess import PIPE, Popen
+import sys
+import time
+
+import pytest
+
+from conda.common.compat import on_win
+from conda.gateways.disk.create import TemporaryDirectory
+from conda.gateways.disk.lock import advisory_lock
+
+HOLD_LOCK_SCRIPT = """
+import fcntl, sys, time
+with open(sys.argv[1], 'a') as fh:
+    fcntl.flock(fh, fcntl.LOCK_EX)
+    print('locked')
+    sys.stdout.flush()
+    time.sleep(float(sys.argv[2]))
+"""
+
+
+def test_advisory_lock_creates_lock_file():
+    with TemporaryDirectory() as td:
+        lock_file_path = join(td, 'locks', 'pkg.lock')
+        with advisory_lock(lock_file_path):
+            assert isfile(lock_file_path)
+        # released locks can be taken again right away
+        with advisory_lock(lock_file_path):
+            pass
+        assert isfile(lock_file_path)
+
+
+@pytest.mark.skipif(on_win, reason="uses fcntl in the child process")
+def test_advisory_lock_waits_for_other_process():
+    with TemporaryDirectory() as td:
+        lock_file_path = join(td, 'pkg.lock')
+        holder = Popen([sys.executable, '-c', HOLD_LOCK_SCRIPT, lock_file_path, '1'],
+                       stdout=PIPE)
+        try:
+            assert holder.stdout.readline().strip() == b'locked'
+            start = time.time()
+            with advisory_lock(lock_file_path, poll_interval=0.05):
+                waited = time.time() - start
+            assert waited > 0.5
+        finally:
+            holder.wait()
+            holder.stdout.close()
+
+
+@pytest.mark.skipif(on_win, reason="uses fcntl in the child process")
+def test_advisory_lock_non_blocking():
+    with TemporaryDirectory() as td:
+        lock_file_path = join(td, 'pkg.lock')
+        with advisory_lock(lock_file_path, blocking=False) as locked:
+            assert locked
+        holder = Popen([sys.executable, '-c', HOLD_LOCK_SCRIPT, lock_file_path, '1'],
+                       stdout=PIPE)
+        try:
+            assert holder.stdout.readline().strip() == b'locked'
+            start = time.time()
+            with advisory_lock(lock_file_path, blocking=False) as locked:
+                assert not locked
+            assert time.time() - start < 0.5
+        finally:
+            holder.wait()
+            holder.stdout.close()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+from os.path import isfile, join
+
+from conda.gateways.disk.create import mkdir_p, TemporaryDirectory
+from conda.gateways.disk.paths_manifest import (
+    PATHS_MANIFEST_FN, read_paths_manifest, write_paths_manifest,
+)
+from conda.gateways.disk.read import read_paths_json
+from conda.models.enums import FileMode, PathType
+from conda.models.records import PathDataV1
+
+SHA256 = 'c' * 64
+
+PATHS = [
+    {'_path': 'bin/tool', 'path_type': 'hardlink', 'sha256': SHA256, 'size_in_bytes': 2048,
+     'prefix_placeholder': '/opt/anaconda1anaconda2anaconda3', 'file_mode': 'binary'},
+    {'_path': 'lib/libtool.so', 'path_type': 'softlink', 'sha256': SHA256,
+     'size_in_bytes': 12},
+    {'_path': 'share/doc/README', 'path_type': 'hardlink', 'no_link': True,
+     'sha256': SHA256, 'size_in_bytes': 0},
+    {'_path': 'share/doc/LICENSE', 'path_type': 'hardlink', 'no_link': False,
+     'inode_paths': ['share/doc/COPYING'], 'sha256_in_prefix': 'd' * 64},
+    {'_path': 'etc/tool.conf', 'path_type': 'hardlink',
+     'prefix_placeholder': '/opt/anaconda1anaconda2anaconda3', 'file_mode': 'text'},
+]
+
+
+def _write_paths_json(extracted_package_directory, paths):
+    mkdir_p(join(extracted_package_directory, 'info'))
+    with open(join(extracted_package_directory, 'info', 'paths.json'), 'w') as fh:
+        json.dump({'paths': paths, 'paths_version': 1}, fh)
+
+
+def test_paths_manifest_round_trip():
+    with TemporaryDirectory() as epd:
+        _write_paths_json(epd, PATHS)
+        assert read_paths_manifest(epd) is None
+
+        # the first read backfills the manifest
+        from_json = read_paths_json(epd)
+        assert isfile(join(epd, 'info', PATHS_MANIFEST_FN))
+
+        from_manifest = read_paths_manifest(epd)
+        assert from_manifest is not None
+        assert from_manifest == from_json
+        assert from_manifest.dump() == from_json.dump()
+        assert read_paths_json(epd) == from_json
+
+        tool, libtool, readme, license, conf = from_manifest.paths
+        assert isinstance(tool, PathDataV1)
+        assert tool.path == 'bin/tool'
+        assert tool.path_type == PathType.hardlink
+        assert tool.file_mode == FileMode.binary
+        assert tool.size_in_bytes == 2048
+        assert tool.sha256 == SHA256
+        assert libtool.path_type == PathType.softlink
+        assert libtool.prefix_placeholder is None
+        assert readme.no_link is True
+        assert readme.size_in_bytes == 0
+        assert license.no_link is False
+        assert license.inode_paths == ('share/doc/COPYING',)
+        assert license.sha256_in_prefix == 'd' * 64
+        assert conf.file_mode == FileMode.text
+
+        # unset fields stay unset, as with PathDataV1(**entry)
+        for path_data in (from_json.paths[4], conf):
+            try:
+                path_data.sha256
+            except AttributeError:
+                pass
+            else:
+                assert False, "sha256 should not be set"
+
+        # derived records see the same values
+        assert (PathDataV1.from_objects(tool, path_type=PathType.hardlink).dump()
+                == PathDataV1.from_objects(from_json.paths[0],
+                                           path_type=PathType.hardlink).dump())
+
+
+def test_paths_manifest_ignored_when_paths_json_changes():
+    with TemporaryDirectory() as epd:
+        _write_paths_json(epd, PATHS)
+        assert write_paths_manifest(epd)
+        assert len(read_paths_manifest(epd).paths) == 5
+
+        _write_paths_json(epd, PATHS[:2])
+        assert read_paths_manifest(epd) is None
+        assert len(read_paths_json(epd).paths) == 2
+        assert len(read_paths_manifest(epd).paths) == 2
+
+
+def test_paths_manifest_not_written_for_unrepresentable_entries():
+    with TemporaryDirectory() as epd:
+        paths = [dict(PATHS[0], sha256=SHA256.upper())]
+        _write_paths_json(epd, paths)
+        assert not write_paths_manifest(epd)
+        assert read_paths_json(epd).paths[0].sha256 == SHA256.upper()
+        assert not isfile(join(epd, 'info', PATHS_MANIFEST_FN))
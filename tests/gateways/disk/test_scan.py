@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import errno
+import os
+from os.path import join
+
+from conda.gateways.disk.create import mkdir_p, TemporaryDirectory
+from conda.gateways.disk.scan import directory_usage, iter_entries
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+
+def _write_file(path, size):
+    with open(path, 'wb') as fh:
+        fh.write(b'x' * size)
+
+
+def test_iter_entries():
+    with TemporaryDirectory() as td:
+        mkdir_p(join(td, 'subdir'))
+        _write_file(join(td, 'file'), 3)
+        entries = {entry.name: entry for entry in iter_entries(td)}
+        assert sorted(entries) == ['file', 'subdir']
+        assert entries['subdir'].is_dir()
+        assert not entries['file'].is_dir()
+        assert entries['file'].stat(follow_symlinks=False).st_size == 3
+
+
+def test_directory_usage():
+    with TemporaryDirectory() as td:
+        pkg = join(td, 'pkg')
+        mkdir_p(join(pkg, 'info'))
+        mkdir_p(join(pkg, 'lib', 'deep'))
+        _write_file(join(pkg, 'info', 'index.json'), 10)
+        _write_file(join(pkg, 'lib', 'a'), 100)
+        _write_file(join(pkg, 'lib', 'deep', 'b'), 1000)
+
+        usage = directory_usage(pkg)
+        assert usage.path == pkg
+        assert usage.size == 1110
+        assert not usage.hard_linked
+        assert usage.errors == []
+
+        os.link(join(pkg, 'lib', 'a'), join(td, 'a'))
+        usage = directory_usage(pkg)
+        assert usage.size == 1110
+        assert usage.hard_linked
+
+        usage = directory_usage(pkg, stop_at_hard_link=True)
+        assert usage.hard_linked
+        assert usage.size <= 1110
+
+
+def test_directory_usage_unreadable_subdir():
+    with TemporaryDirectory() as td:
+        pkg = join(td, 'pkg')
+        unreadable = join(pkg, 'lib', 'unreadable')
+        mkdir_p(unreadable)
+        _write_file(join(pkg, 'lib', 'a'), 100)
+        _write_file(join(unreadable, 'b'), 1000)
+
+        def iter_entries_(path):
+            if path == unreadable:
+                raise OSError(errno.EACCES, "Permission denied", path)
+            return iter_entries(path)
+
+        with patch('conda.gateways.disk.scan.iter_entries', iter_entries_):
+            usage = directory_usage(pkg)
+        assert usage.size == 100
+        (error_path, error), = usage.errors
+        assert error_path == unreadable
+        assert error.errno == errno.EACCES
@@ -1,18 +1,37 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import hashlib
 from logging import getLogger
+from os.path import getsize, isfile, join
 from conda._vendor.auxlib.compat import Utf8NamedTemporaryFile
+from tempfile import mkdtemp
+from threading import Thread
 from unittest import TestCase
 import warnings
 
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:  # pragma: no cover
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+try:
+    from unittest.mock import ANY, patch
+except ImportError:
+    from mock import ANY, patch
+
 import pytest
 from requests import HTTPError
 
+from conda.base.context import reset_context
 from conda.common.compat import ensure_binary, PY3
+from conda.common.io import env_var
 from conda.common.url import path_to_url
 from conda.gateways.anaconda_client import remove_binstar_token, set_binstar_token
-from conda.gateways.connection.session import CondaHttpAuth, CondaSession
+from conda.gateways.connection.download import PARTIAL_EXTENSION, download
+from conda.gateways.connection import session as session_module
+from conda.gateways.connection.session import (CondaHttpAuth, CondaSession, connection_counts,
+                                               log_connection_counts)
 from conda.gateways.disk.delete import rm_rf
 
 log = getLogger(__name__)
@@ -66,3 +85,196 @@ class CondaSessionTests(TestCase):
         finally:
             if test_path is not None:
                 rm_rf(test_path)
+
+    def test_http_adapter_is_shared_across_threads(self):
+        sessions = []
+        threads = [Thread(target=lambda: sessions.append(CondaSession())) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        session = CondaSession()
+        assert session is CondaSession()
+        # requests.Session isn't thread-safe; only its connection pools are shared
+        assert len(set(map(id, sessions + [session]))) == 5
+        adapter = session.get_adapter('https://conda.anaconda.test')
+        assert all(s.get_adapter('https://conda.anaconda.test') is adapter for s in sessions)
+        assert all(s.get_adapter('http://conda.anaconda.test') is adapter for s in sessions)
+
+    def test_pool_sized_to_fetch_concurrency(self):
+        with env_var('CONDA_FETCH_THREADS', '24', reset_context):
+            adapter = CondaSession().get_adapter('https://conda.anaconda.test')
+            assert adapter.poolmanager.connection_pool_kw['maxsize'] == 24
+        adapter = CondaSession().get_adapter('https://conda.anaconda.test')
+        assert adapter.poolmanager.connection_pool_kw['maxsize'] == 10
+
+    def test_keep_alive_connections_are_reused(self):
+        class KeepAliveHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            timeout = 1  # lets serve_forever shut down despite the idle keep-alive socket
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'ok')
+
+        server = HTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+        server_thread = Thread(target=server.serve_forever)
+        server_thread.daemon = True
+        server_thread.start()
+        try:
+            url = 'http://127.0.0.1:%d/' % server.server_address[1]
+            session = CondaSession()
+            connection_counts(reset=True)
+            for _ in range(5):
+                assert session.get(url, proxies={}).content == b'ok'
+            assert connection_counts() == {'created': 1, 'reused': 4}
+            with patch.object(session_module.log, 'debug') as debug:
+                log_connection_counts()
+            debug.assert_called_once_with(ANY, {'created': 1, 'reused': 4})
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class _FlakyRangeHandler(BaseHTTPRequestHandler):
+    """Serves ``payload``, honoring Range/If-Range, and cuts the connection short after the
+    number of body bytes given in ``drop_after`` for each successive request."""
+
+    payload = b''
+    etag = '"v1"'
+    drop_after = []
+    requests_seen = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        cls = type(self)
+        cls.requests_seen.append(dict(self.headers.items()))
+        start = 0
+        range_header = self.headers.get('Range')
+        if_range = self.headers.get('If-Range')
+        if range_header and (if_range is None or if_range == cls.etag):
+            start = int(range_header.split('=')[1].rstrip('-'))
+        body = cls.payload[start:]
+
+        self.send_response(206 if start else 200)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', cls.etag)
+        if start:
+            self.send_header('Content-Range', 'bytes %d-%d/%d'
+                             % (start, len(cls.payload) - 1, len(cls.payload)))
+        self.end_headers()
+
+        drop_after = cls.drop_after.pop(0) if cls.drop_after else None
+        if drop_after is not None:
+            self.wfile.write(body[:drop_after])
+            self.close_connection = True
+        else:
+            self.wfile.write(body)
+        self.wfile.flush()
+
+
+class ResumableDownloadTests(TestCase):
+
+    def setUp(self):
+        _FlakyRangeHandler.payload = bytes(bytearray(i % 251 for i in range(300000)))
+        _FlakyRangeHandler.etag = '"v1"'
+        _FlakyRangeHandler.drop_after = []
+        _FlakyRangeHandler.requests_seen = []
+        self.server = HTTPServer(('127.0.0.1', 0), _FlakyRangeHandler)
+        self.server_thread = Thread(target=self.server.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+        self.url = 'http://127.0.0.1:%d/pkg-1.0-0.tar.bz2' % self.server.server_address[1]
+        self.tmpdir = mkdtemp()
+        self.target = join(self.tmpdir, 'pkg-1.0-0.tar.bz2')
+        self.md5 = hashlib.md5(_FlakyRangeHandler.payload).hexdigest()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        rm_rf(self.tmpdir)
+
+    def test_resume_after_dropped_connection(self):
+        _FlakyRangeHandler.drop_after = [100000, 50000]
+        progress = []
+        download(self.url, self.target, md5=self.md5, size=300000,
+                 progress_update_callback=progress.append)
+
+        with open(self.target, 'rb') as fh:
+            assert fh.read() == _FlakyRangeHandler.payload
+        assert not isfile(self.target + PARTIAL_EXTENSION)
+
+        seen = _FlakyRangeHandler.requests_seen
+        assert len(seen) == 3
+        assert 'Range' not in seen[0]
+        # only whole chunks make it to disk before the connection drops
+        first_resume = int(seen[1]['Range'][len('bytes='):-1])
+        second_resume = int(seen[2]['Range'][len('bytes='):-1])
+        assert 0 < first_resume <= 100000
+        assert first_resume < second_resume <= first_resume + 50000
+        assert seen[1]['If-Range'] == seen[2]['If-Range'] == '"v1"'
+        assert progress[-1] == 1.0
+
+    def test_partial_file_survives_failed_call(self):
+        _FlakyRangeHandler.drop_after = [120000]
+        with env_var('CONDA_REMOTE_MAX_RETRIES', '0', reset_context):
+            with pytest.raises(Exception):
+                download(self.url, self.target, md5=self.md5)
+            assert isfile(self.target + PARTIAL_EXTENSION)
+            assert not isfile(self.target)
+            partial_size = getsize(self.target + PARTIAL_EXTENSION)
+            assert 0 < partial_size <= 120000
+
+            download(self.url, self.target, md5=self.md5)
+
+        with open(self.target, 'rb') as fh:
+            assert fh.read() == _FlakyRangeHandler.payload
+        # a partial file from an earlier call has no validator, only the checksum guards it
+        assert _FlakyRangeHandler.requests_seen[1]['Range'] == 'bytes=%d-' % partial_size
+        assert 'If-Range' not in _FlakyRangeHandler.requests_seen[1]
+
+    def test_changed_resource_restarts_from_zero(self):
+        _FlakyRangeHandler.drop_after = [100000]
+        payload = _FlakyRangeHandler.payload
+
+        def change_payload(fraction):
+            if _FlakyRangeHandler.etag == '"v1"' and fraction > 0.3:
+                _FlakyRangeHandler.etag = '"v2"'
+                _FlakyRangeHandler.payload = payload[::-1]
+
+        md5 = hashlib.md5(payload[::-1]).hexdigest()
+        download(self.url, self.target, md5=md5, progress_update_callback=change_payload)
+
+        with open(self.target, 'rb') as fh:
+            assert fh.read() == payload[::-1]
+        assert _FlakyRangeHandler.requests_seen[1]['If-Range'] == '"v1"'
+
+    def test_stale_partial_file_restarts_from_zero(self):
+        # left by an earlier process, for an older build of the same file name
+        with open(self.target + PARTIAL_EXTENSION, 'wb') as fh:
+            fh.write(b'\0' * 1000)
+
+        download(self.url, self.target, md5=self.md5, size=300000)
+
+        with open(self.target, 'rb') as fh:
+            assert fh.read() == _FlakyRangeHandler.payload
+        seen = _FlakyRangeHandler.requests_seen
+        assert len(seen) == 2
+        assert seen[0]['Range'] == 'bytes=1000-'
+        assert 'Range' not in seen[1]
+
+    def test_checksum_mismatch_discards_partial(self):
+        from conda.exceptions import ChecksumMismatchError
+        with pytest.raises(ChecksumMismatchError):
+            download(self.url, self.target, md5='0' * 32)
+        assert not isfile(self.target + PARTIAL_EXTENSION)
+        assert not isfile(self.target)
+        # nothing was resumed, so there is nothing to download again
+        assert len(_FlakyRangeHandler.requests_seen) == 1
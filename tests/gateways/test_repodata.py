@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from copy import deepcopy
+from io import StringIO
+import json
+from logging import getLogger
+from os.path import dirname, join
+
+import pytest
+
+from conda.gateways.disk.create import TemporaryDirectory
+from conda.gateways.repodata.columnar import ColumnarCache, write_columnar_cache
+from conda.gateways.repodata.delta import (apply_repodata_delta, find_delta_chain,
+                                           make_repodata_delta, merge_repodata_deltas)
+from conda.gateways.repodata.stream import (iter_repodata, iter_repodata_obj, load_repodata,
+                                            patch_repodata)
+
+log = getLogger(__name__)
+
+RECORD_INFOS = (
+    {"name": "numpy", "version": "1.16.4", "build": "py37h7e9f1db_0", "build_number": 0,
+     "depends": ["python >=3.7,<3.8.0a0", "libopenblas"], "fn": "numpy-1.16.4-py37h7e9f1db_0.tar.bz2",
+     "md5": "1d2bbd65d1c4aa5e2bf0baa4e5b8d6b9", "size": 4123},
+    {"name": "mkl", "version": "2019.4", "build": "243", "build_number": 243, "depends": [],
+     "fn": "mkl-2019.4-243.tar.bz2", "track_features": "mkl nomkl", "url": "dropped"},
+    {"name": "numpy", "version": "1.17.0", "build": "py37h7e9f1db_0", "build_number": 0,
+     "depends": ["python >=3.7,<3.8.0a0"], "fn": "numpy-1.17.0-py37h7e9f1db_0.tar.bz2",
+     "license": u"BSD 3-Cläuse"},
+)
+
+
+def test_columnar_cache_round_trip():
+    with TemporaryDirectory() as td:
+        path = join(td, "cache.c")
+        meta = {"_etag": "\"569c0ecb-48\"", "_mod": None, "subdir": "linux-64"}
+        write_columnar_cache(path, meta, RECORD_INFOS, exclude_keys=("url",))
+        columns = ColumnarCache(path)
+        try:
+            assert columns.meta == meta
+            assert len(columns) == 3
+            assert sorted(columns.names) == ["mkl", "numpy"]
+            assert columns.positions("numpy") == (0, 2)
+            assert columns.positions("scipy") == ()
+            assert columns.track_features == {"mkl": [1], "nomkl": [1]}
+            assert columns.version(2) == "1.17.0"
+            assert columns.depends(0) == ["python >=3.7,<3.8.0a0", "libopenblas"]
+            for position, expected in enumerate(RECORD_INFOS):
+                expected = {k: v for k, v in expected.items() if k != "url"}
+                assert columns.info(position) == expected
+        finally:
+            columns.close()
+
+
+def test_columnar_cache_copies_records_from_source():
+    with TemporaryDirectory() as td:
+        source_path, path = join(td, "source.c"), join(td, "cache.c")
+        write_columnar_cache(source_path, {}, RECORD_INFOS)
+        source = ColumnarCache(source_path)
+        try:
+            record_infos = [deepcopy(RECORD_INFOS[2]), dict(RECORD_INFOS[1], size=1)]
+            write_columnar_cache(path, {}, record_infos, source=source,
+                                 source_positions=(2, None))
+        finally:
+            source.close()
+        columns = ColumnarCache(path)
+        try:
+            assert [columns.info(i) for i in range(len(columns))] == record_infos
+            assert columns.fn(1) == "mkl-2019.4-243.tar.bz2"
+            assert columns.positions("numpy") == (0,)
+            assert columns.track_features == {"mkl": [1], "nomkl": [1]}
+        finally:
+            columns.close()
+
+
+def test_columnar_cache_bad_file():
+    with TemporaryDirectory() as td:
+        path = join(td, "cache.c")
+        with open(path, "wb") as fh:
+            fh.write(b"\x80\x04not a columnar cache at all")
+        with pytest.raises(ValueError):
+            ColumnarCache(path)
+
+
+def test_repodata_delta_chain():
+    v1 = {"packages": {"a-1-0.tar.bz2": {"name": "a", "version": "1"},
+                       "b-1-0.tar.bz2": {"name": "b", "version": "1"}}}
+    v2 = {"packages": {"a-1-0.tar.bz2": {"name": "a", "version": "1"},
+                       "a-2-0.tar.bz2": {"name": "a", "version": "2"}},
+          "packages.conda": {"c-1-0.conda": {"name": "c", "version": "1"}}}
+    v3 = {"packages": {"a-2-0.tar.bz2": {"name": "a", "version": "2", "depends": ["c"]}},
+          "packages.conda": {"c-1-0.conda": {"name": "c", "version": "1"}}}
+    s1, s2, s3 = {"_etag": "e1", "_mod": "m1"}, {"_mod": "m2"}, {"_etag": "e3", "_mod": "m3"}
+    delta_document = {
+        "latest": s3,
+        "deltas": [make_repodata_delta(v2, v3, s2, s3), make_repodata_delta(v1, v2, s1, s2)],
+    }
+    assert delta_document["deltas"][1]["remove"] == {"packages": ["b-1-0.tar.bz2"]}
+
+    assert find_delta_chain(delta_document, "e3", "m3") == []
+    assert find_delta_chain(delta_document, "e0", "m1") is None
+    assert find_delta_chain(delta_document, None, None) is None
+    chain = find_delta_chain(delta_document, "e1", "whatever")
+    assert chain == delta_document["deltas"][::-1]
+
+    repodata = dict(deepcopy(v1), _etag="e1", _mod="m1", _url="file:///channel/noarch")
+    for delta in chain:
+        apply_repodata_delta(repodata, delta)
+    assert repodata == dict(v3, _etag="e3", _mod="m3", _url="file:///channel/noarch")
+
+
+def test_repodata_delta_chain_cycle():
+    delta_document = {
+        "latest": {"_mod": "m3"},
+        "deltas": [{"from": {"_mod": "m1"}, "to": {"_mod": "m2"}},
+                   {"from": {"_mod": "m2"}, "to": {"_mod": "m1"}}],
+    }
+    assert find_delta_chain(delta_document, None, "m1") is None
+
+
+def test_merge_repodata_deltas():
+    chain = [
+        {"from": {"_mod": "m0"}, "to": {"_mod": "m1"},
+         "add": {"packages": {"a.tar.bz2": {"v": 1}, "b.tar.bz2": {"v": 1}}},
+         "remove": {"packages": ["c.tar.bz2", "d.tar.bz2"]}},
+        {"from": {"_mod": "m1"}, "to": {"_etag": "e2"},
+         "add": {"packages": {"d.tar.bz2": {"v": 2}}, "packages.conda": {}},
+         "remove": {"packages": ["b.tar.bz2"]}},
+    ]
+    delta = merge_repodata_deltas(chain)
+    assert delta["from"] == {"_mod": "m0"}
+    assert delta["to"] == {"_etag": "e2"}
+    assert delta["add"] == {"packages": {"a.tar.bz2": {"v": 1}, "d.tar.bz2": {"v": 2}},
+                            "packages.conda": {}}
+    assert delta["remove"] == {"packages": ["b.tar.bz2", "c.tar.bz2", "d.tar.bz2"]}
+
+    repodata = {"_mod": "m0", "packages": {"c.tar.bz2": {}, "d.tar.bz2": {}, "e.tar.bz2": {}}}
+    expected = deepcopy(repodata)
+    for d in chain:
+        apply_repodata_delta(expected, d)
+    assert apply_repodata_delta(repodata, delta) == expected
+    assert list(repodata["packages"]) == list(expected["packages"])
+
+
+@pytest.mark.parametrize("chunk_size", (1, 7, 4096))
+def test_patch_repodata_matches_apply_repodata_delta(chunk_size):
+    path = join(dirname(__file__), "..", "data", "conda_format_repo", "linux-64", "repodata.json")
+    with open(path) as fh:
+        repodata = json.load(fh)
+    repodata["_etag"] = "\"e1\""
+    fns = sorted(repodata["packages"])
+    delta = {
+        "to": {"_mod": "Tue, 15 Oct 2019 12:00:00 GMT"},
+        "add": {
+            "packages": {fns[1]: {"name": "changed"}, "new-1-0.tar.bz2": {"name": "new"}},
+            "packages.conda": {"new-1-0.conda": {"name": "new"}},
+        },
+        "remove": {"packages": fns[2:4] + ["missing-1-0.tar.bz2"]},
+    }
+    expected = apply_repodata_delta(deepcopy(repodata), delta)
+
+    out = StringIO()
+    entries = list(patch_repodata(StringIO(json.dumps(repodata, indent=2)), out, delta,
+                                  chunk_size=chunk_size))
+    patched = json.loads(out.getvalue())
+    assert patched == expected
+    assert list(patched)[0] == "_mod"
+    assert list(patched["packages"]) == list(expected["packages"])
+    assert entries == list(iter_repodata(StringIO(out.getvalue())))
+
+
+@pytest.mark.parametrize("chunk_size", (1, 7, 4096))
+def test_load_repodata_matches_json_load(chunk_size):
+    path = join(dirname(__file__), "..", "data", "conda_format_repo", "linux-64", "repodata.json")
+    with open(path) as fh:
+        expected = json.load(fh)
+    with open(path) as fh:
+        assert load_repodata(fh, chunk_size=chunk_size) == expected
+
+    raw = json.dumps(dict(expected, _etag="\"5d5ca7f8-3fc\"", removed=["a-1-0.tar.bz2"],
+                          repodata_version=1, size=123456789))
+    assert load_repodata(StringIO(raw), chunk_size=chunk_size) == json.loads(raw)
+
+
+def test_iter_repodata_yields_package_entries():
+    raw = '{"info": {"subdir": "noarch"}, "packages": {"a-1-0.tar.bz2": {"size": 12},' \
+          ' "b-1-0.tar.bz2": {"size": 3456}}, "packages.conda": {}}'
+    assert list(iter_repodata(StringIO(raw), chunk_size=5)) == [
+        ("info", None, {"subdir": "noarch"}),
+        ("packages", "a-1-0.tar.bz2", {"size": 12}),
+        ("packages", "b-1-0.tar.bz2", {"size": 3456}),
+        ("packages.conda", None, {}),
+    ]
+    assert load_repodata(StringIO(" { } ")) == {}
+    # json.loads(raw or '{}')
+    assert load_repodata(StringIO("")) == {}
+    assert load_repodata(StringIO(raw), chunk_size=5) == json.loads(raw)
+    assert list(iter_repodata_obj(json.loads(raw))) == list(iter_repodata(StringIO(raw)))
+
+
+@pytest.mark.parametrize("indent", (None, 2))
+def test_load_repodata_nested_objects(indent):
+    # entries are decoded a chunk at a time; boundaries inside nested objects or strings, or
+    #   past the end of "packages", must not split an entry
+    repodata = {
+        "packages": {
+            "a-1-0.tar.bz2": {"x": {"b.conda": {"c": 1}, "d.conda": {"e": "}, \"f\": {"}},
+                              "s": "}, \"z\": {"},
+            "g-1-0.tar.bz2": {"n": 1},
+            "h-1-0.tar.bz2": {"k": [{"a": {}}, {"b": {}}]},
+            "i-1-0.tar.bz2": {},
+        },
+        "packages.conda": {"j-1-0.conda": {"m": "q"}, "k-1-0.conda": {"m": {}}},
+        "info": {"subdir": "noarch"},
+    }
+    raw = json.dumps(repodata, indent=indent)
+    for chunk_size in range(1, len(raw) + 2):
+        assert load_repodata(StringIO(raw), chunk_size=chunk_size) == repodata
+        assert list(iter_repodata(StringIO(raw), chunk_size=chunk_size)) == \
+            list(iter_repodata_obj(repodata))
+
+
+@pytest.mark.parametrize("raw", ('{"packages": {"a": {}', '{"packages": {"a": {}}]',
+                                 '["packages"]', '{"info": {} "packages": {}}', '{} {}',
+                                 '{"packages": {}} x'))
+def test_load_repodata_invalid(raw):
+    with pytest.raises(ValueError):
+        load_repodata(StringIO(raw), chunk_size=3)
@@ -15,7 +15,7 @@ from conda.exceptions import CondaValueError, InvalidMatchSpec, InvalidSpec
 from conda.models.channel import Channel
 from conda.models.dist import Dist
 from conda.models.records import PackageRecord
-from conda.models.match_spec import ChannelMatch, MatchSpec, _parse_spec_str
+from conda.models.match_spec import ChannelMatch, MatchSpec, _LRUCache, _parse_spec_str
 from conda.models.version import VersionSpec
 
 
@@ -116,7 +116,7 @@ class MatchSpecTests(TestCase):
         d = MatchSpec(c, optional=True)
         assert d.optional
         assert not c.optional
-        assert a is not b
+        assert a is b  # interned
         assert a is not c
         assert a is not d
         assert a == b
@@ -826,6 +826,41 @@ class SpecStrParsingTests(TestCase):
         # }
 
 
+class SpecInterningTests(TestCase):
+
+    def test_spec_str_interned(self):
+        spec = MatchSpec("numpy >=1.11,<2 py27*")
+        assert MatchSpec("numpy >=1.11,<2 py27*") is spec
+        assert MatchSpec("numpy >=1.11,<2 py27*", optional=True) is not spec
+        assert not spec.optional
+
+    def test_subclass_specs_not_interned(self):
+        class SubMatchSpec(MatchSpec):
+            pass
+
+        spec = MatchSpec("numpy 1.11*")
+        sub_spec = SubMatchSpec("numpy 1.11*")
+        assert type(sub_spec) is SubMatchSpec
+        assert sub_spec == spec
+        assert MatchSpec("numpy 1.11*") is spec
+
+    def test_interned_specs_cleared_on_context_reset(self):
+        spec = MatchSpec("conda-forge::numpy")
+        MatchSpec._reset_state()
+        assert MatchSpec("conda-forge::numpy") is not spec
+        assert MatchSpec("conda-forge::numpy") == spec
+
+    def test_lru_cache_bounded(self):
+        cache = _LRUCache(2)
+        cache['a'] = 1
+        cache['b'] = 2
+        assert cache.get('a') == 1
+        cache['c'] = 3
+        assert len(cache) == 2
+        assert 'b' not in cache
+        assert cache.get('a') == 1 and cache.get('c') == 3
+
+
 class MatchSpecMergeTests(TestCase):
 
     def test_merge_single_name(self):
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import pytest
+
+from conda.common.compat import itervalues
+from conda.models.match_spec import MatchSpec
+from conda.models.record_index import RecordIndex
+from tests.helpers import get_index_r_1
+
+
+@pytest.mark.parametrize("spec_str", (
+    "*",
+    "py*",
+    "*numpy*",
+    "^nump[y]$",
+    "*[build=py27_0]",
+    "*[build=py27*]",
+    "*[build=does-not-exist]",
+    "*[subdir=noarch]",
+    "*[md5=e620835c9b7aba7e47a9b2af972d31c4]",
+    "*[track_features=mkl]",
+    "mkl*[track_features=mkl]",
+    "numpy[build=py27_0]",
+    "numpy >=1.7",
+))
+def test_query_matches_linear_scan(spec_str):
+    index, r = get_index_r_1()
+    records = tuple(itervalues(index))
+    spec = MatchSpec(spec_str)
+    expected = tuple(rec for rec in records if spec.match(rec))
+    record_index = RecordIndex(records)
+    assert tuple(record_index.query(spec)) == expected
+    # answered again from the indexes built by the first query
+    assert tuple(record_index.query(spec)) == expected
+    assert set(r.find_matches(spec)) == set(expected)
+
+
+def test_candidates_narrowed_by_index():
+    index, _ = get_index_r_1()
+    record_index = RecordIndex(itervalues(index))
+    candidates = record_index.candidates(MatchSpec("*numpy*"))
+    assert 0 < len(candidates) < len(record_index)
+    assert all("numpy" in rec.name for rec in candidates)
+    assert record_index.candidates(MatchSpec("*[build=does-not-exist]")) == ()
@@ -3,7 +3,8 @@ from __future__ import absolute_import, print_function
 import unittest
 
 from conda.exceptions import InvalidVersionSpec
-from conda.models.version import VersionOrder, VersionSpec, normalized_version, ver_eval, treeify
+from conda.models.version import (RankedVersions, VersionOrder, VersionSpec, normalized_version,
+                                  ver_eval, treeify)
 import pytest
 
 
@@ -298,3 +299,17 @@ class TestVersionSpec(unittest.TestCase):
         # We're going to leave the not implemented for now.
         with pytest.raises(InvalidVersionSpec):
             VersionSpec("===3.3.2")
+
+    def test_ranked_versions_mask(self):
+        versions = ["0.9", "1.0", "1.0.0", "1.0.1", "1.1a1", "1.1", "1.1.post1", "1.2+local",
+                    "1.10", "2.0rc1", "2.0", "2.0.0.1", "3"]
+        ranked = RankedVersions(versions + versions[:4])
+        assert len(ranked) == len(versions)
+        assert ranked.rank["1.0"] < ranked.rank["1.1"] < ranked.rank["2.0"]
+        for spec_str in ("1.0", "==1.0", "!=1.0", ">1.0", ">=1.0", "<1.1", "<=1.1", "1.1.*",
+                         "1.*", "!=1.*", ">=1.0,<2", "<1.1|>=2.0", "(>=1,<1.2)|3", "~=1.0",
+                         "^1\\.1.*$", "1.*1", "*", ">=2.0.0", "1.2+local"):
+            spec = VersionSpec(spec_str)
+            mask = ranked.mask(spec)
+            assert [v for v in versions if mask[ranked.rank[v]]] == \
+                [v for v in versions if spec.match(v)], spec_str
@@ -1,9 +1,11 @@
 from itertools import chain, combinations, permutations, product
+import random
 
 import pytest
 
 from conda.common.compat import iteritems, string_types
-from conda.common.logic import Clauses, FALSE, TRUE, minimal_unsatisfiable_subset
+from conda.common.logic import (Clauses, FALSE, PycoSatSolver, PySatRC2Solver, PySatSolver, TRUE,
+                                minimal_unsatisfiable_subset)
 from tests.helpers import raises
 
 
@@ -296,6 +298,69 @@ def test_minimize():
     assert sval == 11
 
 
+@pytest.mark.parametrize("sat_solver", (PySatSolver, PySatRC2Solver))
+def test_minimize_incremental(sat_solver):
+    pytest.importorskip("pysat")
+    C = Clauses(15, sat_solver=sat_solver)
+    C.Require(C.ExactlyOne, range(1, 11))
+    sol, sval = C.minimize([(k, k) for k in range(1, 11)])
+    assert sval == 1
+    # The optimal bound is kept, while the clauses of the failed bisection steps and
+    # of additional constraints are dropped.
+    assert C.sat([(-1,)]) is None
+    assert C.sat([(2,), (-2,)]) is None
+    assert 1 in C.sat()
+    sol, sval = C.minimize([(k, 11 - k) for k in range(1, 11)], sol)
+    assert sval == 10
+    C.Require(C.ExactlyOne, range(11, 16))
+    sol, sval = C.minimize([(k, k) for k in range(11, 16)], sol)
+    assert sval == 11
+
+
+def test_minimize_maxsat_matches_bisection():
+    pytest.importorskip("pysat")
+    # random weighted objectives minimized one after the other, each keeping the optima
+    #   of the ones before it
+    rng = random.Random(1)
+    for _ in range(40):
+        n = rng.randint(5, 20)
+        clauses = [tuple(rng.choice((1, -1)) * rng.randint(1, n) for _ in range(3))
+                   for _ in range(rng.randint(n, 3 * n))]
+        objectives = [[(rng.randint(1, 6), rng.choice((1, -1)) * rng.randint(1, n))
+                       for _ in range(rng.randint(1, n))] for _ in range(3)]
+        results = []
+        for sat_solver in (PycoSatSolver, PySatRC2Solver):
+            C = Clauses(n, sat_solver=sat_solver)
+            for clause in clauses:
+                C.Require(C.Any, clause)
+            sol = C.sat()
+            values = []
+            for objective in objectives:
+                sol, value = C.minimize(objective, sol)
+                values.append(value)
+            results.append(values)
+        assert results[0] == results[1]
+
+
+def test_minimize_maxsat_ties_do_not_depend_on_history():
+    pytest.importorskip("pysat")
+    # every solution with one of x1..x10 and one of x11..x20 is optimal; which one is
+    #   returned must not depend on what the live solver saw in earlier runs
+    def minimize(history):
+        C = Clauses(20, sat_solver=PySatRC2Solver)
+        C.Require(C.ExactlyOne, range(1, 11))
+        C.Require(C.ExactlyOne, range(11, 21))
+        for lit in history:
+            C.sat([(lit,)])
+        sol, value = C.minimize([(1, k) for k in range(1, 21)])
+        assert value == 2
+        return [lit for lit in sol if 0 < lit <= 20]
+
+    expected = minimize(())
+    assert minimize((19, 8)) == expected
+    assert minimize((1, 15, 7, 12, 3)) == expected
+
+
 @pytest.mark.xfail(reason="Broke this with reworking minimal_unsatisfiable_set.  Not sure how to fix.  minimal_unsatisfiable_subset function is otherwise working well.")
 def test_minimal_unsatisfiable_subset():
     def sat(val):
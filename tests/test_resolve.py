@@ -284,6 +284,32 @@ def test_pseudo_boolean():
     ])
 
 
+try:
+    import pysat  # NOQA
+    has_pysat = True
+except ImportError:
+    has_pysat = False
+
+
+@pytest.mark.skipif(not has_pysat, reason="the pysat-rc2 solver needs python-sat installed")
+@pytest.mark.parametrize("specs", (
+    ['iopro 1.4*', 'python 2.7*', 'numpy 1.7*'],
+    ['iopro 1.4*', 'python 2.7*', 'numpy 1.7*', MatchSpec(track_features='mkl')],
+    ['iopro', 'python 2.7*', 'numpy 1.5*'],
+    ['iopro', 'python 2.7*', 'numpy 1.5*', MatchSpec(track_features='mkl')],
+    ['scipy', 'python 2.7*', 'numpy 1.7*', MatchSpec(track_features='mkl')],
+    ['anaconda 1.5.0', 'python 2.7*', 'numpy 1.7*'],
+    ['accelerate', MatchSpec(track_features='mkl')],
+    ['mkl 11*', MatchSpec(track_features='mkl')],
+))
+def test_maxsat_solver_matches_default(specs):
+    expected = r.install(specs, returnall=True)
+    update_expected = r.install(['numpy'], r.install(specs))
+    with env_var("CONDA_SAT_SOLVER", "pysat-rc2", stack_callback=conda_tests_ctxt_mgmt_def_pol):
+        assert r.install(specs, returnall=True) == expected
+        assert r.install(['numpy'], r.install(specs)) == update_expected
+
+
 def test_get_dists():
     reduced_index = r.get_reduced_index((MatchSpec("anaconda 1.4.0"), ))
     dist_strs = [prec.dist_str() for prec in reduced_index]